@@ -0,0 +1,274 @@
+"""Compile a parameterized analytics question into one SQL statement.
+
+An ``AggregateQuery`` (date range, filters, group-by dimensions, metric) becomes a single
+SELECT with every filter and grouping pushed into the database. Questions the rollups can
+answer (paid-only or all-status counts, day-aligned ranges, no payment_type) read
+``order_daily_rollup``; anything else runs against Orders/Payments/Restaurants.
+
+Date ranges are half-open ``[start, end)`` and always filter the raw ``created_at``/``day``
+column, so ``ix_orders_created_at`` stays usable; bucket functions only appear in the SELECT
+and GROUP BY.
+
+When the range reaches into archived months (App.partitions), the base-table statement also
+runs in each of those month files and the per-partition groups are combined here; recent
+ranges only touch the live tables.
+"""
+import datetime
+from dataclasses import dataclass
+from enum import Enum
+from typing import List, Optional, Tuple
+
+from sqlalchemy import Date, cast, func, literal, select
+
+from App.models import (
+    Orders,
+    Payments,
+    Restaurants,
+    PaymentStatus,
+    PaymentType,
+    OrderFoodItem,
+    RestaurantAreaName,
+    OrderDailyRollup,
+)
+from App.partitions import archived_files, partitioned_rows
+
+
+TIME_GRAINS = ("day", "week", "month")
+DIMENSIONS = TIME_GRAINS + ("area", "item", "restaurant", "payment_type")
+METRICS = ("count", "sum", "avg")
+
+
+@dataclass(frozen=True)
+class AggregateQuery:
+    metric: str = "sum"
+    group_by: Tuple[str, ...] = ()
+    start: Optional[datetime.datetime] = None
+    end: Optional[datetime.datetime] = None
+    areas: Tuple[RestaurantAreaName, ...] = ()
+    items: Tuple[OrderFoodItem, ...] = ()
+    restaurant_ids: Tuple[int, ...] = ()
+    payment_types: Tuple[PaymentType, ...] = ()
+    statuses: Tuple[PaymentStatus, ...] = (PaymentStatus.PASS,)
+
+    def validate(self) -> "AggregateQuery":
+        """Return a normalized copy, raising ``ValueError`` for questions that make no sense."""
+        if self.metric not in METRICS:
+            raise ValueError(f"metric must be one of {', '.join(METRICS)}")
+        unknown = [d for d in self.group_by if d not in DIMENSIONS]
+        if unknown:
+            raise ValueError(f"unknown group_by dimension(s): {', '.join(unknown)}")
+        group_by = tuple(dict.fromkeys(self.group_by))
+        if sum(d in TIME_GRAINS for d in group_by) > 1:
+            raise ValueError("group_by accepts at most one of day, week, month")
+        if not self.statuses:
+            raise ValueError("at least one payment status is required")
+        start, end = _naive_utc(self.start), _naive_utc(self.end)
+        if start and end and start >= end:
+            raise ValueError("start must be before end")
+        return AggregateQuery(
+            metric=self.metric,
+            group_by=group_by,
+            start=start,
+            end=end,
+            areas=tuple(dict.fromkeys(self.areas)),
+            items=tuple(dict.fromkeys(self.items)),
+            restaurant_ids=tuple(dict.fromkeys(self.restaurant_ids)),
+            payment_types=tuple(dict.fromkeys(self.payment_types)),
+            statuses=tuple(dict.fromkeys(self.statuses)),
+        )
+
+    @property
+    def all_statuses(self) -> bool:
+        return set(self.statuses) == set(PaymentStatus)
+
+    @property
+    def uses_rollups(self) -> bool:
+        """Whether ``order_daily_rollup`` holds everything this question needs."""
+        if "payment_type" in self.group_by or self.payment_types:
+            return False
+        if not all(_is_midnight(bound) for bound in (self.start, self.end)):
+            return False
+        paid_only = set(self.statuses) == {PaymentStatus.PASS}
+        # The rollups only carry amounts for PASS payments; counts exist for PASS and for all.
+        return paid_only or (self.all_statuses and self.metric == "count")
+
+
+def _naive_utc(value: Optional[datetime.datetime]) -> Optional[datetime.datetime]:
+    if value is not None and value.tzinfo is not None:
+        return value.astimezone(datetime.UTC).replace(tzinfo=None)
+    return value
+
+
+def _is_midnight(value: Optional[datetime.datetime]) -> bool:
+    return value is None or value.time() == datetime.time()
+
+
+def _bucket(dialect_name: str, grain: str, column):
+    """Start-of-bucket date for ``column``; weeks start on Monday."""
+    if dialect_name == "sqlite":
+        if grain == "day":
+            return func.date(column)
+        if grain == "week":
+            return func.date(column, "weekday 0", "-6 days")
+        return func.date(column, "start of month")
+    return cast(func.date_trunc(grain, column), Date)
+
+
+def compile_aggregate(query: AggregateQuery, dialect_name: str, rollups: bool = True):
+    """The single SELECT answering ``query``: one labelled column per dimension plus ``value``."""
+    if rollups and query.uses_rollups:
+        return _rollup_statement(query, dialect_name)
+    return _base_statement(query, dialect_name)
+
+
+def _group(stmt, dims: list, value, order: bool = True):
+    stmt = stmt.add_columns(*dims, value.label("value"))
+    if dims:
+        stmt = stmt.group_by(*dims)
+        if order:
+            stmt = stmt.order_by(*dims)
+    return stmt
+
+
+def _rollup_statement(query: AggregateQuery, dialect_name: str):
+    rollup = OrderDailyRollup
+    needs_area = "area" in query.group_by or bool(query.areas)
+    columns = {
+        # The rollup day is already a day bucket; no function needed.
+        "day": rollup.day,
+        "area": Restaurants.area,
+        "item": rollup.item_name,
+        "restaurant": rollup.restaurant_id,
+    }
+    dims = [
+        (_bucket(dialect_name, d, rollup.day) if d in ("week", "month") else columns[d]).label(d)
+        for d in query.group_by
+    ]
+    count_column = rollup.orders_count if query.all_statuses else rollup.paid_orders_count
+    if query.metric == "count":
+        value = func.coalesce(func.sum(count_column), 0)
+    elif query.metric == "sum":
+        value = func.coalesce(func.sum(rollup.revenue_cents), 0) / literal(100.0)
+    else:
+        value = func.sum(rollup.revenue_cents) / literal(100.0) / func.nullif(func.sum(rollup.paid_orders_count), 0)
+
+    stmt = select().select_from(rollup)
+    if needs_area:
+        stmt = stmt.join(Restaurants, Restaurants.restaurant_id == rollup.restaurant_id)
+    if query.start:
+        stmt = stmt.where(rollup.day >= query.start.date())
+    if query.end:
+        stmt = stmt.where(rollup.day < query.end.date())
+    if query.areas:
+        stmt = stmt.where(Restaurants.area.in_(query.areas))
+    if query.items:
+        stmt = stmt.where(rollup.item_name.in_(query.items))
+    if query.restaurant_ids:
+        stmt = stmt.where(rollup.restaurant_id.in_(query.restaurant_ids))
+    stmt = _group(stmt, dims, value)
+    if dims:
+        # A group whose orders all failed has rows in the rollup but nothing paid.
+        stmt = stmt.having(func.sum(count_column) > 0)
+    return stmt
+
+
+def _base_statement(query: AggregateQuery, dialect_name: str, partial: bool = False):
+    """``partial`` compiles one partition's share: unordered, and ``avg`` as its sum plus a
+    ``rows`` count so partitions can be combined."""
+    needs_area = "area" in query.group_by or bool(query.areas)
+    columns = {
+        "area": Restaurants.area,
+        "item": Orders.item_name,
+        "restaurant": Orders.restaurant_id,
+        "payment_type": Payments.payment_type,
+    }
+    dims = [
+        (_bucket(dialect_name, d, Orders.created_at) if d in TIME_GRAINS else columns[d]).label(d)
+        for d in query.group_by
+    ]
+    if query.metric == "count":
+        value = func.count(Orders.order_id)
+    elif query.metric == "sum":
+        value = func.coalesce(func.sum(Payments.amount), 0.0)
+    elif partial:
+        value = func.sum(Payments.amount)
+    else:
+        value = func.avg(Payments.amount)
+
+    stmt = select().select_from(Orders).join(Payments, Payments.transaction_id == Orders.transaction_id)
+    if needs_area:
+        stmt = stmt.join(Restaurants, Restaurants.restaurant_id == Orders.restaurant_id)
+    if query.start:
+        stmt = stmt.where(Orders.created_at >= query.start)
+    if query.end:
+        stmt = stmt.where(Orders.created_at < query.end)
+    if not query.all_statuses:
+        stmt = stmt.where(Payments.status.in_(query.statuses))
+    if query.areas:
+        stmt = stmt.where(Restaurants.area.in_(query.areas))
+    if query.items:
+        stmt = stmt.where(Orders.item_name.in_(query.items))
+    if query.restaurant_ids:
+        stmt = stmt.where(Orders.restaurant_id.in_(query.restaurant_ids))
+    if query.payment_types:
+        stmt = stmt.where(Payments.payment_type.in_(query.payment_types))
+    stmt = _group(stmt, dims, value, order=not partial)
+    if partial and query.metric == "avg":
+        stmt = stmt.add_columns(func.count(Payments.amount).label("rows"))
+    return stmt
+
+
+def _sort_key(key: tuple) -> tuple:
+    # Enum columns are stored (and ordered in SQL) by member name.
+    return tuple(value.name if isinstance(value, Enum) else value for value in key)
+
+
+def combine_partitions(query: AggregateQuery, parts: List[list]) -> List[dict]:
+    """Merge the ``partial`` results of each partition into the rows one statement would give."""
+    groups = {}
+    for part in parts:
+        for row in part:
+            row = row._mapping
+            key = tuple(row[d] for d in query.group_by)
+            value = row["value"] or 0
+            rows = row["rows"] if query.metric == "avg" else 0
+            totals = groups.setdefault(key, [0, 0])
+            totals[0] += value
+            totals[1] += rows
+    combined = []
+    for key in sorted(groups, key=_sort_key):
+        value, rows = groups[key]
+        if query.metric == "avg":
+            value = value / rows if rows else None
+        combined.append({**dict(zip(query.group_by, key)), "value": value})
+    return combined
+
+
+async def run_aggregate(session, query: AggregateQuery, rollups: bool = True) -> List[dict]:
+    """Execute ``query`` and return one dict per group (``value`` plus each dimension).
+
+    ``rollups=False`` answers from the base tables even when the rollups could, so one path
+    can be checked against the other.
+    """
+    query = query.validate()
+    dialect_name = session.bind.dialect.name
+    use_rollups = rollups and query.uses_rollups
+    files = [] if use_rollups else await archived_files(session, query.start, query.end)
+    if files:
+        parts = await partitioned_rows(session, _base_statement(query, dialect_name, partial=True), files)
+        rows = combine_partitions(query, parts)
+    else:
+        rows = (await session.execute(compile_aggregate(query, dialect_name, rollups))).mappings().all()
+    results = []
+    for row in rows:
+        result = dict(row)
+        for grain in TIME_GRAINS:
+            if result.get(grain) is not None:
+                result[grain] = str(result[grain])
+        value = result["value"]
+        if query.metric == "count":
+            result["value"] = int(value or 0)
+        else:
+            result["value"] = None if value is None else round(float(value), 2)
+        results.append(result)
+    return results
@@ -1,35 +1,167 @@
-from fastapi import Depends, HTTPException
+import hashlib
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from functools import lru_cache
+
+from fastapi import Depends, HTTPException, Request
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
-from jose import jwt, JWTError
-from sqlmodel import Session, select
-from typing import Optional
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from starlette.concurrency import run_in_threadpool
+from typing import Optional, Union
 
 from App.settings import settings
-from App.database import get_session
+from App.database import WROTE_AT_COOKIE, get_replica_session, get_session, replica_configured, wrote_recently
 from App.models import Customers
+from App.cache import TTLCache
+from App.metrics import record_jwt
 
 
 security = HTTPBearer(auto_error=True)
 
+# Verified payloads keyed by sha256(token); each entry lives until the token's own `exp`.
+_token_cache = TTLCache(maxsize=settings.AUTH_TOKEN_CACHE_SIZE)
+# Detached Customers rows keyed by id, for endpoints that need more than the token claims.
+_user_cache = TTLCache(maxsize=settings.AUTH_USER_CACHE_SIZE, ttl=settings.AUTH_USER_CACHE_TTL)
+
+
+@dataclass(frozen=True, slots=True)
+class Principal:
+    """Authenticated caller built from trusted JWT claims, without a DB round trip."""
+    id: int
+    google_id: str
+    name: Optional[str] = None
+
+
 def decode_token(token: str) -> dict:
+    started = time.perf_counter()
     try:
-        payload = jwt.decode(token, settings.JWT_SECRET_KEY, algorithms=[settings.ALGORITHM])
+        return _decode_token(token)
+    finally:
+        record_jwt(time.perf_counter() - started)
+
+
+def _decode_token(token: str) -> dict:
+    key = hashlib.sha256(token.encode()).digest()
+    payload = _token_cache.get(key)
+    if payload is not None:
         return payload
+    # Imported on the first cache miss: jose pulls in cryptography, which startup doesn't need.
+    from jose import jwt, JWTError
+
+    try:
+        payload = jwt.decode(token, settings.JWT_SECRET_KEY, algorithms=[settings.ALGORITHM])
     except JWTError:
         raise HTTPException(status_code=401, detail="Invalid or expired token")
+    exp = payload.get("exp")
+    if isinstance(exp, (int, float)):
+        remaining = exp - time.time()
+        if remaining > 0:
+            _token_cache.set(key, payload, ttl=remaining)
+    return payload
 
-def get_current_user(
-    creds: HTTPAuthorizationCredentials = Depends(security),
-    session: Session = Depends(get_session),
-) -> Customers:
-    """Extract current user from Bearer token and fetch from DB."""
+
+async def mint_access_token(user: Customers) -> str:
+    """Sign the app's JWT for ``user``.
+
+    HMAC (HS*) signing takes microseconds and runs inline; RSA/EC signing takes milliseconds,
+    so it goes to the threadpool instead of stalling every other request on the event loop.
+    """
+    from jose import jwt
+
+    key = _signing_key(settings.JWT_SECRET_KEY, settings.ALGORITHM)
+    payload = {
+        "sub": str(user.id),
+        "google_id": user.google_id,
+        "name": user.name,
+        "exp": datetime.utcnow() + timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES),
+    }
+    if settings.ALGORITHM.upper().startswith("HS"):
+        return jwt.encode(payload, key, algorithm=settings.ALGORITHM)
+    return await run_in_threadpool(jwt.encode, payload, key, algorithm=settings.ALGORITHM)
+
+
+@lru_cache(maxsize=4)
+def _signing_key(secret: str, algorithm: str):
+    """Parsed signing key; jose would otherwise re-parse a PEM on every ``encode``."""
+    from jose import jwk
+
+    return jwk.construct(secret, algorithm)
+
+
+def invalidate_user(user_id: int) -> None:
+    """Drop a cached Customers row; call whenever the row changes."""
+    _user_cache.invalidate(user_id)
+
+
+async def load_customer(session: AsyncSession, user_id: int) -> Optional[Customers]:
+    user = _user_cache.get(user_id)
+    if user is not None:
+        return user
+    user = (await session.exec(select(Customers).where(Customers.id == user_id))).first()
+    if user is not None:
+        user = Customers.model_validate(user)
+        _user_cache.set(user_id, user)
+    return user
+
+
+def _user_id_from(creds: HTTPAuthorizationCredentials) -> tuple:
     if creds.scheme.lower() != "bearer":
         raise HTTPException(status_code=401, detail="Invalid auth scheme")
     payload = decode_token(creds.credentials)
     user_id: Optional[str] = payload.get("sub")
     if not user_id:
         raise HTTPException(status_code=401, detail="Invalid token payload")
-    user = session.exec(select(Customers).where(Customers.id == int(user_id))).first()
+    try:
+        return int(user_id), payload
+    except ValueError:
+        raise HTTPException(status_code=401, detail="Invalid token payload")
+
+
+async def get_current_customer(
+    creds: HTTPAuthorizationCredentials = Depends(security),
+    session: AsyncSession = Depends(get_session),
+) -> Customers:
+    """Extract current user from Bearer token and fetch the full row (TTL-cached)."""
+    user_id, _ = _user_id_from(creds)
+    session.info["user_id"] = user_id
+    user = await load_customer(session, user_id)
+    if not user:
+        raise HTTPException(status_code=401, detail="User not found")
+    return user
+
+
+async def get_current_user(
+    creds: HTTPAuthorizationCredentials = Depends(security),
+    session: AsyncSession = Depends(get_session),
+) -> Union[Principal, Customers]:
+    """Extract current user from Bearer token.
+
+    With AUTH_STATELESS the token claims are trusted and a Principal is returned without
+    touching the DB; otherwise the Customers row is loaded (TTL-cached).
+    """
+    user_id, payload = _user_id_from(creds)
+    # Lets the session remember who wrote, for read-your-writes (App.database).
+    session.info["user_id"] = user_id
+    if settings.AUTH_STATELESS and payload.get("google_id"):
+        return Principal(id=user_id, google_id=payload["google_id"], name=payload.get("name"))
+    user = await load_customer(session, user_id)
     if not user:
         raise HTTPException(status_code=401, detail="User not found")
     return user
+
+
+async def get_read_session(
+    request: Request,
+    user=Depends(get_current_user),
+    session: AsyncSession = Depends(get_session),
+):
+    """Session for read-only handlers: the replica when configured, unless the caller wrote
+    within READ_YOUR_WRITES_SECONDS (on any worker, per its ``wrote_at`` cookie), in which
+    case the request's primary session."""
+    if not replica_configured() or wrote_recently(user.id, request.cookies.get(WROTE_AT_COOKIE)):
+        yield session
+        return
+    async for replica in get_replica_session():
+        yield replica
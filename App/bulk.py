@@ -0,0 +1,45 @@
+import importlib
+from typing import Any, Dict, List, Sequence, Tuple, Type
+
+from fastapi import HTTPException
+from pydantic import ValidationError
+from sqlalchemy import insert
+from sqlmodel import SQLModel
+
+from App.schemas import BulkItemError
+from App.settings import settings
+
+
+# Dialect modules whose ``insert()`` has ``on_conflict_do_update``; imported on first use so a
+# SQLite deployment never loads the PostgreSQL dialect.
+_UPSERT_DIALECTS = {"sqlite": "sqlalchemy.dialects.sqlite", "postgresql": "sqlalchemy.dialects.postgresql"}
+
+
+def upsert_insert(dialect_name: str):
+    """The dialect-specific ``insert`` construct supporting ``INSERT ... ON CONFLICT``."""
+    module = _UPSERT_DIALECTS.get(dialect_name)
+    if module is None:
+        raise NotImplementedError(f"Upserts are not implemented for {dialect_name}")
+    return importlib.import_module(module).insert
+
+
+def validate_items(model: Type[SQLModel], items: Sequence[Any]) -> Tuple[List[Tuple[int, SQLModel]], List[BulkItemError]]:
+    """Validate each raw item on its own so one bad record doesn't reject the batch."""
+    if len(items) > settings.BULK_MAX_ITEMS:
+        raise HTTPException(status_code=413, detail=f"At most {settings.BULK_MAX_ITEMS} items per request")
+    valid, errors = [], []
+    for index, item in enumerate(items):
+        try:
+            valid.append((index, model.model_validate(item)))
+        except ValidationError as exc:
+            errors.append(BulkItemError(index=index, detail=exc.errors(include_url=False, include_context=False)))
+    return valid, errors
+
+
+async def insert_returning(session, model: Type[SQLModel], rows: List[Dict[str, Any]]):
+    """INSERT all rows as one executemany with RETURNING, rows back in parameter order."""
+    if not rows:
+        return []
+    table = model.__table__
+    stmt = insert(table).returning(*table.c, sort_by_parameter_order=True)
+    return (await session.execute(stmt, rows)).all()
@@ -0,0 +1,234 @@
+import asyncio
+import functools
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+
+from fastapi.encoders import jsonable_encoder
+
+from App.settings import settings
+
+
+_MISSING = object()
+
+
+class TTLCache:
+    """Bounded LRU mapping whose entries also expire after a TTL.
+
+    ``ttl`` is the default lifetime in seconds (``None`` = no expiry); ``set`` can override
+    it per entry. Safe to share between the event loop and threadpool workers.
+    """
+
+    def __init__(self, maxsize: int, ttl: Optional[float] = None) -> None:
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is _MISSING:
+                self.misses += 1
+                return default
+            value, expires_at = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._data[key]
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = time.monotonic() + ttl if ttl is not None else None
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, key: Hashable) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> dict:
+        return {"size": len(self._data), "hits": self.hits, "misses": self.misses, "evictions": self.evictions}
+
+
+# --- Response cache ---
+
+class MemoryBackend:
+    """In-process backend: LRU with size and TTL eviction."""
+
+    def __init__(self, maxsize: int, ttl: Optional[float] = None) -> None:
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl)
+        # Counters live outside the LRU so a generation can never be evicted and reset.
+        self._counters: Dict[str, int] = {}
+
+    @property
+    def evictions(self) -> int:
+        return self._cache.evictions
+
+    async def get(self, key: str) -> Any:
+        return self._cache.get(key)
+
+    async def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        self._cache.set(key, value, ttl=ttl)
+
+    async def incr(self, key: str) -> int:
+        self._counters[key] = self._counters.get(key, 0) + 1
+        return self._counters[key]
+
+    async def counter(self, key: str) -> int:
+        return self._counters.get(key, 0)
+
+
+class RedisBackend:
+    """Shared backend for any client exposing the ``redis.asyncio`` get/set(ex=)/incr API.
+
+    Values are stored as JSON, so only JSON-compatible payloads should be cached.
+    """
+
+    evictions = 0  # Redis evicts on its own; we can't observe it from here.
+
+    def __init__(self, client, prefix: str = "cache:") -> None:
+        self.client = client
+        self.prefix = prefix
+
+    @classmethod
+    def from_url(cls, url: str) -> "RedisBackend":
+        try:
+            import redis.asyncio as redis
+        except ImportError as exc:
+            raise RuntimeError("CACHE_BACKEND=redis requires the 'redis' package") from exc
+        return cls(redis.from_url(url))
+
+    async def get(self, key: str) -> Any:
+        raw = await self.client.get(self.prefix + key)
+        return None if raw is None else json.loads(raw)
+
+    async def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        await self.client.set(self.prefix + key, json.dumps(value), ex=int(ttl) if ttl else None)
+
+    async def incr(self, key: str) -> int:
+        return int(await self.client.incr(self.prefix + key))
+
+    async def counter(self, key: str) -> int:
+        return int(await self.client.get(self.prefix + key) or 0)
+
+
+class ResponseCache:
+    """Namespaced response cache with write-driven invalidation and single-flight fills.
+
+    Keys embed the namespace's generation counter; ``invalidate`` bumps it so every entry of
+    the namespace goes stale at once without scanning the backend (works the same on Redis).
+    Concurrent misses for one key share a single computation.
+    """
+
+    def __init__(self, backend, ttl: Optional[float] = None) -> None:
+        self.backend = backend
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self._inflight: Dict[str, asyncio.Future] = {}
+
+    async def _key(self, namespace: str, name: str, params: dict) -> str:
+        generation = await self.backend.counter(f"gen:{namespace}")
+        encoded = "&".join(f"{k}={params[k]}" for k in sorted(params))
+        return f"{namespace}:{generation}:{name}?{encoded}"
+
+    async def get_or_compute(self, namespace: str, name: str, params: dict, compute: Callable[[], Awaitable[Any]]) -> Any:
+        key = await self._key(namespace, name, params)
+        value = await self.backend.get(key)
+        if value is not None:
+            self.hits += 1
+            return value
+
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            self.coalesced += 1
+            return await asyncio.shield(inflight)
+
+        self.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            value = jsonable_encoder(await compute())
+            await self.backend.set(key, value, ttl=self.ttl)
+        except BaseException as exc:
+            future.set_exception(exc)
+            future.exception()  # mark retrieved when nobody else was waiting
+            raise
+        else:
+            future.set_result(value)
+            return value
+        finally:
+            del self._inflight[key]
+
+    async def invalidate(self, namespace: str) -> None:
+        await self.backend.incr(f"gen:{namespace}")
+
+    def stats(self) -> dict:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "evictions": self.backend.evictions,
+        }
+
+    def cached(self, namespace: str):
+        """Decorate an endpoint so its result is cached under its name + non-session params."""
+        def decorator(fn):
+            @functools.wraps(fn)
+            async def wrapper(*args, **kwargs):
+                params = {k: v for k, v in kwargs.items() if k != "session"}
+                return await self.get_or_compute(namespace, fn.__name__, params, lambda: fn(*args, **kwargs))
+            return wrapper
+        return decorator
+
+
+class _NullBackend:
+    evictions = 0
+
+    async def get(self, key: str) -> Any:
+        return None
+
+    async def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        return None
+
+    async def incr(self, key: str) -> int:
+        return 0
+
+    async def counter(self, key: str) -> int:
+        return 0
+
+
+def make_backend(kind: str):
+    if kind == "memory":
+        return MemoryBackend(maxsize=settings.CACHE_MAX_ENTRIES)
+    if kind == "redis":
+        return RedisBackend.from_url(settings.REDIS_URL)
+    if kind == "none":
+        return _NullBackend()
+    raise ValueError(f"Unknown CACHE_BACKEND {kind!r}")
+
+
+ANALYTICS_NAMESPACE = "analytics"
+
+response_cache = ResponseCache(make_backend(settings.CACHE_BACKEND), ttl=settings.ANALYTICS_CACHE_TTL)
@@ -0,0 +1,157 @@
+"""In-process restaurant catalog: every ``Restaurants`` row in memory, versioned.
+
+The table is tiny and read-mostly, so the routers serve restaurant GETs and validate
+``restaurant_id`` on order writes from this snapshot instead of querying. Each change bumps
+``catalog_versions.version`` in the same transaction as the change:
+
+* the worker that made the change folds it into its snapshot right after commit;
+* other workers poll the version row at most every ``CATALOG_REFRESH_SECONDS`` and reload
+  when it moved, and a lookup miss forces a poll, so an id created elsewhere a moment ago is
+  still found.
+
+The version doubles as the ETag of every restaurant representation. A poll that reads an
+older version (a lagging replica) never rolls the snapshot back.
+"""
+import asyncio
+import bisect
+import time
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Set
+
+from sqlalchemy import update
+from sqlmodel import select
+
+from App.models import CatalogVersions, Restaurants
+from App.schemas import RestaurantRead
+from App.settings import settings
+
+
+RESTAURANTS = "restaurants"
+CATALOGS = (RESTAURANTS,)
+
+
+def version_bump(name: str = RESTAURANTS):
+    """``UPDATE ... RETURNING version``; execute it in the transaction that changes the catalog."""
+    return (
+        update(CatalogVersions)
+        .where(CatalogVersions.name == name)
+        .values(version=CatalogVersions.version + 1)
+        .returning(CatalogVersions.version)
+    )
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Whether an ``If-None-Match`` header (weak comparison) matches ``etag``."""
+    if not if_none_match:
+        return False
+    tags = {tag.strip() for tag in if_none_match.split(",")}
+    return "*" in tags or etag in tags or f"W/{etag}" in tags
+
+
+@dataclass(frozen=True)
+class _Snapshot:
+    version: int
+    by_id: Dict[int, RestaurantRead] = field(default_factory=dict)
+    rows: List[RestaurantRead] = field(default_factory=list)  # by restaurant_id
+    ids: List[int] = field(default_factory=list)
+
+    @classmethod
+    def build(cls, version: int, restaurants: Iterable[RestaurantRead]) -> "_Snapshot":
+        rows = sorted(restaurants, key=lambda r: r.restaurant_id)
+        return cls(version, {r.restaurant_id: r for r in rows}, rows, [r.restaurant_id for r in rows])
+
+
+class RestaurantCatalog:
+    def __init__(self, refresh_seconds: float) -> None:
+        self.refresh_seconds = refresh_seconds
+        # Replaced wholesale, never mutated, so readers always see one consistent version.
+        self._snapshot = _Snapshot(version=-1)
+        self._checked_at = float("-inf")
+        self._lock = asyncio.Lock()
+        self.reloads = 0
+
+    @property
+    def version(self) -> int:
+        return self._snapshot.version
+
+    @property
+    def etag(self) -> str:
+        return f'"{RESTAURANTS}-{self._snapshot.version}"'
+
+    def _due(self) -> bool:
+        return time.monotonic() - self._checked_at >= self.refresh_seconds
+
+    async def refresh(self, session, force: bool = False) -> None:
+        """Poll the version row (at most every ``refresh_seconds`` unless ``force``) and reload
+        the snapshot if it moved on."""
+        if not force and not self._due():
+            return
+        async with self._lock:
+            if not force and not self._due():
+                return
+            version = await session.scalar(select(CatalogVersions.version).where(CatalogVersions.name == RESTAURANTS))
+            self._checked_at = time.monotonic()
+            if (version or 0) > self._snapshot.version:
+                # Rows are read after the version, so they are at least that new.
+                rows = (await session.exec(select(Restaurants))).all()
+                self._snapshot = _Snapshot.build(version or 0, (RestaurantRead.model_validate(r) for r in rows))
+                self.reloads += 1
+
+    async def get(self, session, restaurant_id: int) -> Optional[RestaurantRead]:
+        await self.refresh(session)
+        restaurant = self._snapshot.by_id.get(restaurant_id)
+        if restaurant is None:
+            # Possibly created by another worker since our last poll.
+            await self.refresh(session, force=True)
+            restaurant = self._snapshot.by_id.get(restaurant_id)
+        return restaurant
+
+    async def missing(self, session, restaurant_ids: Iterable[int]) -> Set[int]:
+        """The subset of ``restaurant_ids`` that don't exist, with at most one forced poll."""
+        await self.refresh(session)
+        unknown = {i for i in restaurant_ids if i not in self._snapshot.by_id}
+        if unknown:
+            await self.refresh(session, force=True)
+            unknown = {i for i in unknown if i not in self._snapshot.by_id}
+        return unknown
+
+    async def page(self, session, after: Optional[int] = None, limit: Optional[int] = None) -> List[RestaurantRead]:
+        """Restaurants with ``restaurant_id > after`` in id order (keyset pagination)."""
+        await self.refresh(session)
+        snapshot = self._snapshot
+        start = bisect.bisect_right(snapshot.ids, after) if after is not None else 0
+        return snapshot.rows[start:start + limit] if limit else snapshot.rows[start:]
+
+    async def record_change(
+        self,
+        session,
+        version: Optional[int],
+        restaurant: Optional[Restaurants] = None,
+        deleted_id: Optional[int] = None,
+    ) -> None:
+        """Fold a change this worker just committed (at ``version``) into the snapshot.
+
+        When another worker's change slipped in between, the snapshot is reloaded instead.
+        """
+        async with self._lock:
+            snapshot = self._snapshot
+            if version is not None and version == snapshot.version + 1:
+                by_id = dict(snapshot.by_id)
+                if deleted_id is not None:
+                    by_id.pop(deleted_id, None)
+                if restaurant is not None:
+                    by_id[restaurant.restaurant_id] = RestaurantRead.model_validate(restaurant)
+                self._snapshot = _Snapshot.build(version, by_id.values())
+                return
+        await self.refresh(session, force=True)
+
+
+restaurant_catalog = RestaurantCatalog(refresh_seconds=settings.CATALOG_REFRESH_SECONDS)
+
+
+async def load_catalog() -> None:
+    """Fill the catalog at startup so the first requests don't pay for it."""
+    from App.database import get_session
+
+    async for session in get_session():
+        await restaurant_catalog.refresh(session, force=True)
@@ -1,13 +1,544 @@
+import asyncio
+import hashlib
+import hmac
+import math
+import time
+import weakref
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import Dict, Optional
+
 import sqlmodel
-from sqlmodel import SQLModel,Session
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import Session as OrmSession
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from sqlalchemy.sql.dml import UpdateBase
+from sqlmodel import SQLModel, Session
+from sqlmodel.ext.asyncio.session import AsyncSession
+from starlette.concurrency import run_in_threadpool
+
+from App.settings import settings
+from App.cache import TTLCache
 from App.models import Customers, Payments, Orders, Restaurants
+from App.migrations import run_migrations
+from App.metrics import instrument_engine
+from App.partitions import dispose_archive_engines
+
+
+_ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+    "postgres": "postgresql+asyncpg",
+}
+
+
+def to_async_url(url: str) -> str:
+    """Map a sync database URL onto its async driver (aiosqlite / asyncpg)."""
+    parsed = make_url(url)
+    if "+" in parsed.drivername:
+        backend = parsed.drivername.split("+", 1)[0]
+    else:
+        backend = parsed.drivername
+    driver = _ASYNC_DRIVERS.get(backend)
+    if driver is None:
+        raise ValueError(f"No async driver known for database URL {url!r}")
+    return parsed.set(drivername=driver).render_as_string(hide_password=False)
+
+
+def _is_sqlite(url: str) -> bool:
+    return make_url(url).get_backend_name() == "sqlite"
+
+
+def _use_sqlite_profile(url: str) -> bool:
+    return settings.SQLITE_PERFORMANCE_PROFILE and _is_sqlite(url) and ":memory:" not in url
+
+
+def _pool_options(url: str, role: str = "primary") -> dict:
+    if _is_sqlite(url) and ":memory:" in url:
+        return {}
+    options = {
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_pre_ping": True,
+    }
+    if role == "writer":
+        # A single connection: concurrent writers wait in the pool's FIFO instead of
+        # contending for SQLite's file lock.
+        options.update(pool_size=1, max_overflow=0)
+    elif role in ("reader", "replica") and _is_sqlite(url):
+        options.update(pool_size=settings.SQLITE_READ_POOL_SIZE, max_overflow=0)
+    return options
+
+
+def sqlite_pragmas(read_only: bool = False) -> dict:
+    pragmas = {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "busy_timeout": settings.SQLITE_BUSY_TIMEOUT_MS,
+        "mmap_size": settings.SQLITE_MMAP_SIZE,
+        "cache_size": -settings.SQLITE_CACHE_SIZE_KB,
+        "temp_store": "MEMORY",
+    }
+    if read_only:
+        pragmas["query_only"] = "ON"
+    return pragmas
+
+
+def install_sqlite_pragmas(sync_engine, read_only: bool = False) -> None:
+    """Apply the performance pragmas to every new DBAPI connection of ``sync_engine``."""
+    pragmas = sqlite_pragmas(read_only)
+
+    @event.listens_for(sync_engine, "connect")
+    def _apply(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in pragmas.items():
+                cursor.execute(f"PRAGMA {name}={value}")
+        finally:
+            cursor.close()
+
+
+def _read_only(role: str) -> bool:
+    return role in ("reader", "replica")
+
+
+# Connections each pooled sync engine can hand out; see "Sync-mode connection slots".
+_pool_limits: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()  # sync engine -> connections
+
+
+def make_engine(url: str, role: str = "primary"):
+    options = _pool_options(url, role)
+    engine = sqlmodel.create_engine(url, echo=settings.DB_ECHO, **options)
+    if options and options["max_overflow"] >= 0:
+        _pool_limits[engine] = options["pool_size"] + options["max_overflow"]
+    if _use_sqlite_profile(url) or (role == "replica" and _is_sqlite(url)):
+        install_sqlite_pragmas(engine, read_only=_read_only(role))
+    instrument_engine(engine)
+    return engine
+
+
+def make_async_engine(url: str, role: str = "primary"):
+    options = _pool_options(url, role)
+    if options:
+        # aiosqlite defaults to NullPool; pool explicitly so connections are reused.
+        options["poolclass"] = AsyncAdaptedQueuePool
+    engine = create_async_engine(url, echo=settings.DB_ECHO, **options)
+    if _use_sqlite_profile(url) or (role == "replica" and _is_sqlite(url)):
+        install_sqlite_pragmas(engine.sync_engine, read_only=_read_only(role))
+    instrument_engine(engine.sync_engine)
+    return engine
+
+
+class RoutingSession(Session):
+    """Session that sends flushes and DML to ``writer`` and plain reads to its bind.
+
+    Once a transaction has written, it stays on the writer until it ends so it can
+    read its own uncommitted rows.
+    """
+
+    def __init__(self, *args, writer=None, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.writer = writer
+        self.writing = False
+
+    def get_bind(self, mapper=None, *, clause=None, **kwargs):
+        if self.writer is not None and (self.writing or self._flushing or isinstance(clause, UpdateBase)):
+            self.writing = True
+            return self.writer
+        return super().get_bind(mapper, clause=clause, **kwargs)
+
+
+@event.listens_for(RoutingSession, "after_transaction_end")
+def _release_writer(session, transaction) -> None:
+    if transaction.parent is None:
+        session.writing = False
+
+
+if _use_sqlite_profile(settings.DATABASE_URL):
+    engine = make_engine(settings.DATABASE_URL, role="writer")
+    read_engine = make_engine(settings.DATABASE_URL, role="reader")
+else:
+    engine = read_engine = make_engine(settings.DATABASE_URL)
+# Optional read replica (REPLICA_DATABASE_URL) for GET handlers; see get_replica_session.
+replica_engine = make_engine(settings.REPLICA_DATABASE_URL, role="replica") if settings.REPLICA_DATABASE_URL else None
+_async_engine = None
+_async_read_engine = None
+_async_replica_engine = None
+
+
+def _async_url() -> str:
+    return settings.ASYNC_DATABASE_URL or to_async_url(settings.DATABASE_URL)
+
+
+def get_async_engine():
+    """Async engine, created on first use so sync-only deployments don't need aiosqlite/asyncpg."""
+    global _async_engine
+    if _async_engine is None:
+        url = _async_url()
+        _async_engine = make_async_engine(url, role="writer" if _use_sqlite_profile(url) else "primary")
+    return _async_engine
+
+
+def get_async_read_engine():
+    global _async_read_engine
+    if _async_read_engine is None:
+        url = _async_url()
+        _async_read_engine = make_async_engine(url, role="reader") if _use_sqlite_profile(url) else get_async_engine()
+    return _async_read_engine
+
+
+def replica_configured() -> bool:
+    return replica_engine is not None
+
+
+def get_async_replica_engine():
+    global _async_replica_engine
+    if _async_replica_engine is None:
+        url = settings.ASYNC_REPLICA_DATABASE_URL or to_async_url(settings.REPLICA_DATABASE_URL)
+        _async_replica_engine = make_async_engine(url, role="replica")
+    return _async_replica_engine
 
-engine = sqlmodel.create_engine("sqlite:///database.db", echo=False)
 
 def init_db():
     """Initialize the database."""
     SQLModel.metadata.create_all(engine)
+    run_migrations(engine)
+
+
+async def dispose_engines():
+    global _async_engine, _async_read_engine, _async_replica_engine
+    for async_engine in {_async_engine, _async_read_engine, _async_replica_engine} - {None}:
+        await async_engine.dispose()
+    _async_engine = _async_read_engine = _async_replica_engine = None
+    engine.dispose()
+    read_engine.dispose()
+    if replica_engine is not None:
+        replica_engine.dispose()
+    dispose_archive_engines()
+
+
+def dispose_after_fork() -> None:
+    """Drop pooled connections inherited from a parent process without closing them.
+
+    Called in each forked server worker: the parent's sockets/file handles stay the parent's,
+    and the child opens its own on first use. Async engines are dropped too; they are bound
+    to the parent's event loop and get rebuilt lazily.
+    """
+    global _async_engine, _async_read_engine, _async_replica_engine
+    for sync_engine in {engine, read_engine, replica_engine} - {None}:
+        sync_engine.dispose(close=False)
+    for async_engine in {_async_engine, _async_read_engine, _async_replica_engine} - {None}:
+        async_engine.sync_engine.dispose(close=False)
+    _async_engine = _async_read_engine = _async_replica_engine = None
+    dispose_archive_engines(close=False)
+
+
+# --- Sync-mode connection slots ---
+# In sync mode a session keeps its connections across threadpool hops until its transaction
+# ends. Threads left to wait on an exhausted pool can all end up parked behind sessions that
+# need a thread to commit (with the SQLite profile's single writer connection, any burst
+# larger than THREADPOOL_SIZE did). So SyncSessionAdapter first takes a slot for each engine
+# a call may use, waiting on the event loop; slots match the pool sizes and are always taken
+# reader before writer.
+
+_pool_slots: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()  # event loop -> {engine: Semaphore}
+
+
+def _slots(sync_engine) -> Optional[asyncio.Semaphore]:
+    limit = _pool_limits.get(sync_engine)
+    if limit is None:
+        return None
+    slots = _pool_slots.setdefault(asyncio.get_running_loop(), {})
+    if sync_engine not in slots:
+        slots[sync_engine] = asyncio.Semaphore(limit)
+    return slots[sync_engine]
+
+
+class SyncSessionAdapter:
+    """Awaitable facade over a sync ``Session``.
+
+    Mirrors the subset of ``AsyncSession`` the routers use, running each blocking call in
+    the threadpool, so the same ``async def`` handlers work in both DB modes. Connection slots
+    (see above) are held from the first call that may use an engine until the transaction
+    has let go of its connection.
+    """
+
+    def __init__(self, session: Session) -> None:
+        self.sync_session = session
+        self._reader = session.bind
+        self._writer = getattr(session, "writer", None)
+        self._held: Dict[object, asyncio.Semaphore] = {}
+
+    @property
+    def bind(self):
+        return self.sync_session.bind
+
+    @property
+    def info(self) -> dict:
+        return self.sync_session.info
+
+    def add(self, instance) -> None:
+        self.sync_session.add(instance)
+
+    def add_all(self, instances) -> None:
+        self.sync_session.add_all(instances)
+
+    def _may_write(self, statement=None) -> bool:
+        session = self.sync_session
+        # Pending objects are flushed by autoflush before any query, so a SELECT writes too.
+        return isinstance(statement, UpdateBase) or bool(session.new or session.deleted or session.dirty)
+
+    async def _take(self, sync_engine) -> None:
+        if sync_engine is None or sync_engine in self._held:
+            return
+        slots = _slots(sync_engine)
+        if slots is not None:
+            await slots.acquire()
+            self._held[sync_engine] = slots
+
+    def _release(self) -> None:
+        session = self.sync_session
+        for sync_engine in list(self._held):
+            if not session.in_transaction() or (sync_engine is self._writer and not session.writing):
+                self._held.pop(sync_engine).release()
+
+    async def _call(self, reads: bool, writes: bool, fn, *args, **kwargs):
+        if reads or writes:
+            await self._take(self._reader)
+        if writes:
+            await self._take(self._writer)
+        try:
+            return await run_in_threadpool(fn, *args, **kwargs)
+        finally:
+            self._release()
+
+    async def exec(self, statement, **kwargs):
+        return await self._call(True, self._may_write(statement), self.sync_session.exec, statement, **kwargs)
+
+    async def execute(self, statement, *args, **kwargs):
+        return await self._call(True, self._may_write(statement), self.sync_session.execute, statement, *args, **kwargs)
+
+    async def scalar(self, statement, *args, **kwargs):
+        return await self._call(True, self._may_write(statement), self.sync_session.scalar, statement, *args, **kwargs)
+
+    async def get(self, entity, ident, **kwargs):
+        return await self._call(True, self._may_write(), self.sync_session.get, entity, ident, **kwargs)
+
+    async def flush(self, objects=None) -> None:
+        await self._call(False, self._may_write(), self.sync_session.flush, objects)
+
+    async def commit(self) -> None:
+        await self._call(False, self._may_write(), self.sync_session.commit)
+
+    async def rollback(self) -> None:
+        await self._call(False, False, self.sync_session.rollback)
+
+    async def refresh(self, instance, attribute_names=None) -> None:
+        await self._call(True, self._may_write(), self.sync_session.refresh, instance, attribute_names)
+
+    async def delete(self, instance) -> None:
+        await self._call(False, False, self.sync_session.delete, instance)
+
+    async def run_sync(self, fn, *args, **kwargs):
+        return await self._call(True, True, fn, self.sync_session, *args, **kwargs)
+
+    async def close(self) -> None:
+        await self._call(False, False, self.sync_session.close)
+
+
+def make_sync_session() -> Session:
+    if read_engine is engine:
+        return Session(engine, expire_on_commit=False)
+    return RoutingSession(read_engine, writer=engine, expire_on_commit=False)
+
+
+def make_async_session() -> AsyncSession:
+    async_engine, async_read_engine = get_async_engine(), get_async_read_engine()
+    if async_read_engine is async_engine:
+        return AsyncSession(async_engine, expire_on_commit=False)
+    return AsyncSession(
+        async_read_engine,
+        sync_session_class=RoutingSession,
+        writer=async_engine.sync_engine,
+        expire_on_commit=False,
+    )
+
+
+# Replica sessions are tagged so the streaming helpers can stay on the replica too.
+
+def make_sync_replica_session() -> Session:
+    session = Session(replica_engine, expire_on_commit=False)
+    session.info["replica"] = True
+    return session
+
+
+def make_async_replica_session() -> AsyncSession:
+    session = AsyncSession(get_async_replica_engine(), expire_on_commit=False)
+    session.info["replica"] = True
+    return session
+
+
+def uses_replica(session) -> bool:
+    return session.info.get("replica", False)
+
+
+async def get_session():
+    if settings.DB_MODE == "sync":
+        session = SyncSessionAdapter(make_sync_session())
+        try:
+            yield session
+        finally:
+            await session.close()
+    else:
+        async with make_async_session() as session:
+            yield session
+
+
+# The same session outside a request, e.g. for background jobs: ``async with open_session()``.
+open_session = asynccontextmanager(get_session)
+
+
+async def get_replica_session():
+    """Like ``get_session`` but on the replica; only use when ``replica_configured()``."""
+    if settings.DB_MODE == "sync":
+        session = SyncSessionAdapter(make_sync_replica_session())
+        try:
+            yield session
+        finally:
+            await session.close()
+    else:
+        async with make_async_replica_session() as session:
+            yield session
+
+
+# --- Read-your-writes ---
+# A session learns its caller from auth_utils (``info["user_id"]``); once it commits a write,
+# that user's reads stay on the primary for READ_YOUR_WRITES_SECONDS so they never see the
+# replica lagging behind their own change. Workers share no memory, so the write is also
+# handed back to the client as a short-lived signed cookie (``ReadYourWritesMiddleware``),
+# which keeps the caller's next read on the primary whichever worker serves it.
+
+WROTE_AT_COOKIE = "wrote_at"
+_recent_writers = TTLCache(maxsize=settings.AUTH_USER_CACHE_SIZE, ttl=settings.READ_YOUR_WRITES_SECONDS)
+# Per request: the id of the user whose write committed, if any; set by the middleware.
+_request_writer: ContextVar[Optional[dict]] = ContextVar("request_writer", default=None)
+
+
+def _sign(value: str) -> str:
+    return hmac.new(settings.JWT_SECRET_KEY.encode(), value.encode(), hashlib.sha256).hexdigest()[:32]
+
+
+def wrote_at_cookie(user_id: int, at: float) -> str:
+    value = f"{user_id}.{int(at * 1000)}"
+    return f"{value}.{_sign(value)}"
+
+
+def wrote_recently(user_id: int, cookie: Optional[str] = None) -> bool:
+    """Whether ``user_id`` committed a write within READ_YOUR_WRITES_SECONDS, in this process
+    or, per the request's ``wrote_at`` cookie, in any."""
+    if _recent_writers.get(user_id, False):
+        return True
+    if not cookie or cookie.count(".") != 2:
+        return False
+    value, signature = cookie.rsplit(".", 1)
+    cookie_user, millis = value.split(".")
+    if cookie_user != str(user_id) or not millis.isdigit() or not hmac.compare_digest(signature, _sign(value)):
+        return False
+    return 0 <= time.time() - int(millis) / 1000 < settings.READ_YOUR_WRITES_SECONDS
+
+
+class ReadYourWritesMiddleware:
+    """Pure ASGI middleware: sets the ``wrote_at`` cookie on responses to requests that
+    committed a write for a signed-in user."""
+
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        writer: dict = {}
+        token = _request_writer.set(writer)
+
+        async def send_wrapper(message) -> None:
+            if message["type"] == "http.response.start" and "user_id" in writer:
+                cookie = (
+                    f"{WROTE_AT_COOKIE}={wrote_at_cookie(writer['user_id'], time.time())}; "
+                    f"Max-Age={math.ceil(settings.READ_YOUR_WRITES_SECONDS)}; Path=/; HttpOnly; SameSite=Lax"
+                )
+                message["headers"] = [*message.get("headers", []), (b"set-cookie", cookie.encode())]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _request_writer.reset(token)
+
+
+@event.listens_for(OrmSession, "do_orm_execute")
+def _track_dml(state) -> None:
+    if state.is_insert or state.is_update or state.is_delete:
+        state.session.info["wrote"] = True
+
+
+@event.listens_for(OrmSession, "after_flush")
+def _track_flush(session, flush_context) -> None:
+    session.info["wrote"] = True
+
+
+@event.listens_for(OrmSession, "after_commit")
+def _remember_writer(session) -> None:
+    if session.info.pop("wrote", False) and session.info.get("user_id") is not None:
+        _recent_writers.set(session.info["user_id"], True)
+        writer = _request_writer.get()
+        if writer is not None:
+            writer["user_id"] = session.info["user_id"]
+
+
+@event.listens_for(OrmSession, "after_soft_rollback")
+def _forget_write(session, previous_transaction) -> None:
+    session.info.pop("wrote", None)
+
+
+async def stream_partitions(statement, chunk_size: int = 500, scalars: bool = True, replica: bool = False):
+    """Yield lists of up to ``chunk_size`` results from a server-side cursor.
+
+    Results are ORM objects when ``scalars``, otherwise ``Row`` tuples. Opens its own session
+    (on the replica when ``replica``) because streaming responses outlive the request's
+    dependencies.
+    """
+    statement = statement.execution_options(yield_per=chunk_size)
+    if settings.DB_MODE == "sync":
+        session = make_sync_replica_session() if replica else make_sync_session()
+        slots = _slots(session.bind)
+        if slots is not None:
+            await slots.acquire()
+        try:
+            result = await run_in_threadpool(session.scalars if scalars else session.execute, statement)
+            partitions = result.partitions()
+            while True:
+                chunk = await run_in_threadpool(next, partitions, None)
+                if chunk is None:
+                    break
+                yield chunk
+        finally:
+            await run_in_threadpool(session.close)
+            if slots is not None:
+                slots.release()
+    else:
+        async with (make_async_replica_session() if replica else make_async_session()) as session:
+            result = await (session.stream_scalars if scalars else session.stream)(statement)
+            async for chunk in result.partitions():
+                yield chunk
+
 
-def get_session():
-    with Session(engine) as session:
-        yield session
\ No newline at end of file
+async def stream_scalars(statement, chunk_size: int = 500, replica: bool = False):
+    """Yield ORM objects from a server-side cursor, ``chunk_size`` rows at a time."""
+    async for chunk in stream_partitions(statement, chunk_size, replica=replica):
+        for row in chunk:
+            yield row
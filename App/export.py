@@ -0,0 +1,442 @@
+"""Columnar export of orders joined with their payment and restaurant, and offline reports.
+
+Finance pulls full history from here instead of paging the API and re-joining: rows come off
+a server-side cursor ``EXPORT_CHUNK_SIZE`` at a time and each chunk is written as one CSV
+block, Arrow IPC record batch or Parquet row group (the last two need ``pyarrow``). Enum
+columns are dictionary-encoded with the enum's full value list, so every batch shares one
+dictionary and pandas reads them as categoricals.
+
+Every export is bounded by a watermark: the ``(created_at, order_id)`` of the newest order
+at least EXPORT_SETTLE_SECONDS old when it started (younger ones may still be joined by
+slower transactions carrying older timestamps), returned opaque (same encoding as the keyset cursors). Passing it
+back as ``since`` exports only the orders after it, via ``ix_orders_created_at``. Archived
+months (App.partitions) after ``since`` are read from their files first, oldest first.
+
+``daily_revenue`` / ``items_summary`` recompute the ``/analytics`` reports over exported
+columns with NumPy, so re-aggregation runs off the OLTP database.
+
+    python -m App.export dump --format parquet --out orders.parquet [--since WATERMARK]
+    python -m App.export report orders.parquet [more files...] [--days 7] [--restaurant-id 3]
+"""
+import argparse
+import asyncio
+import csv
+import datetime
+import io
+import json
+import sys
+from collections import defaultdict
+from typing import AsyncIterator, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import select, tuple_
+from starlette.concurrency import run_in_threadpool
+
+from App.models import (
+    Orders,
+    Payments,
+    Restaurants,
+    PaymentStatus,
+    PaymentType,
+    OrderFoodItem,
+    RestaurantAreaName,
+)
+from App.pagination import decode_cursor, encode_cursor
+from App.partitions import archive_rows, archived_file_names, archived_files, stream_archived
+from App.schemas import DailyRevenue, ItemCount
+from App.settings import settings
+
+
+FORMATS = ("csv", "arrow", "parquet")
+MEDIA_TYPES = {
+    "csv": "text/csv",
+    "arrow": "application/vnd.apache.arrow.stream",
+    "parquet": "application/vnd.apache.parquet",
+}
+WATERMARK_HEADER = "X-Export-Watermark"
+
+EXPORT_COLUMNS = {
+    "order_id": Orders.order_id,
+    "created_at": Orders.created_at,
+    "customer_id": Orders.customer_id,
+    "restaurant_id": Orders.restaurant_id,
+    "restaurant_name": Restaurants.name,
+    "area": Restaurants.area,
+    "item_name": Orders.item_name,
+    "transaction_id": Orders.transaction_id,
+    "payment_status": Payments.status,
+    "payment_type": Payments.payment_type,
+    "amount": Payments.amount,
+    "currency": Payments.currency,
+}
+ENUM_COLUMNS = {
+    "area": RestaurantAreaName,
+    "item_name": OrderFoodItem,
+    "payment_status": PaymentStatus,
+    "payment_type": PaymentType,
+}
+
+Watermark = Tuple[datetime.datetime, int]
+
+
+def _require(module: str, fmt: str):
+    try:
+        return __import__(module, fromlist=["_"])
+    except ImportError as exc:
+        raise RuntimeError(f"format={fmt} requires the '{module.split('.')[0]}' package") from exc
+
+
+def check_format(fmt: str) -> None:
+    """Raise ``RuntimeError`` when ``fmt`` needs a package that isn't installed."""
+    if fmt in ("arrow", "parquet"):
+        _require("pyarrow.parquet" if fmt == "parquet" else "pyarrow", fmt)
+
+
+# --- Watermarks ---
+
+def encode_watermark(watermark: Optional[Watermark]) -> str:
+    return encode_cursor("created_at", *watermark) if watermark else ""
+
+
+def decode_watermark(token: Optional[str]) -> Optional[Watermark]:
+    """Parse a watermark from a previous export (``HTTPException(400)`` when malformed)."""
+    if not token:
+        return None
+    try:
+        return decode_cursor(token, "created_at")
+    except HTTPException:
+        raise HTTPException(status_code=400, detail="Invalid watermark")
+
+
+def next_watermark(since: Optional[Watermark], upto: Optional[Watermark]) -> Optional[Watermark]:
+    """The watermark to hand back after exporting ``(since, upto]``."""
+    if upto is None or (since is not None and since >= upto):
+        return since
+    return upto
+
+
+def export_statement(since: Optional[Watermark] = None, upto: Optional[Watermark] = None):
+    """Orders in ``(since, upto]`` joined with payment and restaurant, oldest first."""
+    key = tuple_(Orders.created_at, Orders.order_id)
+    stmt = (
+        select(*EXPORT_COLUMNS.values())
+        .join(Payments, Payments.transaction_id == Orders.transaction_id)
+        .join(Restaurants, Restaurants.restaurant_id == Orders.restaurant_id)
+        .order_by(Orders.created_at, Orders.order_id)
+    )
+    if since:
+        stmt = stmt.where(key > tuple_(*since))
+    if upto:
+        stmt = stmt.where(key <= tuple_(*upto))
+    return stmt
+
+
+async def current_watermark(session, now: Optional[datetime.datetime] = None) -> Optional[Watermark]:
+    """``(created_at, order_id)`` of the newest order older than EXPORT_SETTLE_SECONDS, read
+    from the end of the index.
+
+    ``created_at`` is set before the insert commits, so a slow transaction can make a row
+    visible after a newer one; newer rows are left to the next export until they settle.
+    """
+    settled = (now or datetime.datetime.utcnow()) - datetime.timedelta(seconds=settings.EXPORT_SETTLE_SECONDS)
+    newest = (
+        select(Orders.created_at, Orders.order_id)
+        .where(Orders.created_at <= settled)
+        .order_by(Orders.created_at.desc(), Orders.order_id.desc())
+        .limit(1)
+    )
+    row = (await session.exec(newest)).first()
+    if row is None:
+        # No live orders: the newest one may be in the latest archived month.
+        for file_name in reversed(await archived_files(session)):
+            row = next(iter(await run_in_threadpool(archive_rows, file_name, newest)), None)
+            if row is not None:
+                break
+    return tuple(row) if row else None
+
+
+def _archived_since(since: Optional[Watermark]) -> List[str]:
+    from App.database import read_engine
+
+    with read_engine.connect() as connection:
+        return archived_file_names(connection, since[0] if since else None)
+
+
+async def export_batches(
+    since: Optional[Watermark], upto: Optional[Watermark], chunk_size: Optional[int] = None, replica: bool = False
+) -> AsyncIterator[Dict[str, tuple]]:
+    """Yield ``{column: values}`` for each chunk of the server-side cursor."""
+    from App.database import stream_partitions
+
+    if next_watermark(since, upto) == since:
+        return
+    names = list(EXPORT_COLUMNS)
+    stmt = export_statement(since, upto)
+    chunk_size = chunk_size or settings.EXPORT_CHUNK_SIZE
+    # Archived months are all older than the live tables' rows.
+    files = await run_in_threadpool(_archived_since, since)
+    async for rows in stream_archived(stmt, files, chunk_size):
+        yield dict(zip(names, zip(*rows)))
+    async for rows in stream_partitions(stmt, chunk_size, scalars=False, replica=replica):
+        yield dict(zip(names, zip(*rows)))
+
+
+# --- Writers: write(batch) / finish() return the bytes to emit next ---
+
+class CsvWriter:
+    def __init__(self) -> None:
+        self._buffer = io.StringIO()
+        self._writer = csv.writer(self._buffer)
+        self._writer.writerow(EXPORT_COLUMNS)
+
+    def _take(self) -> bytes:
+        data = self._buffer.getvalue().encode()
+        self._buffer.seek(0)
+        self._buffer.truncate()
+        return data
+
+    def write(self, batch: Dict[str, tuple]) -> bytes:
+        columns = []
+        for name, values in batch.items():
+            if name in ENUM_COLUMNS:
+                values = [value.value for value in values]
+            elif name == "created_at":
+                values = [value.isoformat() for value in values]
+            columns.append(values)
+        self._writer.writerows(zip(*columns))
+        return self._take()
+
+    def finish(self) -> bytes:
+        return self._take()
+
+
+class _Drain(io.RawIOBase):
+    """Write-only sink whose bytes are handed out after each batch instead of buffered to the end."""
+
+    def __init__(self) -> None:
+        self._chunks: List[bytes] = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def take(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+class ArrowWriter:
+    """Arrow IPC stream (``fmt="arrow"``) or Parquet, one record batch / row group per chunk."""
+
+    def __init__(self, fmt: str) -> None:
+        self.pa = pa = _require("pyarrow", fmt)
+        types = {
+            "created_at": pa.timestamp("us", tz="UTC"),
+            "restaurant_name": pa.string(),
+            "amount": pa.float64(),
+            "currency": pa.string(),
+            **{name: pa.dictionary(pa.int8(), pa.string()) for name in ENUM_COLUMNS},
+        }
+        self.schema = pa.schema([(name, types.get(name, pa.int64())) for name in EXPORT_COLUMNS])
+        self._dictionaries = {name: pa.array([member.value for member in enum]) for name, enum in ENUM_COLUMNS.items()}
+        self._codes = {name: {member: i for i, member in enumerate(enum)} for name, enum in ENUM_COLUMNS.items()}
+        self._sink = _Drain()
+        if fmt == "parquet":
+            self._writer = _require("pyarrow.parquet", fmt).ParquetWriter(self._sink, self.schema, compression="zstd")
+        else:
+            self._writer = pa.ipc.new_stream(self._sink, self.schema)
+
+    def _array(self, name: str, values: tuple):
+        pa = self.pa
+        if name in ENUM_COLUMNS:
+            codes = self._codes[name]
+            return pa.DictionaryArray.from_arrays(pa.array([codes[v] for v in values], pa.int8()), self._dictionaries[name])
+        return pa.array(values, self.schema.field(name).type)
+
+    def write(self, batch: Dict[str, tuple]) -> bytes:
+        arrays = [self._array(field.name, batch[field.name]) for field in self.schema]
+        self._writer.write(self.pa.RecordBatch.from_arrays(arrays, schema=self.schema))
+        return self._sink.take()
+
+    def finish(self) -> bytes:
+        self._writer.close()
+        return self._sink.take()
+
+
+def make_writer(fmt: str):
+    if fmt not in FORMATS:
+        raise ValueError(f"format must be one of {', '.join(FORMATS)}")
+    return CsvWriter() if fmt == "csv" else ArrowWriter(fmt)
+
+
+async def export_bytes(
+    fmt: str, since: Optional[Watermark], upto: Optional[Watermark], replica: bool = False
+) -> AsyncIterator[bytes]:
+    """The encoded export of ``(since, upto]``, chunk by chunk."""
+    writer = make_writer(fmt)
+    async for batch in export_batches(since, upto, replica=replica):
+        data = writer.write(batch)
+        if data:
+            yield data
+    yield writer.finish()
+
+
+# --- Offline reports over exported columns (NumPy) ---
+
+def _numpy():
+    try:
+        import numpy
+    except ImportError as exc:
+        raise RuntimeError("offline reports require the 'numpy' package") from exc
+    return numpy
+
+
+def read_columns(paths: Sequence[str], names: Iterable[str]) -> dict:
+    """Load ``names`` from exported CSV/Arrow/Parquet files as NumPy arrays (files concatenated)."""
+    np = _numpy()
+    names = list(names)
+    parts = defaultdict(list)
+    for path in paths:
+        if path.endswith(".csv"):
+            with open(path, newline="") as f:
+                reader = csv.reader(f)
+                header = next(reader)
+                index = [header.index(name) for name in names]
+                rows = list(reader)
+            for name, i in zip(names, index):
+                parts[name].append([row[i] for row in rows])
+            continue
+        pa = _require("pyarrow", "arrow")
+        if path.endswith(".parquet"):
+            table = _require("pyarrow.parquet", "parquet").read_table(path, columns=names)
+        else:
+            with pa.OSFile(path) as f:
+                table = pa.ipc.open_stream(f).read_all().select(names)
+        for name in names:
+            column = table.column(name)
+            if pa.types.is_dictionary(column.type):
+                column = column.cast(pa.string())
+            elif pa.types.is_timestamp(column.type):
+                column = column.cast(pa.timestamp("us"))
+            parts[name].append(column.to_numpy())
+
+    dtypes = {"created_at": "datetime64[us]", "amount": "float64", "restaurant_id": "int64"}
+    columns = {}
+    for name in names:
+        arrays = [np.asarray(part, dtype=dtypes.get(name, object)) for part in parts[name]]
+        columns[name] = np.concatenate(arrays) if arrays else np.empty(0, dtypes.get(name, object))
+    return columns
+
+
+REPORT_COLUMNS = ("created_at", "area", "restaurant_id", "item_name", "payment_status", "amount")
+
+
+def daily_revenue(columns: dict, start: Optional[datetime.date] = None) -> List[DailyRevenue]:
+    """``/analytics/daily-revenue`` over exported columns: PASS revenue per day x area."""
+    np = _numpy()
+    days = columns["created_at"].astype("datetime64[D]")
+    mask = columns["payment_status"] == PaymentStatus.PASS.value
+    if start is not None:
+        mask &= days >= np.datetime64(start, "D")
+    day_values, day_index = np.unique(days[mask], return_inverse=True)
+    area_values, area_index = np.unique(columns["area"][mask], return_inverse=True)
+    groups = day_index * len(area_values) + area_index
+    size = len(day_values) * len(area_values)
+    # Sum in integer cents like the rollups; float64 holds them exactly up to 2**53.
+    cents = np.rint(columns["amount"][mask] * 100)
+    totals = np.bincount(groups, weights=cents, minlength=size)
+    counts = np.bincount(groups, minlength=size)
+    return [
+        DailyRevenue(
+            date=str(day_values[group // len(area_values)]),
+            area=area_values[group % len(area_values)],
+            total_amount=round(totals[group] / 100, 2),
+            currency="INR",
+        )
+        for group in np.flatnonzero(counts)
+    ]
+
+
+def items_summary(columns: dict, restaurant_ids: Optional[Sequence[int]] = None) -> Dict[int, List[ItemCount]]:
+    """``/analytics/restaurant/{id}/items-summary`` (all statuses) for every restaurant at once."""
+    np = _numpy()
+    restaurants, items = columns["restaurant_id"], columns["item_name"]
+    if restaurant_ids:
+        mask = np.isin(restaurants, restaurant_ids)
+        restaurants, items = restaurants[mask], items[mask]
+    item_values, item_index = np.unique(items, return_inverse=True)
+    restaurant_values, restaurant_index = np.unique(restaurants, return_inverse=True)
+    counts = np.bincount(
+        restaurant_index * len(item_values) + item_index, minlength=len(restaurant_values) * len(item_values)
+    ).reshape(len(restaurant_values), len(item_values))
+    # Same order as the endpoint, which groups on the stored enum name.
+    order = sorted(range(len(item_values)), key=lambda i: OrderFoodItem(item_values[i]).name)
+    return {
+        int(restaurant_id): [
+            ItemCount(item_name=item_values[i], count=int(row[i])) for i in order if row[i]
+        ]
+        for restaurant_id, row in zip(restaurant_values, counts)
+    }
+
+
+# --- CLI ---
+
+async def _dump(args) -> str:
+    from App.database import make_async_session, dispose_engines
+
+    try:
+        since = decode_watermark(args.since)
+        async with make_async_session() as session:
+            upto = await current_watermark(session)
+        with open(args.out, "wb") as f:
+            async for data in export_bytes(args.format, since, upto):
+                f.write(data)
+    finally:
+        await dispose_engines()
+    return encode_watermark(next_watermark(since, upto))
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Export orders for offline analysis and report over exports.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    dump = commands.add_parser("dump", help="write orders after --since to --out")
+    dump.add_argument("--format", choices=FORMATS, default="parquet")
+    dump.add_argument("--out", required=True)
+    dump.add_argument("--since", help="watermark printed by a previous dump")
+    report = commands.add_parser("report", help="daily revenue and items summaries from exported files")
+    report.add_argument("paths", nargs="+")
+    report.add_argument("--days", type=int, default=7, help="daily revenue for the last N days (0: all)")
+    report.add_argument("--restaurant-id", type=int, action="append")
+    args = parser.parse_args(argv)
+
+    if args.command == "dump":
+        check_format(args.format)
+        watermark = asyncio.run(_dump(args))
+        print(f"watermark {watermark}")
+        return 0
+
+    columns = read_columns(args.paths, REPORT_COLUMNS)
+    start = datetime.datetime.utcnow().date() - datetime.timedelta(days=args.days - 1) if args.days else None
+    result = {
+        "daily_revenue": [row.model_dump(mode="json") for row in daily_revenue(columns, start)],
+        "items_summary": {
+            restaurant_id: [row.model_dump(mode="json") for row in rows]
+            for restaurant_id, rows in items_summary(columns, args.restaurant_id).items()
+        },
+    }
+    json.dump(result, sys.stdout, indent=2)
+    print()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
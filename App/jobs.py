@@ -0,0 +1,327 @@
+"""Background jobs: work a request can hand off once its transaction has committed.
+
+Handlers register a job *kind*. ``job_queue.enqueue(kind, payload)`` puts a job on a bounded
+asyncio queue, drained by JOB_WORKERS tasks in batches of up to JOB_BATCH_SIZE jobs grouped by
+kind, so a burst of orders turns into one round of rollup upserts. A failed batch is bisected
+down to the failing jobs, which are retried with exponential backoff up to JOB_MAX_ATTEMPTS.
+
+*Durable* kinds go through the ``outbox`` table: ``stage`` adds the job to the caller's
+transaction, ``job_queue.submit`` queues it after the commit, and the handler runs in a
+transaction that also deletes the job's row, so a job is applied once even when several
+processes pick it up. Rows left behind by a crash, a full queue or a shutdown that didn't
+drain are re-queued at startup and by the periodic sweeper.
+
+The queue is started and drained by ``main.lifespan``. While it isn't running
+(JOB_QUEUE_ENABLED off, or no lifespan, e.g. under a bare ``ASGITransport``) jobs run inline
+before ``enqueue``/``submit`` return.
+"""
+import asyncio
+import datetime
+import json
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set
+
+from sqlalchemy import delete, select, update
+
+from App.cache import ANALYTICS_NAMESPACE, response_cache
+from App.metrics import JOB_BATCH_SIZE, JOB_QUEUE_DEPTH, JOB_SECONDS, JOBS_TOTAL
+from App.models import Outbox
+from App.settings import settings
+
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class JobKind:
+    name: str
+    # Durable kinds: ``handle(sync_session, payloads)``, in the transaction that deletes their
+    # outbox rows. Others: ``await handle(payloads)``.
+    handle: Callable
+    durable: bool = False
+    # Awaited after a batch succeeded (for durable kinds, after its commit).
+    after: Optional[Callable[[], Awaitable[None]]] = None
+
+
+KINDS: Dict[str, JobKind] = {}
+
+
+def register(name: str, handle: Callable, durable: bool = False, after=None) -> JobKind:
+    kind = KINDS[name] = JobKind(name, handle, durable, after)
+    return kind
+
+
+@dataclass(eq=False)
+class Job:
+    kind: str
+    payload: Any = None
+    outbox_id: Optional[int] = None
+    attempts: int = 0
+    enqueued_at: float = field(default_factory=time.perf_counter)
+
+
+def stage(session, kind: str, payload) -> Outbox:
+    """Add a durable job to the caller's (uncommitted) transaction; ``submit`` it after the commit."""
+    row = Outbox(kind=kind, payload=json.dumps(payload))
+    session.add(row)
+    return row
+
+
+def _job(row: Outbox) -> Job:
+    return Job(row.kind, json.loads(row.payload), row.id, row.attempts)
+
+
+# --- Outbox transactions ---
+
+def _claim_and_handle(session, kind: JobKind, jobs: Dict[int, Job]) -> List[Job]:
+    table = Outbox.__table__
+    ids = session.execute(delete(table).where(table.c.id.in_(list(jobs))).returning(table.c.id)).scalars().all()
+    # Rows another process (or an earlier run) already handled are gone and aren't redone.
+    claimed = [jobs[ident] for ident in sorted(ids)]
+    if claimed:
+        kind.handle(session, [job.payload for job in claimed])
+    session.commit()
+    return claimed
+
+
+async def _handle_durable(kind: JobKind, jobs: List[Job]) -> List[Job]:
+    from App.database import open_session
+
+    async with open_session() as session:
+        return await session.run_sync(_claim_and_handle, kind, {job.outbox_id: job for job in jobs})
+
+
+def _record_failure(session, outbox_id: int, error: str) -> None:
+    session.execute(
+        update(Outbox)
+        .where(Outbox.id == outbox_id)
+        .values(attempts=Outbox.attempts + 1, last_error=error[:2000])
+    )
+    session.commit()
+
+
+def _pending_rows(session, cutoff: Optional[datetime.datetime], after_id: int, limit: int) -> List[Outbox]:
+    stmt = select(Outbox).where(
+        Outbox.id > after_id, Outbox.kind.in_(list(KINDS)), Outbox.attempts < settings.JOB_MAX_ATTEMPTS
+    )
+    if cutoff is not None:
+        stmt = stmt.where(Outbox.created_at <= cutoff)
+    return list(session.scalars(stmt.order_by(Outbox.id).limit(limit)))
+
+
+async def _in_session(fn, *args):
+    from App.database import open_session
+
+    async with open_session() as session:
+        return await session.run_sync(fn, *args)
+
+
+# --- Queue ---
+
+class JobQueue:
+    def __init__(self) -> None:
+        self.running = False
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        # Outbox ids this process has queued, in flight or waiting for a retry.
+        self._held: Set[int] = set()
+
+    async def start(self) -> None:
+        """Start the workers and the outbox sweeper, which first re-queues leftover rows."""
+        if self.running:
+            return
+        self._queue = asyncio.Queue(settings.JOB_QUEUE_SIZE)
+        self.running = True
+        self._tasks = [asyncio.create_task(self._work()) for _ in range(settings.JOB_WORKERS)]
+        self._tasks.append(asyncio.create_task(self._sweep()))
+
+    async def stop(self) -> None:
+        """Stop taking jobs and wait up to JOB_DRAIN_TIMEOUT for the queued ones."""
+        if not self.running:
+            return
+        self.running = False
+        self._tasks[-1].cancel()  # the sweeper
+        try:
+            await asyncio.wait_for(self._queue.join(), settings.JOB_DRAIN_TIMEOUT)
+        except TimeoutError:
+            logger.warning("job queue not drained, %d job(s) dropped (durable ones stay in the outbox)", self._queue.qsize())
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._held.clear()
+        JOB_QUEUE_DEPTH.set(0)
+
+    async def join(self) -> None:
+        """Wait until every queued job has been handled (retries still pending aside)."""
+        if self.running:
+            await self._queue.join()
+
+    def depth(self) -> int:
+        return self._queue.qsize() if self.running else 0
+
+    async def enqueue(self, kind: str, payload=None) -> None:
+        """Queue a non-durable job, or run it now when the queue isn't running."""
+        await self._put(Job(kind, payload))
+
+    async def submit(self, row: Optional[Outbox]) -> None:
+        """Queue a committed outbox row from ``stage``; ``None`` is a no-op."""
+        if row is not None:
+            await self._put(_job(row))
+
+    async def _put(self, job: Job) -> None:
+        if not self.running:
+            await self._run(job.kind, [job])
+            return
+        if job.outbox_id is not None:
+            self._held.add(job.outbox_id)
+        try:
+            self._queue.put_nowait(job)
+        except asyncio.QueueFull:
+            # Backpressure: the producer waits for room, then gives up on queueing the job.
+            try:
+                await asyncio.wait_for(self._queue.put(job), settings.JOB_ENQUEUE_TIMEOUT)
+            except TimeoutError:
+                if job.outbox_id is not None:
+                    self._held.discard(job.outbox_id)
+                    JOBS_TOTAL.inc(job.kind, "deferred")  # to the sweeper
+                else:
+                    JOBS_TOTAL.inc(job.kind, "inline")
+                    await self._run(job.kind, [job])
+                return
+        JOB_QUEUE_DEPTH.set(self._queue.qsize())
+
+    def _retry(self, job: Job) -> None:
+        if self.running:
+            try:
+                self._queue.put_nowait(job)
+                JOB_QUEUE_DEPTH.set(self._queue.qsize())
+                return
+            except asyncio.QueueFull:
+                pass
+        if job.outbox_id is not None:
+            self._held.discard(job.outbox_id)  # the sweeper or the next start retries it
+        else:
+            JOBS_TOTAL.inc(job.kind, "dropped")
+
+    async def _work(self) -> None:
+        queue = self._queue
+        while True:
+            batch = [await queue.get()]
+            if settings.JOB_BATCH_LINGER_MS > 0 and queue.qsize() < settings.JOB_BATCH_SIZE - 1:
+                await asyncio.sleep(settings.JOB_BATCH_LINGER_MS / 1000)
+            while len(batch) < settings.JOB_BATCH_SIZE and not queue.empty():
+                batch.append(queue.get_nowait())
+            JOB_QUEUE_DEPTH.set(queue.qsize())
+            groups: Dict[str, List[Job]] = {}
+            for job in batch:
+                groups.setdefault(job.kind, []).append(job)
+            try:
+                for name, jobs in groups.items():
+                    await self._run(name, jobs)
+            except Exception:
+                logger.exception("job worker error")
+            finally:
+                for _ in batch:
+                    queue.task_done()
+
+    async def _run(self, name: str, jobs: List[Job]) -> None:
+        """Handle one kind's batch; a failed batch is split until the failing jobs are alone,
+        and those are retried."""
+        kind = KINDS.get(name)
+        if kind is None:
+            logger.error("no handler registered for %d %r job(s)", len(jobs), name)
+            self._release(jobs)
+            JOBS_TOTAL.inc(name, "failed", amount=len(jobs))
+            return
+        JOB_BATCH_SIZE.observe(len(jobs), name)
+        try:
+            if kind.durable:
+                handled = await _handle_durable(kind, jobs)
+            else:
+                await kind.handle([job.payload for job in jobs])
+                handled = jobs
+        except Exception as exc:
+            if len(jobs) > 1:
+                # Bisect, so one bad job costs a few extra transactions, not one per job.
+                middle = len(jobs) // 2
+                await self._run(name, jobs[:middle])
+                await self._run(name, jobs[middle:])
+            else:
+                await self._failed(kind, jobs[0], exc)
+            return
+        finished = time.perf_counter()
+        for job in handled:
+            JOB_SECONDS.observe(finished - job.enqueued_at, name)
+        self._release(jobs)
+        JOBS_TOTAL.inc(name, "done", amount=len(handled))
+        if len(handled) < len(jobs):
+            JOBS_TOTAL.inc(name, "skipped", amount=len(jobs) - len(handled))
+        if kind.after is not None and handled:
+            try:
+                await kind.after()
+            except Exception:
+                logger.exception("%s: after-batch hook failed", name)
+
+    async def _failed(self, kind: JobKind, job: Job, exc: Exception) -> None:
+        job.attempts += 1
+        if job.outbox_id is not None:
+            try:
+                await _in_session(_record_failure, job.outbox_id, f"{type(exc).__name__}: {exc}")
+            except Exception:
+                logger.exception("%s: could not record the failure of outbox row %s", kind.name, job.outbox_id)
+        if self.running and job.attempts < settings.JOB_MAX_ATTEMPTS:
+            JOBS_TOTAL.inc(kind.name, "retried")
+            delay = settings.JOB_RETRY_BACKOFF * 2 ** (job.attempts - 1)
+            logger.warning("%s job failed (attempt %d), retrying in %.1fs: %s", kind.name, job.attempts, delay, exc)
+            asyncio.get_running_loop().call_later(delay, self._retry, job)
+            return
+        self._release([job])
+        JOBS_TOTAL.inc(kind.name, "failed")
+        logger.error("%s job failed (attempt %d)", kind.name, job.attempts, exc_info=exc)
+
+    def _release(self, jobs: List[Job]) -> None:
+        for job in jobs:
+            self._held.discard(job.outbox_id)
+
+    async def _sweep(self) -> None:
+        """Queue outbox rows nobody holds: all of them at startup, then every JOB_SWEEP_SECONDS
+        those older than that (jobs deferred by a full queue, or left by a dead process)."""
+        cutoff = None
+        while True:
+            after_id = 0
+            try:
+                while True:
+                    rows = await _in_session(_pending_rows, cutoff, after_id, settings.JOB_BATCH_SIZE)
+                    for row in rows:
+                        if row.id not in self._held:
+                            # Not on a request path, so this waits for room instead of deferring.
+                            self._held.add(row.id)
+                            await self._queue.put(_job(row))
+                            JOB_QUEUE_DEPTH.set(self._queue.qsize())
+                    if len(rows) < settings.JOB_BATCH_SIZE:
+                        break
+                    after_id = rows[-1].id
+            except Exception:
+                logger.exception("outbox sweep failed")
+            await asyncio.sleep(settings.JOB_SWEEP_SECONDS)
+            now = datetime.datetime.now(datetime.UTC).replace(tzinfo=None)
+            cutoff = now - datetime.timedelta(seconds=settings.JOB_SWEEP_SECONDS)
+
+
+job_queue = JobQueue()
+
+
+# --- Job kinds (rollup updates are registered by App.rollups) ---
+
+ANALYTICS_CACHE = "analytics_cache"
+
+
+async def invalidate_analytics(payloads=None) -> None:
+    """Drop cached analytics responses; a batch of invalidations collapses into one."""
+    await response_cache.invalidate(ANALYTICS_NAMESPACE)
+
+
+register(ANALYTICS_CACHE, invalidate_analytics)
@@ -0,0 +1,294 @@
+"""In-process customer leaderboard: orders per customer, all time and over the last 7/30 days.
+
+Each worker keeps every customer's order count in memory, ranked by (count desc, id), so the
+top N for any N is a slice instead of a GROUP BY + sort. The last 30 days are also kept as
+per-day buckets, from which the 7- and 30-day rankings are maintained and rebuilt when the
+day rolls over.
+
+The board is loaded once (live tables plus archived months, up to a high-water ``order_id``)
+and then caught up incrementally: before answering, it reads only the orders above its
+high-water mark (a primary-key range, usually a handful of rows) at most every
+LEADERBOARD_REFRESH_SECONDS, so every worker sees every worker's orders.
+
+Ids need not become visible in order: a Postgres sequence hands out an id at insert time, so a
+lower id can commit after a higher one. Ids missing below the high-water mark are therefore
+kept as gaps and read again on every catch-up until they show up, or until
+LEADERBOARD_GAP_SECONDS have passed (a rolled-back insert leaves a gap for good). The load
+reads its newest ``_MAX_GAPS`` ids the same way.
+
+    python -m App.leaderboard check   # compare against the full GROUP BY and customer_order_rollup
+"""
+import argparse
+import asyncio
+import bisect
+import datetime
+import sys
+import time
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import Date, func, or_, select, type_coerce
+
+from App.models import ArchivedMonths, CustomerOrderRollup, Orders
+from App.partitions import archived_files, partitioned_rows
+from App.settings import settings
+
+
+# Window name -> days (``None``: all time). A window of N days ends today (UTC).
+WINDOWS: Dict[str, Optional[int]] = {"all": None, "7d": 7, "30d": 30}
+_BUCKET_DAYS = max(days for days in WINDOWS.values() if days)
+# Most ids re-read as gaps; beyond it the oldest gaps are given up first.
+_MAX_GAPS = 10000
+
+
+class RankedCounts:
+    """Counts per customer, plus the same entries sorted by (-count, customer_id) so the top N
+    is a slice; an increment is two bisects and a list insert."""
+
+    def __init__(self, counts: Optional[Dict[int, int]] = None) -> None:
+        self.counts = {customer_id: count for customer_id, count in (counts or {}).items() if count > 0}
+        self._ranked = sorted((-count, customer_id) for customer_id, count in self.counts.items())
+
+    def add(self, customer_id: int, amount: int) -> None:
+        old = self.counts.get(customer_id, 0)
+        new = old + amount
+        if old:
+            del self._ranked[bisect.bisect_left(self._ranked, (-old, customer_id))]
+        if new > 0:
+            bisect.insort(self._ranked, (-new, customer_id))
+            self.counts[customer_id] = new
+        else:
+            self.counts.pop(customer_id, None)
+
+    def top(self, n: int) -> List[Tuple[int, int]]:
+        """``(customer_id, count)`` for the ``n`` customers with most orders, ties by id."""
+        return [(customer_id, -negative) for negative, customer_id in self._ranked[:n]]
+
+    def __len__(self) -> int:
+        return len(self.counts)
+
+
+def today() -> datetime.date:
+    return datetime.datetime.utcnow().date()
+
+
+def window_start(days: int, day: datetime.date) -> datetime.date:
+    return day - datetime.timedelta(days=days - 1)
+
+
+_DAY = type_coerce(func.date(Orders.created_at), Date)
+
+
+def _merge(parts: Iterable[list]) -> Dict[tuple, int]:
+    totals: Dict[tuple, int] = defaultdict(int)
+    for part in parts:
+        for *key, count in part:
+            totals[tuple(key)] += count
+    return totals
+
+
+async def _load_floor(session) -> int:
+    """The id a load aggregates up to: ``_MAX_GAPS`` below the newest live id, but never below
+    an archived id, since catch-ups only read the live tables."""
+    live = await session.scalar(select(func.max(Orders.order_id)))
+    archived = await session.scalar(select(func.max(ArchivedMonths.max_order_id)))
+    return max((live or 0) - _MAX_GAPS, archived or 0, 0)
+
+
+async def customer_counts(session, high_water: Optional[int] = None) -> Dict[int, int]:
+    """Orders per customer from the live tables and every archived month (the full GROUP BY)."""
+    stmt = select(Orders.customer_id, func.count(Orders.order_id)).group_by(Orders.customer_id)
+    if high_water is not None:
+        stmt = stmt.where(Orders.order_id <= high_water)
+    totals = _merge(await partitioned_rows(session, stmt, await archived_files(session)))
+    return {customer_id: count for (customer_id,), count in totals.items()}
+
+
+async def daily_counts(session, start: datetime.date, high_water: Optional[int] = None) -> Dict[tuple, int]:
+    """Orders per (customer, day) since ``start``, archived months included."""
+    since = datetime.datetime.combine(start, datetime.time())
+    # Filter on the raw column (sargable, uses ix_orders_created_at); bucket only in SELECT.
+    stmt = (
+        select(Orders.customer_id, _DAY, func.count(Orders.order_id))
+        .where(Orders.created_at >= since)
+        .group_by(Orders.customer_id, _DAY)
+    )
+    if high_water is not None:
+        stmt = stmt.where(Orders.order_id <= high_water)
+    return _merge(await partitioned_rows(session, stmt, await archived_files(session, since)))
+
+
+class Leaderboard:
+    def __init__(self, refresh_seconds: float) -> None:
+        self.refresh_seconds = refresh_seconds
+        self.high_water = -1  # -1: not loaded yet
+        self.loads = 0
+        self._boards: Dict[str, RankedCounts] = {name: RankedCounts() for name in WINDOWS}
+        self._days: Dict[datetime.date, Dict[int, int]] = {}
+        self._gaps: Dict[int, float] = {}  # missing order_id -> monotonic time first missed
+        self._today: Optional[datetime.date] = None
+        self._checked_at = float("-inf")
+        self._lock = asyncio.Lock()
+
+    def _due(self) -> bool:
+        return time.monotonic() - self._checked_at >= self.refresh_seconds
+
+    async def refresh(self, session, force: bool = False) -> None:
+        """Load the board, or fold in the orders placed since the last refresh."""
+        if not force and not self._due():
+            return
+        async with self._lock:
+            if not force and not self._due():
+                return
+            if self.high_water < 0:
+                await self._load(session)
+            else:
+                await self._catch_up(session)
+            self._checked_at = time.monotonic()
+
+    async def top(self, session, n: int, window: str = "all") -> List[Tuple[int, int]]:
+        await self.refresh(session)
+        return self._boards[window].top(n)
+
+    async def _load(self, session) -> None:
+        # Aggregate up to the floor, then take the newest ids through a catch-up, which reads
+        # them row by row in one statement and notes their gaps.
+        floor = await _load_floor(session)
+        day = today()
+        counts = await customer_counts(session, floor)
+        days: Dict[datetime.date, Dict[int, int]] = defaultdict(dict)
+        for (customer_id, bucket), count in (await daily_counts(session, window_start(_BUCKET_DAYS, day), floor)).items():
+            days[bucket][customer_id] = count
+        self._boards["all"] = RankedCounts(counts)
+        self._days = dict(days)
+        self._roll(day)
+        self._gaps = {}
+        self.high_water = floor
+        await self._catch_up(session)
+        self.loads += 1
+
+    def _note_gaps(self, ids: List[int]) -> None:
+        """Record the ids missing between the high-water mark and ``ids`` (ascending) as gaps,
+        and forget the gaps among ``ids``."""
+        now = time.monotonic()
+        expected = self.high_water + 1
+        for order_id in ids:
+            if order_id < expected:
+                self._gaps.pop(order_id, None)
+                continue
+            for missing in range(max(expected, order_id - _MAX_GAPS), order_id):
+                self._gaps[missing] = now
+            expected = order_id + 1
+        if len(self._gaps) > _MAX_GAPS:
+            for order_id in sorted(self._gaps)[:len(self._gaps) - _MAX_GAPS]:
+                del self._gaps[order_id]
+
+    async def _catch_up(self, session) -> None:
+        expired = time.monotonic() - settings.LEADERBOARD_GAP_SECONDS
+        self._gaps = {order_id: since for order_id, since in self._gaps.items() if since > expired}
+        new = Orders.order_id > self.high_water
+        # Plain rows in primary-key order, tallied here: a GROUP BY would make SQLite scan a
+        # customer index end to end instead of seeking to the high-water mark.
+        rows = (await session.execute(
+            select(Orders.order_id, Orders.customer_id, _DAY)
+            .where(or_(new, Orders.order_id.in_(list(self._gaps))) if self._gaps else new)
+            .order_by(Orders.order_id)
+        )).all()
+        day = today()
+        if day != self._today:
+            self._roll(day)
+        if not rows:
+            return
+        tally: Dict[tuple, int] = defaultdict(int)
+        for _, customer_id, bucket in rows:
+            tally[customer_id, bucket] += 1
+        for (customer_id, bucket), count in tally.items():
+            self._boards["all"].add(customer_id, count)
+            if bucket >= window_start(_BUCKET_DAYS, day):
+                counts = self._days.setdefault(bucket, {})
+                counts[customer_id] = counts.get(customer_id, 0) + count
+            for name, days in WINDOWS.items():
+                if days and bucket >= window_start(days, day):
+                    self._boards[name].add(customer_id, count)
+        self._note_gaps([order_id for order_id, _, _ in rows])
+        self.high_water = max(self.high_water, rows[-1][0])
+
+    def _roll(self, day: datetime.date) -> None:
+        """Drop buckets older than the longest window and rebuild the windowed rankings."""
+        oldest = window_start(_BUCKET_DAYS, day)
+        self._days = {bucket: counts for bucket, counts in self._days.items() if bucket >= oldest}
+        for name, days in WINDOWS.items():
+            if days:
+                totals: Dict[int, int] = defaultdict(int)
+                for bucket, counts in self._days.items():
+                    if bucket >= window_start(days, day):
+                        for customer_id, count in counts.items():
+                            totals[customer_id] += count
+                self._boards[name] = RankedCounts(totals)
+        self._today = day
+
+    def counts(self, window: str = "all") -> Dict[int, int]:
+        return dict(self._boards[window].counts)
+
+
+leaderboard = Leaderboard(settings.LEADERBOARD_REFRESH_SECONDS)
+
+
+# --- Consistency check ---
+
+async def check(session, board: Optional[Leaderboard] = None, limit: int = 100) -> List[str]:
+    """Compare ``board`` (caught up first) with the full GROUP BY for every window, and the
+    all-time counts with ``customer_order_rollup``. Returns one line per difference."""
+    board = board or leaderboard
+    await board.refresh(session, force=True)
+    high_water, day = board.high_water, board._today
+    problems = []
+    expected = {"all": await customer_counts(session, high_water)}
+    for name, days in WINDOWS.items():
+        if days:
+            totals: Dict[int, int] = defaultdict(int)
+            for (customer_id, _), count in (await daily_counts(session, window_start(days, day), high_water)).items():
+                totals[customer_id] += count
+            expected[name] = dict(totals)
+    for name, counts in expected.items():
+        held = board.counts(name)
+        wrong = sorted(c for c in counts.keys() | held.keys() if counts.get(c, 0) != held.get(c, 0))
+        if wrong:
+            sample = ", ".join(f"{c}: {held.get(c, 0)} vs {counts.get(c, 0)}" for c in wrong[:5])
+            problems.append(f"{name}: {len(wrong)} customer count(s) differ from the GROUP BY ({sample})")
+        top = sorted(counts.items(), key=lambda item: (-item[1], item[0]))[:limit]
+        if board._boards[name].top(limit) != top:
+            problems.append(f"{name}: top {limit} differs from the GROUP BY")
+    rollup = dict((await session.execute(
+        select(CustomerOrderRollup.customer_id, CustomerOrderRollup.orders_count).where(CustomerOrderRollup.orders_count > 0)
+    )).all())
+    if rollup != await customer_counts(session):
+        problems.append("customer_order_rollup differs from the GROUP BY (queued rollup jobs, or run `python -m App.rollups rebuild`)")
+    return problems
+
+
+def main(argv=None) -> int:
+    from App.database import dispose_engines, init_db, make_async_session
+
+    parser = argparse.ArgumentParser(description="Check the customer leaderboard against the base tables.")
+    parser.add_argument("command", choices=["check"])
+    parser.add_argument("--limit", type=int, default=100, help="top N compared per window")
+    args = parser.parse_args(argv)
+
+    async def run() -> int:
+        try:
+            async with make_async_session() as session:
+                problems = await check(session, Leaderboard(0), args.limit)
+        finally:
+            await dispose_engines()
+        for problem in problems:
+            print(problem)
+        print("leaderboard matches the base tables" if not problems else f"{len(problems)} problem(s)")
+        return 1 if problems else 0
+
+    init_db()
+    return asyncio.run(run())
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,31 +1,70 @@
+import asyncio
+import sys
+
+import anyio.to_thread
 from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
 from contextlib import asynccontextmanager
-from App.database import init_db
+from App.database import ReadYourWritesMiddleware, init_db, dispose_engines, replica_configured
+from App.catalog import load_catalog
+from App.jobs import job_queue
+from App.metrics import MetricsMiddleware, render_metrics
+from App.partitions import run_archiver
+from App.ratelimit import RateLimitMiddleware
+from App.settings import settings
 from App.routers import auth
-from App.routers import restaurants, payments, orders, analytics
+from App.routers import restaurants, payments, orders, analytics, checkout
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     print("Starting up...")
-    init_db()
+    anyio.to_thread.current_default_thread_limiter().total_tokens = settings.THREADPOOL_SIZE
+    if settings.DB_INIT_ON_STARTUP:
+        init_db()
+    await load_catalog()
+    # The outbound HTTP client (App.oauth) is created on the first login, not here.
+    if settings.JOB_QUEUE_ENABLED:
+        await job_queue.start()
+    archiver = None
+    if settings.ARCHIVE_INTERVAL_SECONDS > 0:
+        archiver = asyncio.create_task(run_archiver(settings.ARCHIVE_INTERVAL_SECONDS))
     yield
     print("Shutting down...")
+    if archiver is not None:
+        archiver.cancel()
+    await job_queue.stop()
+    oauth = sys.modules.get("App.oauth")
+    if oauth is not None:
+        await oauth.close_http_client()
+    await dispose_engines()
 
 app = FastAPI(lifespan=lifespan)
+if replica_configured() and settings.READ_YOUR_WRITES_SECONDS > 0:
+    app.add_middleware(ReadYourWritesMiddleware)
+if settings.METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+# Added last, so it runs first: over-budget callers are turned away before anything else.
+if settings.RATE_LIMIT_ENABLED:
+    app.add_middleware(RateLimitMiddleware)
 
 app.include_router(auth.router)
 app.include_router(restaurants.router)
 app.include_router(payments.router)
 app.include_router(orders.router)
 app.include_router(analytics.router)
+app.include_router(checkout.router)
 
 @app.get("/")
-def index():
+async def index():
     return {"msg": "Hello World"}
 
 @app.get("/health")
-def health_check(): 
+async def health_check(): 
     return {"status": "ok"}
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
 
@@ -0,0 +1,237 @@
+"""Request instrumentation: latency histograms, per-request SQL/JWT/HTTP timings, slow-query log.
+
+Everything is in-process and cheap enough to leave on: a perf_counter pair per SQL statement,
+a contextvar lookup, and a locked bucket increment per observation. ``/metrics`` renders the
+Prometheus text format; each response carries a ``Server-Timing`` header with the request's
+DB, JWT and outbound HTTP time so it shows up in browser dev tools.
+"""
+import bisect
+import logging
+import threading
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import event
+
+from App.settings import settings
+
+
+slow_query_log = logging.getLogger("App.slow_query")
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 50, 100)
+
+
+# --- Metric types (Prometheus text exposition, no client library needed) ---
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{n}="{str(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()) -> None:
+        self.name, self.help, self.label_names = name, help, tuple(labels)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for labels, value in sorted(self._values.items()):
+            lines.append(f"{self.name}{_labels(self.label_names, labels)} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, labels: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS) -> None:
+        self.name, self.help, self.label_names = name, help, tuple(labels)
+        self.buckets = tuple(buckets)
+        # labels -> [per-bucket counts (+Inf last), sum, count]
+        self._series: Dict[Tuple[str, ...], list] = {}
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def observe(self, value: float, *labels: str) -> None:
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            snapshot = [(labels, list(s[0]), s[1], s[2]) for labels, s in sorted(self._series.items())]
+        for labels, counts, total, count in snapshot:
+            cumulative = 0
+            for bound, bucket_count in zip((*self.buckets, "+Inf"), counts):
+                cumulative += bucket_count
+                le = f'le="{bound}"'
+                lines.append(f"{self.name}_bucket{_labels(self.label_names, labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.label_names, labels)} {total}")
+            lines.append(f"{self.name}_count{_labels(self.label_names, labels)} {count}")
+        return lines
+
+
+class Gauge:
+    def __init__(self, name: str, help: str) -> None:
+        self.name, self.help = name, help
+        self._value = 0.0
+        REGISTRY.append(self)
+
+    def set(self, value: float) -> None:
+        self._value = float(value)
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge", f"{self.name} {self._value}"]
+
+
+REGISTRY: list = []
+
+REQUEST_SECONDS = Histogram("http_request_duration_seconds", "HTTP request latency.", ("method", "route", "status"))
+REQUEST_DB_SECONDS = Histogram("http_request_db_seconds", "SQL time spent per HTTP request.", ("route",))
+REQUEST_DB_STATEMENTS = Histogram("http_request_db_statements", "SQL statements per HTTP request.", ("route",), COUNT_BUCKETS)
+SQL_STATEMENTS = Counter("db_statements_total", "SQL statements executed.")
+SQL_SLOW = Counter("db_slow_queries_total", "SQL statements slower than SLOW_QUERY_MS.")
+JWT_DECODE_SECONDS = Histogram("jwt_decode_seconds", "Time spent in auth_utils.decode_token.", (), (0.00001, 0.00005, 0.0001, 0.0005, 0.001, 0.005))
+HTTP_CLIENT_SECONDS = Histogram("http_client_request_seconds", "Outbound HTTP latency (until response headers).", ("host", "status"))
+RATE_LIMITED = Counter("rate_limited_total", "Requests rejected with 429 by the rate limiter.", ("rule",))
+JOB_QUEUE_DEPTH = Gauge("job_queue_depth", "Jobs waiting in the in-process queue (App.jobs).")
+JOB_SECONDS = Histogram("job_latency_seconds", "Time from enqueueing a job until its handler finished.", ("kind",))
+JOB_BATCH_SIZE = Histogram("job_batch_size", "Jobs per handler call.", ("kind",), COUNT_BUCKETS)
+JOBS_TOTAL = Counter("jobs_total", "Jobs by kind and outcome (done, retried, failed, deferred, inline, skipped, dropped).", ("kind", "outcome"))
+
+
+def render_metrics() -> str:
+    return "\n".join(line for metric in REGISTRY for line in metric.render()) + "\n"
+
+
+# --- Per-request timings ---
+
+@dataclass(slots=True)
+class RequestTimings:
+    db_statements: int = 0
+    db_seconds: float = 0.0
+    jwt_seconds: float = 0.0
+    http_seconds: float = 0.0
+
+    def server_timing(self, total: float) -> str:
+        return (
+            f'db;dur={self.db_seconds * 1000:.2f};desc="{self.db_statements} queries", '
+            f"jwt;dur={self.jwt_seconds * 1000:.2f}, "
+            f"google;dur={self.http_seconds * 1000:.2f}, "
+            f"total;dur={total * 1000:.2f}"
+        )
+
+
+_current: ContextVar[Optional[RequestTimings]] = ContextVar("request_timings", default=None)
+
+
+def record_jwt(seconds: float) -> None:
+    JWT_DECODE_SECONDS.observe(seconds)
+    timings = _current.get()
+    if timings is not None:
+        timings.jwt_seconds += seconds
+
+
+# --- SQL ---
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    context._metrics_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    elapsed = time.perf_counter() - context._metrics_started
+    SQL_STATEMENTS.inc()
+    timings = _current.get()
+    if timings is not None:
+        timings.db_statements += 1
+        timings.db_seconds += elapsed
+    if elapsed * 1000 >= settings.SLOW_QUERY_MS:
+        SQL_SLOW.inc()
+        slow_query_log.warning(
+            "slow query %.1fms%s: %s", elapsed * 1000, " (executemany)" if executemany else "", " ".join(statement.split())
+        )
+
+
+def instrument_engine(engine) -> None:
+    """Time every cursor execution on ``engine`` (a sync Engine; pass ``.sync_engine`` for async)."""
+    if not settings.METRICS_ENABLED:
+        return
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+# --- Outbound HTTP (httpx event hooks) ---
+
+async def _http_request_started(request) -> None:
+    request.extensions["metrics_started"] = time.perf_counter()
+
+
+async def _http_response_received(response) -> None:
+    started = response.request.extensions.get("metrics_started")
+    if started is None:
+        return
+    elapsed = time.perf_counter() - started
+    HTTP_CLIENT_SECONDS.observe(elapsed, response.request.url.host, str(response.status_code))
+    timings = _current.get()
+    if timings is not None:
+        timings.http_seconds += elapsed
+
+
+def http_event_hooks() -> dict:
+    if not settings.METRICS_ENABLED:
+        return {}
+    return {"request": [_http_request_started], "response": [_http_response_received]}
+
+
+# --- ASGI middleware ---
+
+class MetricsMiddleware:
+    """Pure ASGI middleware (no BaseHTTPMiddleware task/stream overhead)."""
+
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timings = RequestTimings()
+        token = _current.set(timings)
+        started = time.perf_counter()
+        status = 500
+
+        async def send_wrapper(message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if settings.SERVER_TIMING_ENABLED:
+                    header = timings.server_timing(time.perf_counter() - started)
+                    message["headers"] = [*message.get("headers", []), (b"server-timing", header.encode())]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            route = scope.get("route")
+            # Label by route template, never the raw path, to keep series cardinality bounded.
+            label = route.path if route is not None else "unmatched"
+            REQUEST_SECONDS.observe(elapsed, scope["method"], label, str(status))
+            REQUEST_DB_SECONDS.observe(timings.db_seconds, label)
+            REQUEST_DB_STATEMENTS.observe(timings.db_statements, label)
+            _current.reset(token)
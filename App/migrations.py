@@ -0,0 +1,228 @@
+"""Forward-only schema migrations for existing database files.
+
+``init_db`` only creates missing tables, so changes to tables that already exist (indexes,
+new columns) are applied here and recorded in ``schema_migrations``. Every migration must be
+idempotent because a fresh database gets the same objects from ``create_all`` first.
+
+    python -m App.migrations                 # apply pending migrations
+    python -m App.migrations --check-plans   # fail if a hot-path query falls back to a table scan
+"""
+import argparse
+import datetime
+import re
+import sys
+from typing import Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import func, select, text, tuple_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.schema import CreateTable
+from sqlmodel import SQLModel
+
+from App.models import (
+    Orders,
+    Payments,
+    Restaurants,
+    PaymentStatus,
+    RestaurantAreaName,
+    CatalogVersions,
+    SchemaMigrations,
+)
+from App.aggregate import AggregateQuery, compile_aggregate
+
+
+MIGRATIONS: List[Tuple[str, Callable]] = []
+
+
+def migration(version: str):
+    def register(fn: Callable) -> Callable:
+        MIGRATIONS.append((version, fn))
+        return fn
+    return register
+
+
+def _create_indexes(connection, *tables) -> None:
+    for table in tables:
+        for index in sorted(table.indexes, key=lambda ix: ix.name):
+            index.create(connection, checkfirst=True)
+
+
+@migration("0001_order_payment_hot_path_indexes")
+def _hot_path_indexes(connection) -> None:
+    try:
+        _create_indexes(connection, Orders.__table__, Payments.__table__)
+    except IntegrityError as exc:
+        duplicates = connection.execute(
+            select(Orders.transaction_id).group_by(Orders.transaction_id).having(func.count() > 1)
+        ).scalars().all()
+        raise RuntimeError(
+            f"Cannot create ux_orders_transaction_id: transaction ids {duplicates[:20]} have more than one order"
+        ) from exc
+
+
+@migration("0002_analytics_rollups")
+def _backfill_rollups(connection) -> None:
+    from App.rollups import rebuild
+
+    rebuild(connection)
+
+
+@migration("0003_catalog_versions")
+def _seed_catalog_versions(connection) -> None:
+    from App.catalog import CATALOGS
+
+    existing = set(connection.execute(select(CatalogVersions.name)).scalars())
+    for name in CATALOGS:
+        if name not in existing:
+            connection.execute(CatalogVersions.__table__.insert().values(name=name, version=1))
+
+
+@migration("0004_payments_created_at_index")
+def _payments_created_at_index(connection) -> None:
+    # Month partitioning (App.partitions) selects payments by created_at alone.
+    _create_indexes(connection, Payments.__table__)
+
+
+@migration("0005_autoincrement_keys")
+def _autoincrement_keys(connection) -> None:
+    # Plain INTEGER PRIMARY KEY hands out max(rowid)+1, so archiving the newest ids would let
+    # them be reused. Rebuild both tables with AUTOINCREMENT and start each sequence above
+    # every id already archived.
+    if connection.dialect.name != "sqlite":
+        return
+    from App.models import ArchivedMonths
+
+    archived = connection.execute(
+        select(func.max(ArchivedMonths.max_order_id), func.max(ArchivedMonths.max_transaction_id))
+    ).one()
+    for table, key, archived_max in (
+        (Payments.__table__, "transaction_id", archived[1]),
+        (Orders.__table__, "order_id", archived[0]),
+    ):
+        sql = connection.execute(
+            text("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = :name"), {"name": table.name}
+        ).scalar()
+        if "AUTOINCREMENT" not in sql.upper():
+            staging = f"_{table.name}_autoincrement"
+            ddl = str(CreateTable(table).compile(connection)).replace(f"CREATE TABLE {table.name} (", f"CREATE TABLE {staging} (", 1)
+            names = ", ".join(column.name for column in table.columns)
+            connection.exec_driver_sql(ddl)
+            connection.exec_driver_sql(f"INSERT INTO {staging} ({names}) SELECT {names} FROM {table.name}")
+            connection.exec_driver_sql(f"DROP TABLE {table.name}")
+            connection.exec_driver_sql(f"ALTER TABLE {staging} RENAME TO {table.name}")
+            _create_indexes(connection, table)
+        live_max = connection.execute(select(func.max(table.c[key]))).scalar()
+        floor = max(live_max or 0, archived_max or 0)
+        seen = connection.execute(text("SELECT seq FROM sqlite_sequence WHERE name = :name"), {"name": table.name}).scalar()
+        if seen is None:
+            connection.execute(text("INSERT INTO sqlite_sequence (name, seq) VALUES (:name, :seq)"), {"name": table.name, "seq": floor})
+        elif seen < floor:
+            connection.execute(text("UPDATE sqlite_sequence SET seq = :seq WHERE name = :name"), {"name": table.name, "seq": floor})
+
+
+def run_migrations(engine) -> List[str]:
+    """Apply pending migrations in order, each in its own transaction. Returns the applied versions."""
+    SchemaMigrations.__table__.create(engine, checkfirst=True)
+    with engine.connect() as connection:
+        applied = set(connection.execute(select(SchemaMigrations.version)).scalars())
+
+    newly_applied = []
+    for version, fn in MIGRATIONS:
+        if version in applied:
+            continue
+        with engine.begin() as connection:
+            fn(connection)
+            connection.execute(
+                SchemaMigrations.__table__.insert().values(
+                    version=version, applied_at=datetime.datetime.now(datetime.UTC)
+                )
+            )
+        newly_applied.append(version)
+    return newly_applied
+
+
+# --- Query plan guard ---
+
+_FULL_SCAN = re.compile(r"^SCAN (orders|payments)\b")
+
+
+def hot_path_statements() -> Dict[str, object]:
+    """Representative statements for every indexed access path the routers rely on."""
+    window_start = datetime.datetime(2024, 1, 1)
+    window_end = datetime.datetime(2024, 2, 1)
+    joined = (
+        select(func.coalesce(func.sum(Payments.amount), 0.0))
+        .select_from(Orders)
+        .join(Payments, Payments.transaction_id == Orders.transaction_id)
+        .join(Restaurants, Restaurants.restaurant_id == Orders.restaurant_id)
+        .where(Payments.status == PaymentStatus.PASS)
+    )
+    return {
+        "list_orders": select(Orders).where(Orders.customer_id == 1),
+        "list_payments": select(Payments).where(Payments.customer_id == 1),
+        "order_by_transaction_id": select(Orders.order_id).where(Orders.transaction_id == 1),
+        "restaurant_items_summary": (
+            select(Orders.item_name, func.count(Orders.order_id))
+            .where(Orders.restaurant_id == 1)
+            .group_by(Orders.item_name)
+        ),
+        "earnings_in_window": (
+            joined.where(Restaurants.area == RestaurantAreaName.MUMBAI)
+            .where(Orders.created_at >= window_start)
+            .where(Orders.created_at < window_end)
+        ),
+        # Incremental /analytics/export (App.export.export_statement).
+        "export_since_watermark": (
+            select(Orders.order_id)
+            .join(Payments, Payments.transaction_id == Orders.transaction_id)
+            .join(Restaurants, Restaurants.restaurant_id == Orders.restaurant_id)
+            .where(tuple_(Orders.created_at, Orders.order_id) > tuple_(window_start, 0))
+            .order_by(Orders.created_at, Orders.order_id)
+        ),
+        # payment_type forces the base-table path of the aggregate engine.
+        "aggregate_weekly_in_window": compile_aggregate(
+            AggregateQuery(metric="sum", group_by=("week", "payment_type"), start=window_start, end=window_end),
+            "sqlite",
+        ),
+    }
+
+
+def check_query_plans(engine, statements: Optional[Dict[str, object]] = None) -> List[str]:
+    """Run EXPLAIN QUERY PLAN for each statement and describe any full scan of orders/payments.
+
+    Only meaningful on SQLite; other backends return no findings.
+    """
+    if engine.dialect.name != "sqlite":
+        return []
+    problems = []
+    with engine.connect() as connection:
+        for name, statement in (statements or hot_path_statements()).items():
+            sql = str(statement.compile(engine, compile_kwargs={"literal_binds": True}))
+            for row in connection.execute(text(f"EXPLAIN QUERY PLAN {sql}")):
+                detail = row[-1]
+                if _FULL_SCAN.match(detail):
+                    problems.append(f"{name}: {detail}")
+    return problems
+
+
+def main(argv=None) -> int:
+    from App.database import engine
+
+    parser = argparse.ArgumentParser(description="Apply schema migrations to the configured database.")
+    parser.add_argument("--check-plans", action="store_true", help="exit non-zero if a hot-path query scans orders/payments")
+    args = parser.parse_args(argv)
+
+    SQLModel.metadata.create_all(engine)
+    for version in run_migrations(engine):
+        print(f"applied {version}")
+    if args.check_plans:
+        problems = check_query_plans(engine)
+        for problem in problems:
+            print(f"full table scan: {problem}")
+        if problems:
+            return 1
+        print("query plans ok")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
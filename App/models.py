@@ -1,3 +1,4 @@
+from sqlalchemy import Index
 from sqlmodel import SQLModel, Field
 from typing import Optional
 import datetime
@@ -16,6 +17,13 @@ class PaymentType(str, Enum):
     CARD="card"
     UPI="UPI"
 class Payments(SQLModel, table=True):
+    __table_args__ = (
+        Index("ix_payments_customer_id_created_at", "customer_id", "created_at"),
+        Index("ix_payments_created_at", "created_at"),
+        # Never hand out an id again once its row is archived (App.partitions).
+        {"sqlite_autoincrement": True},
+    )
+
     transaction_id: Optional[int] = Field(default=None, primary_key=True)
     status: PaymentStatus = Field(nullable=False)
     payment_type: PaymentType = Field(nullable=False)
@@ -30,6 +38,14 @@ class OrderFoodItem(str, Enum):
     VEG_FRIED_RICE="Veg Fried Rice"
     CHICKEN_FRIED_RICE="Chicken Fried Rice"
 class Orders(SQLModel, table=True):
+    __table_args__ = (
+        Index("ux_orders_transaction_id", "transaction_id", unique=True),
+        Index("ix_orders_customer_id_created_at", "customer_id", "created_at"),
+        Index("ix_orders_restaurant_id_item_name", "restaurant_id", "item_name"),
+        Index("ix_orders_created_at", "created_at"),
+        {"sqlite_autoincrement": True},
+    )
+
     order_id: Optional[int] = Field(default=None, primary_key=True)
     item_name: OrderFoodItem = Field(nullable=False)
     transaction_id: int = Field(foreign_key="payments.transaction_id")
@@ -44,3 +60,80 @@ class Restaurants(SQLModel, table=True):
     restaurant_id: Optional[int] = Field(default=None, primary_key=True)
     name: str = Field(nullable=False)
     area: RestaurantAreaName = Field(nullable=False)
+
+class IdempotencyKeys(SQLModel, table=True):
+    """Maps a client's Idempotency-Key to the checkout payment it produced, so retries replay
+    it. The order (if any) is found through the unique Orders.transaction_id."""
+    __tablename__ = "idempotency_keys"
+
+    customer_id: int = Field(primary_key=True, foreign_key="customers.id")
+    key: str = Field(primary_key=True, max_length=255)
+    request_hash: str = Field(nullable=False)
+    transaction_id: int = Field(foreign_key="payments.transaction_id")
+    created_at: datetime.datetime = Field(default_factory=lambda: datetime.datetime.now(datetime.UTC))
+
+# --- Analytics rollups (maintained by App.rollups) ---
+class OrderDailyRollup(SQLModel, table=True):
+    """Orders and PASS revenue per day x restaurant x item. Area is joined from Restaurants
+    at read time so a restaurant moving area never leaves stale rollup rows behind."""
+    __tablename__ = "order_daily_rollup"
+
+    day: datetime.date = Field(primary_key=True)
+    restaurant_id: int = Field(primary_key=True)
+    item_name: OrderFoodItem = Field(primary_key=True)
+    orders_count: int = Field(default=0)
+    paid_orders_count: int = Field(default=0)
+    revenue_cents: int = Field(default=0)
+
+class CustomerOrderRollup(SQLModel, table=True):
+    __tablename__ = "customer_order_rollup"
+
+    customer_id: int = Field(primary_key=True)
+    orders_count: int = Field(default=0, index=True)
+
+class CatalogVersions(SQLModel, table=True):
+    """Change counter per in-memory catalog (App.catalog). Bumped in the same transaction as
+    the change, so every worker sees it on its next poll."""
+    __tablename__ = "catalog_versions"
+
+    name: str = Field(primary_key=True)
+    version: int = Field(default=0)
+
+# --- Month partitions (maintained by App.partitions) ---
+class ArchivedMonths(SQLModel, table=True):
+    """A month of Orders/Payments moved out of the live tables into a read-only SQLite file.
+    ``file_name`` is relative to ARCHIVE_DIR; the id ranges let a by-id lookup find the files
+    that can hold a row."""
+    __tablename__ = "archived_months"
+
+    month: str = Field(primary_key=True)
+    start: datetime.datetime = Field(nullable=False)
+    end: datetime.datetime = Field(nullable=False)
+    file_name: str = Field(nullable=False)
+    orders_count: int = Field(default=0)
+    payments_count: int = Field(default=0)
+    min_order_id: Optional[int] = Field(default=None)
+    max_order_id: Optional[int] = Field(default=None)
+    min_transaction_id: Optional[int] = Field(default=None)
+    max_transaction_id: Optional[int] = Field(default=None)
+    archived_at: datetime.datetime = Field(default_factory=lambda: datetime.datetime.now(datetime.UTC))
+
+# --- Background jobs (App.jobs) ---
+class Outbox(SQLModel, table=True):
+    """A durable post-commit job, written in the same transaction as the change that needs it
+    and deleted by the transaction that carries it out. Rows with ``attempts`` at
+    JOB_MAX_ATTEMPTS are dead letters: kept, with ``last_error``, for a look and a retry."""
+    __tablename__ = "outbox"
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    kind: str = Field(nullable=False)
+    payload: str = Field(nullable=False)
+    attempts: int = Field(default=0)
+    last_error: Optional[str] = Field(default=None)
+    created_at: datetime.datetime = Field(default_factory=lambda: datetime.datetime.now(datetime.UTC))
+
+class SchemaMigrations(SQLModel, table=True):
+    __tablename__ = "schema_migrations"
+
+    version: str = Field(primary_key=True)
+    applied_at: datetime.datetime = Field(default_factory=lambda: datetime.datetime.now(datetime.UTC))
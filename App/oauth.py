@@ -0,0 +1,162 @@
+"""Outbound HTTP to Google: one pooled client for the app's lifetime and local id_token checks.
+
+The client is created on first use: ``get_http_client`` (via ``start_http_client``) hands it
+to the routers on the first login, so a worker that never logs anyone in never opens one.
+``main.lifespan`` only calls ``close_http_client`` at shutdown, and only if this module was
+imported.
+"""
+import asyncio
+import re
+import time
+from typing import Dict, Optional
+
+import httpx
+from fastapi import HTTPException
+from jose import JWTError, jwk, jwt
+from jose.backends.base import Key
+
+from App.metrics import http_event_hooks
+from App.settings import settings
+
+
+_client: Optional[httpx.AsyncClient] = None
+
+
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def make_http_client(**kwargs) -> httpx.AsyncClient:
+    """AsyncClient with the configured pool limits, timeouts and (when h2 is installed) HTTP/2."""
+    options = {
+        "http2": settings.HTTP2_ENABLED and _http2_available(),
+        "limits": httpx.Limits(
+            max_connections=settings.HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.HTTP_MAX_KEEPALIVE,
+            keepalive_expiry=settings.HTTP_KEEPALIVE_EXPIRY,
+        ),
+        "timeout": httpx.Timeout(settings.HTTP_TIMEOUT, connect=settings.HTTP_CONNECT_TIMEOUT),
+        "event_hooks": http_event_hooks(),
+    }
+    options.update(kwargs)
+    return httpx.AsyncClient(**options)
+
+
+def start_http_client() -> httpx.AsyncClient:
+    global _client
+    if _client is None or _client.is_closed:
+        _client = make_http_client()
+    return _client
+
+
+async def close_http_client() -> None:
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+def get_http_client() -> httpx.AsyncClient:
+    return start_http_client()
+
+
+# --- id_token verification ---
+
+_MAX_AGE = re.compile(r"max-age=(\d+)")
+
+
+class JWKSCache:
+    """Google's signing keys keyed by ``kid``, refetched when stale or on an unknown ``kid``.
+
+    Freshness follows the JWKS response's ``Cache-Control: max-age``. A ``kid`` we haven't
+    seen usually means Google rotated keys, so it triggers a refetch, rate-limited to one per
+    ``min_refresh`` seconds so garbage tokens can't hammer the endpoint. Keys are parsed once
+    per fetch, not once per login.
+    """
+
+    def __init__(self, uri: str, min_refresh: float = 5.0, default_ttl: float = 3600.0) -> None:
+        self.uri = uri
+        self.min_refresh = min_refresh
+        self.default_ttl = default_ttl
+        self._keys: Dict[str, Key] = {}
+        self._expires_at = 0.0
+        self._fetched_at: Optional[float] = None
+        self._lock = asyncio.Lock()
+        self.fetches = 0
+
+    async def _refresh(self, client: httpx.AsyncClient) -> None:
+        response = await client.get(self.uri)
+        response.raise_for_status()
+        match = _MAX_AGE.search(response.headers.get("cache-control", ""))
+        ttl = float(match.group(1)) if match else self.default_ttl
+        now = time.monotonic()
+        self._keys = {
+            key["kid"]: jwk.construct(key, key.get("alg", "RS256"))
+            for key in response.json().get("keys", [])
+            if "kid" in key
+        }
+        self._fetched_at = now
+        self._expires_at = now + ttl
+        self.fetches += 1
+
+    def _can_refetch(self) -> bool:
+        return self._fetched_at is None or time.monotonic() - self._fetched_at >= self.min_refresh
+
+    async def get_key(self, client: httpx.AsyncClient, kid: Optional[str]) -> Optional[Key]:
+        if kid in self._keys and time.monotonic() < self._expires_at:
+            return self._keys[kid]
+        async with self._lock:
+            # Another coroutine may have refreshed while we waited for the lock.
+            stale = time.monotonic() >= self._expires_at
+            if stale or (kid not in self._keys and self._can_refetch()):
+                try:
+                    await self._refresh(client)
+                except httpx.HTTPError:
+                    if not self._keys:
+                        raise
+                    # Keep serving the keys we have; Google rotates with overlap.
+            return self._keys.get(kid)
+
+
+jwks_cache = JWKSCache(settings.GOOGLE_JWKS_URI, min_refresh=settings.GOOGLE_JWKS_MIN_REFRESH)
+
+
+def _as_userinfo(claims: dict) -> dict:
+    """Shape id_token claims like the v2 userinfo response the callback used to return."""
+    info = {
+        "id": claims.get("sub"),
+        "email": claims.get("email"),
+        "verified_email": claims.get("email_verified"),
+        "name": claims.get("name"),
+        "given_name": claims.get("given_name"),
+        "family_name": claims.get("family_name"),
+        "picture": claims.get("picture"),
+    }
+    return {k: v for k, v in info.items() if v is not None}
+
+
+async def verify_id_token(client: httpx.AsyncClient, id_token: str, access_token: Optional[str] = None) -> dict:
+    """Verify a Google id_token locally (signature, aud, iss, exp, at_hash) and return user info."""
+    try:
+        header = jwt.get_unverified_header(id_token)
+    except JWTError:
+        raise HTTPException(status_code=400, detail="Invalid id_token from Google")
+    key = await jwks_cache.get_key(client, header.get("kid"))
+    if key is None:
+        raise HTTPException(status_code=400, detail="Unknown id_token signing key")
+    try:
+        claims = jwt.decode(
+            id_token,
+            key,
+            algorithms=["RS256"],
+            audience=settings.GOOGLE_CLIENT_ID,
+            issuer=settings.GOOGLE_ISSUERS,
+            access_token=access_token,
+        )
+    except JWTError:
+        raise HTTPException(status_code=400, detail="Invalid id_token from Google")
+    return _as_userinfo(claims)
@@ -0,0 +1,83 @@
+import base64
+import binascii
+import datetime
+import json
+from typing import Any, AsyncIterator, Callable, Optional, Sequence
+
+from fastapi import HTTPException, Response
+from sqlalchemy import tuple_
+from starlette.responses import StreamingResponse
+
+from App.database import stream_partitions, stream_scalars
+from App.settings import settings
+
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+
+def encode_cursor(sort_key: str, value: Any, row_id: int) -> str:
+    if isinstance(value, datetime.datetime):
+        value = value.isoformat()
+    raw = json.dumps({"k": sort_key, "v": value, "id": row_id}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, sort_key: str) -> tuple:
+    """Return ``(value, id)`` from an opaque cursor issued for ``sort_key``."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if data["k"] != sort_key:
+            raise ValueError("cursor was issued for a different order_by")
+        value = data["v"]
+        if sort_key == "created_at":
+            value = datetime.datetime.fromisoformat(value)
+        return value, int(data["id"])
+    except (ValueError, KeyError, TypeError, binascii.Error):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def keyset(stmt, sort_key: str, sort_column, id_column, cursor: Optional[str]):
+    """Order ``stmt`` by (sort column, id) and start strictly after ``cursor``."""
+    if cursor:
+        value, row_id = decode_cursor(cursor, sort_key)
+        if sort_column is id_column:
+            stmt = stmt.where(id_column > row_id)
+        else:
+            stmt = stmt.where(tuple_(sort_column, id_column) > tuple_(value, row_id))
+    if sort_column is id_column:
+        return stmt.order_by(id_column)
+    return stmt.order_by(sort_column, id_column)
+
+
+def page_limit(limit: Optional[int]) -> int:
+    return min(limit or settings.PAGE_DEFAULT_LIMIT, settings.PAGE_MAX_LIMIT)
+
+
+def finish_page(rows: Sequence, limit: int, sort_key: str, id_attr: str, response: Response) -> Sequence:
+    """Trim the look-ahead row and advertise the next cursor in ``X-Next-Cursor``."""
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(sort_key, getattr(last, sort_key), getattr(last, id_attr))
+    return rows
+
+
+def ndjson_response(stmt, serialize: Callable[[Any], str], replica: bool = False) -> StreamingResponse:
+    """Stream every row of ``stmt`` as NDJSON from a server-side cursor (on the replica when ``replica``)."""
+    async def lines() -> AsyncIterator[str]:
+        async for row in stream_scalars(stmt, chunk_size=settings.STREAM_CHUNK_SIZE, replica=replica):
+            yield serialize(row) + "\n"
+
+    return StreamingResponse(lines(), media_type=NDJSON_MEDIA_TYPE)
+
+
+def ndjson_rows_response(stmt, dump_lines: Callable[[Sequence], bytes], replica: bool = False) -> StreamingResponse:
+    """Like ``ndjson_response`` for column selects: each chunk of ``Row`` tuples is rendered by
+    ``dump_lines`` and sent as one body part."""
+    async def chunks() -> AsyncIterator[bytes]:
+        async for rows in stream_partitions(stmt, chunk_size=settings.STREAM_CHUNK_SIZE, scalars=False, replica=replica):
+            yield dump_lines(rows)
+
+    return StreamingResponse(chunks(), media_type=NDJSON_MEDIA_TYPE)
@@ -0,0 +1,387 @@
+"""Month partitions for Orders and Payments: cold history in read-only SQLite files.
+
+The live ``orders``/``payments`` tables are the hot partition: the current month and the
+``ARCHIVE_HOT_MONTHS - 1`` months before it. ``archive_cold_months`` moves each older month
+into its own file (``ARCHIVE_DIR/2024-01.db``, same tables and indexes), VACUUMed and made
+read-only, and records it in ``archived_months`` in the same transaction that deletes the
+live rows. A payment moves with its order, so every file joins on its own; payments without
+an order go by their own ``created_at``.
+
+Reads are routed through ``archived_months``:
+
+* by-id lookups (``find_archived``) fall back to the files whose id range holds the id, so
+  ``GET /orders/{id}``, ``GET /payments/{id}`` and checkout replays answer as before;
+* window queries (``partitioned_rows``) run on the live tables plus only the archived months
+  the window overlaps; the recent windows the dashboards ask for never open a file;
+* the rollups aren't partitioned: they keep every month, and ``rollups.rebuild`` folds the
+  files back in.
+
+Archive files are opened ``immutable`` with the live database attached as ``live``, so the
+same statements resolve ``restaurants``/``customers`` unchanged. Archived rows are history:
+the list endpoints page through the live tables only and an archived payment can't be
+ordered any more. SQLite only; the freed pages in the live file are reused by new rows.
+
+    python -m App.partitions archive [--dry-run]   # move every month older than ARCHIVE_HOT_MONTHS
+    python -m App.partitions list
+"""
+import argparse
+import asyncio
+import datetime
+import logging
+import os
+import sys
+import threading
+import time
+import uuid
+from typing import Dict, Iterator, List, Optional
+
+import sqlmodel
+from sqlalchemy import MetaData, and_, delete, event, exists, func, insert, or_, select
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.pool import NullPool
+from sqlmodel import Session
+from starlette.concurrency import run_in_threadpool
+
+from App.metrics import instrument_engine
+from App.models import ArchivedMonths, Orders, Payments
+from App.settings import settings
+
+
+logger = logging.getLogger(__name__)
+
+# Creation order inside an archive file.
+PARTITIONED_TABLES = (Payments.__table__, Orders.__table__)
+_ID_RANGES = {
+    Orders: (ArchivedMonths.min_order_id, ArchivedMonths.max_order_id),
+    Payments: (ArchivedMonths.min_transaction_id, ArchivedMonths.max_transaction_id),
+}
+
+
+class ArchiveConflict(RuntimeError):
+    """The live rows of a month changed while it was being copied; it is retried next run."""
+
+
+# --- Months ---
+
+def month_start(value: datetime.datetime) -> datetime.datetime:
+    return datetime.datetime(value.year, value.month, 1)
+
+
+def add_months(value: datetime.datetime, months: int) -> datetime.datetime:
+    index = value.year * 12 + value.month - 1 + months
+    return datetime.datetime(index // 12, index % 12 + 1, 1)
+
+
+def month_label(start: datetime.datetime) -> str:
+    return start.strftime("%Y-%m")
+
+
+def archive_cutoff(now: datetime.datetime, hot_months: Optional[int] = None) -> datetime.datetime:
+    """First day of the oldest month that stays in the live tables."""
+    return add_months(month_start(now), 1 - (hot_months or settings.ARCHIVE_HOT_MONTHS))
+
+
+# --- Files and engines ---
+
+def live_database_path() -> str:
+    url = make_url(settings.DATABASE_URL)
+    if url.get_backend_name() != "sqlite" or url.database in (None, "", ":memory:"):
+        raise RuntimeError("Month partitions need a file-backed SQLite DATABASE_URL")
+    return os.path.abspath(url.database)
+
+
+def archive_dir() -> str:
+    return settings.ARCHIVE_DIR or os.path.join(os.path.dirname(live_database_path()), "archive")
+
+
+_engines: Dict[str, object] = {}
+_engines_lock = threading.Lock()
+
+
+def archive_engine(file_name: str):
+    """Read-only engine on one archive file, with the live database attached as ``live``."""
+    engine = _engines.get(file_name)
+    if engine is not None:
+        return engine
+    with _engines_lock:
+        if file_name not in _engines:
+            path = os.path.join(archive_dir(), file_name)
+            engine = sqlmodel.create_engine(
+                f"sqlite:///file:{path}?mode=ro&immutable=1&uri=true", echo=settings.DB_ECHO
+            )
+            live = live_database_path()
+
+            @event.listens_for(engine, "connect")
+            def _attach_live(dbapi_connection, connection_record):
+                dbapi_connection.execute("ATTACH DATABASE ? AS live", (live,))
+                dbapi_connection.execute("PRAGMA query_only=ON")
+
+            instrument_engine(engine)
+            _engines[file_name] = engine
+        return _engines[file_name]
+
+
+def dispose_archive_engines(close: bool = True) -> None:
+    with _engines_lock:
+        for engine in _engines.values():
+            engine.dispose(close=close)
+        _engines.clear()
+
+
+# --- Routing reads ---
+
+def months_statement(start: Optional[datetime.datetime] = None, end: Optional[datetime.datetime] = None):
+    """File names of the archived months overlapping ``[start, end)``, oldest first."""
+    stmt = select(ArchivedMonths.file_name).order_by(ArchivedMonths.start)
+    if start is not None:
+        stmt = stmt.where(ArchivedMonths.end > start)
+    if end is not None:
+        stmt = stmt.where(ArchivedMonths.start < end)
+    return stmt
+
+
+def archived_file_names(connection, start=None, end=None) -> List[str]:
+    return list(connection.execute(months_statement(start, end)).scalars())
+
+
+async def archived_files(session, start=None, end=None) -> List[str]:
+    return list((await session.execute(months_statement(start, end))).scalars())
+
+
+def archive_rows(file_name: str, statement) -> list:
+    with archive_engine(file_name).connect() as connection:
+        return connection.execute(statement).all()
+
+
+def _archive_first(file_name: str, statement):
+    with Session(archive_engine(file_name)) as session:
+        return session.scalars(statement).first()
+
+
+async def find_archived(session, model, ident: int, statement=None):
+    """The ``model`` row with primary key ``ident`` from the archive files, or ``None``.
+
+    ``statement`` replaces the primary-key select; it is run in the files whose ``model`` id
+    range holds ``ident`` (e.g. an order by its transaction id: orders move with their payment).
+    """
+    low, high = _ID_RANGES[model]
+    files = (await session.execute(
+        select(ArchivedMonths.file_name).where(low <= ident, high >= ident).order_by(ArchivedMonths.start)
+    )).scalars().all()
+    if statement is None:
+        [key] = model.__table__.primary_key.columns
+        statement = select(model).where(key == ident)
+    for file_name in files:
+        row = await run_in_threadpool(_archive_first, file_name, statement)
+        if row is not None:
+            return row
+    return None
+
+
+async def partitioned_rows(session, statement, files: List[str]) -> List[list]:
+    """Rows of ``statement`` from the live tables, then from each archive file in ``files``
+    (one list per partition). Combining partial aggregates is up to the caller."""
+    parts = [(await session.execute(statement)).all()]
+    for file_name in files:
+        parts.append(await run_in_threadpool(archive_rows, file_name, statement))
+    return parts
+
+
+async def stream_archived(statement, files: List[str], chunk_size: int):
+    """Yield lists of up to ``chunk_size`` rows of ``statement`` from each file in turn."""
+    for file_name in files:
+        connection = await run_in_threadpool(archive_engine(file_name).connect)
+        try:
+            result = await run_in_threadpool(
+                connection.execution_options(yield_per=chunk_size).execute, statement
+            )
+            partitions = result.partitions()
+            while True:
+                chunk = await run_in_threadpool(next, partitions, None)
+                if chunk is None:
+                    break
+                yield chunk
+        finally:
+            await run_in_threadpool(connection.close)
+
+
+# --- Archiving ---
+
+def _in_month(column, start, end):
+    return and_(column >= start, column < end)
+
+
+def _selection(orders, payments, start: datetime.datetime, end: datetime.datetime):
+    """(orders, payments) predicates of one month: orders by ``created_at``, payments with
+    their order, or by their own ``created_at`` when they have none."""
+    orders_in_month = _in_month(orders.c.created_at, start, end)
+    has_order = exists().where(orders.c.transaction_id == payments.c.transaction_id)
+    payments_in_month = or_(
+        payments.c.transaction_id.in_(select(orders.c.transaction_id).where(orders_in_month)),
+        and_(_in_month(payments.c.created_at, start, end), ~has_order),
+    )
+    return orders_in_month, payments_in_month
+
+
+def pending_months(connection, cutoff: datetime.datetime) -> Iterator[datetime.datetime]:
+    """Starts of the months before ``cutoff`` that still have live rows, oldest first."""
+    after = datetime.datetime.min
+    while True:
+        oldest = [
+            connection.scalar(select(func.min(model.created_at)).where(model.created_at >= after, model.created_at < cutoff))
+            for model in (Orders, Payments)
+        ]
+        oldest = [value for value in oldest if value is not None]
+        if not oldest:
+            return
+        start = month_start(min(oldest))
+        yield start
+        after = add_months(start, 1)
+
+
+def _copy_month(path: str, start: datetime.datetime, end: datetime.datetime) -> dict:
+    """Write one month's live rows into a new SQLite file; returns its ``archived_months`` counts."""
+    engine = sqlmodel.create_engine(f"sqlite:///{path}", poolclass=NullPool)
+    try:
+        with engine.connect() as connection:
+            connection.exec_driver_sql("ATTACH DATABASE ? AS live", (live_database_path(),))
+            for table in PARTITIONED_TABLES:
+                table.create(connection)
+            live = MetaData()
+            orders, payments = (
+                Orders.__table__.to_metadata(live, schema="live"),
+                Payments.__table__.to_metadata(live, schema="live"),
+            )
+            orders_in_month, payments_in_month = _selection(orders, payments, start, end)
+            # One transaction, so both tables are copied from the same snapshot.
+            for table, source, where in (
+                (Payments.__table__, payments, payments_in_month),
+                (Orders.__table__, orders, orders_in_month),
+            ):
+                names = [column.name for column in table.columns]
+                connection.execute(insert(table).from_select(names, select(*(source.c[n] for n in names)).where(where)))
+            connection.commit()
+            counts = {}
+            for prefix, table, key in (("order", Orders.__table__, "order_id"), ("transaction", Payments.__table__, "transaction_id")):
+                count, low, high = connection.execute(
+                    select(func.count(), func.min(table.c[key]), func.max(table.c[key]))
+                ).one()
+                counts[f"{table.name}_count"] = count
+                counts[f"min_{prefix}_id"] = low
+                counts[f"max_{prefix}_id"] = high
+            connection.exec_driver_sql("DETACH DATABASE live")
+            connection.exec_driver_sql("ANALYZE")
+            connection.exec_driver_sql("VACUUM")
+        return counts
+    finally:
+        engine.dispose()
+
+
+def archive_month(engine, start: datetime.datetime) -> Optional[ArchivedMonths]:
+    """Move the month starting at ``start`` from the live tables into its archive file.
+
+    Returns ``None`` when the month has nothing to move or another process archived it first;
+    raises ``ArchiveConflict`` (nothing changed) if its live rows changed during the copy.
+    """
+    end = add_months(start, 1)
+    label = month_label(start)
+    directory = archive_dir()
+    os.makedirs(directory, exist_ok=True)
+    file_name = f"{label}.db"
+    path = os.path.join(directory, file_name)
+    staging = f"{path}.{uuid.uuid4().hex}.tmp"
+    try:
+        counts = _copy_month(staging, start, end)
+        if not counts["orders_count"] and not counts["payments_count"]:
+            return None
+        record = ArchivedMonths(month=label, start=start, end=end, file_name=file_name, **counts)
+        orders, payments = Orders.__table__, Payments.__table__
+        orders_in_month, payments_in_month = _selection(orders, payments, start, end)
+        try:
+            with engine.begin() as connection:
+                # The primary key stops a concurrent archiver of the same month here.
+                connection.execute(insert(ArchivedMonths.__table__).values(**record.model_dump()))
+                # Payments first: their predicate looks at the month's orders.
+                moved = (
+                    connection.execute(delete(payments).where(payments_in_month)).rowcount,
+                    connection.execute(delete(orders).where(orders_in_month)).rowcount,
+                )
+                if moved != (record.payments_count, record.orders_count):
+                    raise ArchiveConflict(
+                        f"{label}: copied {record.payments_count} payments/{record.orders_count} orders "
+                        f"but {moved[0]}/{moved[1]} were live at commit"
+                    )
+                os.chmod(staging, 0o444)
+                os.replace(staging, path)
+        except IntegrityError:
+            logger.info("%s was archived by another process", label)
+            return None
+        return record
+    finally:
+        if os.path.exists(staging):
+            os.remove(staging)
+
+
+def archive_cold_months(engine, now: Optional[datetime.datetime] = None) -> List[ArchivedMonths]:
+    """Archive every month before ``archive_cutoff(now)`` that still has live rows, oldest first."""
+    live_database_path()
+    cutoff = archive_cutoff(now or datetime.datetime.utcnow())
+    with engine.connect() as connection:
+        months = list(pending_months(connection, cutoff))
+        done = set(connection.execute(select(ArchivedMonths.month)).scalars())
+    archived = []
+    for start in months:
+        # Leftovers in an archived month are payments whose order is in a later month; they
+        # move with it.
+        if month_label(start) in done:
+            continue
+        record = archive_month(engine, start)
+        if record is not None:
+            archived.append(record)
+    return archived
+
+
+async def run_archiver(interval: float) -> None:
+    """Archive cold months every ``interval`` seconds; started by the app lifespan."""
+    from App.database import engine
+
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            for record in await run_in_threadpool(archive_cold_months, engine):
+                logger.info("archived %s: %d orders, %d payments", record.month, record.orders_count, record.payments_count)
+        except Exception:
+            logger.exception("archiving cold months failed")
+
+
+def main(argv=None) -> int:
+    from App.database import engine, init_db
+
+    parser = argparse.ArgumentParser(description="Move cold months of orders/payments to read-only archive files.")
+    parser.add_argument("command", choices=["archive", "list"])
+    parser.add_argument("--dry-run", action="store_true", help="only list the months that would be archived")
+    args = parser.parse_args(argv)
+
+    init_db()
+    if args.command == "list":
+        with Session(engine) as session:
+            for record in session.scalars(select(ArchivedMonths).order_by(ArchivedMonths.start)):
+                print(f"{record.month}  {record.orders_count} orders  {record.payments_count} payments  {record.file_name}")
+        return 0
+    if args.dry_run:
+        cutoff = archive_cutoff(datetime.datetime.utcnow())
+        with engine.connect() as connection:
+            for start in pending_months(connection, cutoff):
+                print(f"would archive {month_label(start)}")
+        return 0
+    started = time.perf_counter()
+    records = archive_cold_months(engine)
+    for record in records:
+        print(f"archived {record.month}: {record.orders_count} orders, {record.payments_count} payments")
+    print(f"{len(records)} month(s) archived in {time.perf_counter() - started:.1f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,245 @@
+"""Per-user, per-route rate limiting (opt-in with ``RATE_LIMIT_ENABLED``).
+
+``RateLimitMiddleware`` is a pure ASGI middleware in front of the app, so a rejected request is
+answered with 429 before routing: no dependency runs and no DB session is opened. Callers are
+identified by their JWT ``sub`` (through ``auth_utils.decode_token``, whose cache makes that a
+hash and a dict lookup), by client IP under ``/auth/`` and when there is no valid token.
+
+Budgets come from ``RATE_LIMITS``, a comma-separated list of ``[METHOD ]path-glob=N/unit[:burst]``
+rules (unit ``s``, ``m`` or ``h``; burst defaults to N; ``off`` exempts the path). The first
+matching rule applies and each rule keeps its own bucket per caller:
+
+    RATE_LIMITS="/health=off, /auth/*=20/m:10, POST /payments/*=10/s:20, *=50/s:100"
+
+Buckets use GCRA: the state per caller and rule is one number, the bucket's theoretical
+arrival time (TAT), so a check is O(1). ``memory`` keeps TATs per process in a dict that drops
+full (expired) buckets as it goes; ``redis`` (RATE_LIMIT_BACKEND, on REDIS_URL) runs the
+same update as a Lua script so every worker shares one budget, and lets requests through if
+Redis is unreachable.
+"""
+import fnmatch
+import logging
+import math
+import re
+import time
+from dataclasses import dataclass
+from itertools import islice
+from typing import Dict, Hashable, List, Optional, Tuple
+
+from fastapi import HTTPException
+
+from App.auth_utils import decode_token
+from App.metrics import RATE_LIMITED
+from App.settings import settings
+
+
+logger = logging.getLogger(__name__)
+
+_UNITS = {"s": 1.0, "m": 60.0, "h": 3600.0}
+_RULE = re.compile(r"^(?:(?P<method>[A-Z]+)\s+)?(?P<path>\S+)\s*=\s*(?:(?P<off>off)|(?P<count>\d+)\s*/\s*(?P<unit>[smh])(?:\s*:\s*(?P<burst>\d+))?)$")
+
+
+@dataclass(frozen=True)
+class Rule:
+    index: int
+    name: str
+    method: Optional[str]
+    pattern: "re.Pattern"
+    # Seconds per request at the sustained rate, and requests allowed back to back; an
+    # ``interval`` of 0 means unlimited.
+    interval: float
+    burst: int
+
+    def matches(self, method: str, path: str) -> bool:
+        return (self.method is None or self.method == method) and self.pattern.match(path) is not None
+
+
+def parse_rules(spec: str) -> List[Rule]:
+    rules = []
+    for index, text in enumerate(part.strip() for part in spec.split(",") if part.strip()):
+        match = _RULE.match(text)
+        if match is None:
+            raise ValueError(f"Invalid RATE_LIMITS rule {text!r}")
+        method, path = match["method"], match["path"]
+        pattern = re.compile(fnmatch.translate(path))
+        name = f"{method} {path}" if method else path
+        if match["off"]:
+            rules.append(Rule(index, name, method, pattern, 0.0, 0))
+            continue
+        count = int(match["count"])
+        if count <= 0:
+            raise ValueError(f"Invalid RATE_LIMITS rule {text!r}")
+        burst = int(match["burst"]) if match["burst"] else count
+        rules.append(Rule(index, name, method, pattern, _UNITS[match["unit"]] / count, max(1, burst)))
+    return rules
+
+
+def gcra(tat: Optional[float], now: float, interval: float, burst: int) -> Tuple[Optional[float], float]:
+    """One GCRA step: (the bucket's new TAT, or ``None`` if the request is rejected, and the
+    seconds until it would be allowed)."""
+    new_tat = max(tat if tat is not None else now, now) + interval
+    allow_at = new_tat - burst * interval
+    if allow_at > now:
+        return None, allow_at - now
+    return new_tat, 0.0
+
+
+# --- Stores ---
+
+class MemoryStore:
+    """Per-process GCRA state: key -> TAT in a dict kept in least recently updated order.
+
+    A bucket whose TAT has passed is full again, i.e. no different from a missing key, so each
+    update also drops up to two such entries from the old end (amortized O(1), no sweeper pass
+    over the whole dict). ``max_keys`` bounds memory under a flood of new keys. Only used from
+    the event loop, so there is no lock.
+    """
+
+    def __init__(self, max_keys: int) -> None:
+        self.max_keys = max_keys
+        self._tats: Dict[Hashable, float] = {}
+
+    async def hit(self, key: Hashable, interval: float, burst: int) -> float:
+        now = time.monotonic()
+        tats = self._tats
+        tat = tats.get(key)
+        new_tat, retry_after = gcra(tat, now, interval, burst)
+        if new_tat is None:
+            return retry_after
+        if tat is not None:
+            del tats[key]  # re-inserted at the recent end
+        tats[key] = new_tat
+        for oldest in list(islice(tats, 2)):
+            if tats[oldest] > now and len(tats) <= self.max_keys:
+                break
+            del tats[oldest]
+        return 0.0
+
+    def __len__(self) -> int:
+        return len(self._tats)
+
+
+# KEYS[1] = bucket; ARGV = interval (ms), burst. Returns {allowed, retry-after ms}. Uses the
+# server clock so every worker agrees on "now".
+GCRA_SCRIPT = """
+local interval = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local clock = redis.call('TIME')
+local now = clock[1] * 1000 + clock[2] / 1000
+local tat = tonumber(redis.call('GET', KEYS[1])) or now
+if tat < now then tat = now end
+local new_tat = tat + interval
+local allow_at = new_tat - burst * interval
+if allow_at > now then
+    return {0, math.ceil(allow_at - now)}
+end
+redis.call('SET', KEYS[1], tostring(new_tat), 'PX', math.ceil(new_tat - now))
+return {1, 0}
+"""
+
+
+class RedisStore:
+    """Shared GCRA state for any client exposing ``redis.asyncio``'s ``register_script``."""
+
+    def __init__(self, client, prefix: str = "ratelimit:") -> None:
+        self.client = client
+        self.prefix = prefix
+        self._script = client.register_script(GCRA_SCRIPT)
+
+    @classmethod
+    def from_url(cls, url: str) -> "RedisStore":
+        try:
+            import redis.asyncio as redis
+        except ImportError as exc:
+            raise RuntimeError("RATE_LIMIT_BACKEND=redis requires the 'redis' package") from exc
+        return cls(redis.from_url(url))
+
+    async def hit(self, key: Tuple[int, str], interval: float, burst: int) -> float:
+        try:
+            allowed, retry_ms = await self._script(keys=[f"{self.prefix}{key[0]}:{key[1]}"], args=[interval * 1000, burst])
+        except Exception:
+            # Fail open: an unreachable limiter must not take the API down with it.
+            logger.exception("rate limit backend unavailable, request let through")
+            return 0.0
+        return 0.0 if int(allowed) else int(retry_ms) / 1000
+
+
+def make_store(kind: str):
+    if kind == "memory":
+        return MemoryStore(settings.RATE_LIMIT_MAX_KEYS)
+    if kind == "redis":
+        return RedisStore.from_url(settings.REDIS_URL)
+    raise ValueError(f"Unknown RATE_LIMIT_BACKEND {kind!r}")
+
+
+# --- Limiter ---
+
+def _bearer(scope) -> Optional[str]:
+    for name, value in scope["headers"]:
+        if name == b"authorization":
+            scheme, _, token = value.decode("latin-1").partition(" ")
+            return token.strip() if scheme.lower() == "bearer" else None
+    return None
+
+
+def caller(scope) -> str:
+    """``user:<sub>`` for a valid bearer token outside ``/auth/``, else ``ip:<client address>``."""
+    if not scope["path"].startswith("/auth/"):
+        token = _bearer(scope)
+        if token:
+            try:
+                sub = decode_token(token).get("sub")
+            except HTTPException:
+                sub = None
+            if sub:
+                return f"user:{sub}"
+    client = scope.get("client")
+    return f"ip:{client[0] if client else 'unknown'}"
+
+
+class RateLimiter:
+    def __init__(self, rules: List[Rule], store) -> None:
+        self.rules = rules
+        self.store = store
+
+    def rule_for(self, method: str, path: str) -> Optional[Rule]:
+        for rule in self.rules:
+            if rule.matches(method, path):
+                return rule if rule.interval else None
+        return None
+
+    async def check(self, scope) -> Tuple[Optional[Rule], float]:
+        """(matching rule, seconds to wait); 0 seconds means the request may go ahead."""
+        rule = self.rule_for(scope["method"], scope["path"])
+        if rule is None:
+            return None, 0.0
+        return rule, await self.store.hit((rule.index, caller(scope)), rule.interval, rule.burst)
+
+
+_BODY = b'{"detail":"Too many requests"}'
+
+
+class RateLimitMiddleware:
+    """Pure ASGI middleware answering 429 (with ``Retry-After``) for callers over budget."""
+
+    def __init__(self, app, limiter: Optional[RateLimiter] = None) -> None:
+        self.app = app
+        self.limiter = limiter or RateLimiter(parse_rules(settings.RATE_LIMITS), make_store(settings.RATE_LIMIT_BACKEND))
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] == "http":
+            rule, retry_after = await self.limiter.check(scope)
+            if retry_after:
+                RATE_LIMITED.inc(rule.name)
+                await send({
+                    "type": "http.response.start",
+                    "status": 429,
+                    "headers": [
+                        (b"content-type", b"application/json"),
+                        (b"content-length", str(len(_BODY)).encode()),
+                        (b"retry-after", str(max(1, math.ceil(retry_after))).encode()),
+                    ],
+                })
+                await send({"type": "http.response.body", "body": _BODY})
+                return
+        await self.app(scope, receive, send)
@@ -0,0 +1,395 @@
+"""Pre-aggregated analytics tables and their maintenance.
+
+``order_daily_rollup`` and ``customer_order_rollup`` are updated incrementally for every new
+order (``record_order_deltas``) and can be rebuilt from the base tables at any time, archived
+months (App.partitions) included. With JOB_QUEUE_ENABLED the order's transaction only writes
+a durable "rollups" job to the outbox and the upserts run right after, batched, on the job
+queue (App.jobs), so the rollups trail the orders by milliseconds; otherwise they are upserted
+in the order's transaction. Revenue is kept in integer cents so rollup sums are exact.
+
+    python -m App.rollups rebuild   # backfill / repair from Orders + Payments
+    python -m App.rollups verify    # compare every analytics endpoint with the live joins
+"""
+import argparse
+import asyncio
+import datetime
+import inspect
+import sys
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import Date, Integer, case, cast, delete, func, insert, select, type_coerce
+
+from App.bulk import upsert_insert
+from App.jobs import invalidate_analytics, register, stage
+from App.models import (
+    Customers,
+    Orders,
+    Payments,
+    Restaurants,
+    PaymentStatus,
+    OrderFoodItem,
+    RestaurantAreaName,
+    OrderDailyRollup,
+    CustomerOrderRollup,
+    Outbox,
+)
+from App.partitions import archive_rows, archived_file_names, archived_files, partitioned_rows
+from App.settings import settings
+
+
+@dataclass(frozen=True)
+class OrderDelta:
+    day: datetime.date
+    restaurant_id: int
+    item_name: OrderFoodItem
+    customer_id: int
+    paid: bool
+    revenue_cents: int
+
+
+def to_cents(amount: float) -> int:
+    """Half away from zero, like SQL ``round(amount * 100)`` in ``rebuild`` (not Python's
+    half-to-even ``round``), so both paths agree even on a stored sub-cent amount."""
+    cents = amount * 100
+    return int(cents + 0.5) if cents >= 0 else int(cents - 0.5)
+
+
+def order_delta(order: Orders, payment: Optional[Payments]) -> OrderDelta:
+    paid = payment is not None and payment.status == PaymentStatus.PASS
+    return OrderDelta(
+        day=order.created_at.date(),
+        restaurant_id=order.restaurant_id,
+        item_name=order.item_name,
+        customer_id=order.customer_id,
+        paid=paid,
+        revenue_cents=to_cents(payment.amount) if paid else 0,
+    )
+
+
+DAILY_COLUMNS = ("day", "restaurant_id", "item_name", "orders_count", "paid_orders_count", "revenue_cents")
+CUSTOMER_COLUMNS = ("customer_id", "orders_count")
+
+
+def _additive_upserts(dialect_name: str) -> Tuple[object, object]:
+    """(daily, per-customer) upserts that add their counts onto existing rollup rows."""
+    upsert = upsert_insert(dialect_name)
+    daily_table = OrderDailyRollup.__table__
+    daily_stmt = upsert(daily_table)
+    daily_stmt = daily_stmt.on_conflict_do_update(
+        index_elements=[daily_table.c.day, daily_table.c.restaurant_id, daily_table.c.item_name],
+        set_={
+            "orders_count": daily_table.c.orders_count + daily_stmt.excluded.orders_count,
+            "paid_orders_count": daily_table.c.paid_orders_count + daily_stmt.excluded.paid_orders_count,
+            "revenue_cents": daily_table.c.revenue_cents + daily_stmt.excluded.revenue_cents,
+        },
+    )
+    customer_table = CustomerOrderRollup.__table__
+    customer_stmt = upsert(customer_table)
+    customer_stmt = customer_stmt.on_conflict_do_update(
+        index_elements=[customer_table.c.customer_id],
+        set_={"orders_count": customer_table.c.orders_count + customer_stmt.excluded.orders_count},
+    )
+    return daily_stmt, customer_stmt
+
+
+def rollup_statements(dialect_name: str, deltas: Iterable[OrderDelta]) -> List[Tuple[object, list]]:
+    """Upsert statements (with executemany params) that fold ``deltas`` into the rollups."""
+    daily: Dict[tuple, List[int]] = defaultdict(lambda: [0, 0, 0])
+    per_customer: Dict[int, int] = defaultdict(int)
+    for delta in deltas:
+        totals = daily[(delta.day, delta.restaurant_id, delta.item_name)]
+        totals[0] += 1
+        totals[1] += int(delta.paid)
+        totals[2] += delta.revenue_cents
+        per_customer[delta.customer_id] += 1
+    if not daily:
+        return []
+
+    daily_stmt, customer_stmt = _additive_upserts(dialect_name)
+    return [
+        (daily_stmt, [
+            {
+                "day": day,
+                "restaurant_id": restaurant_id,
+                "item_name": item_name,
+                "orders_count": count,
+                "paid_orders_count": paid,
+                "revenue_cents": cents,
+            }
+            for (day, restaurant_id, item_name), (count, paid, cents) in daily.items()
+        ]),
+        (customer_stmt, [
+            {"customer_id": customer_id, "orders_count": count}
+            for customer_id, count in per_customer.items()
+        ]),
+    ]
+
+
+async def apply_order_deltas(session, deltas: Iterable[OrderDelta]) -> None:
+    """Fold new orders into the rollups inside the caller's (uncommitted) transaction."""
+    for statement, params in rollup_statements(session.bind.dialect.name, deltas):
+        await session.execute(statement, params)
+
+
+# --- Deferred updates (App.jobs) ---
+
+ROLLUP_JOB = "rollups"
+
+
+def _delta_payload(delta: OrderDelta) -> list:
+    return [delta.day.isoformat(), delta.restaurant_id, OrderFoodItem(delta.item_name).value, delta.customer_id, delta.paid, delta.revenue_cents]
+
+
+def _payload_delta(payload: list) -> OrderDelta:
+    day, restaurant_id, item_name, customer_id, paid, revenue_cents = payload
+    return OrderDelta(datetime.date.fromisoformat(day), restaurant_id, OrderFoodItem(item_name), customer_id, paid, revenue_cents)
+
+
+async def record_order_deltas(session, deltas: Iterable[OrderDelta]):
+    """Account for new orders in the caller's (uncommitted) transaction: as a rollups job in
+    the outbox, which the caller hands to ``job_queue.submit`` after committing, or (queue
+    disabled) by applying the deltas right away. Returns the outbox row, if any."""
+    deltas = list(deltas)
+    if not deltas:
+        return None
+    if not settings.JOB_QUEUE_ENABLED:
+        await apply_order_deltas(session, deltas)
+        return None
+    return stage(session, ROLLUP_JOB, [_delta_payload(delta) for delta in deltas])
+
+
+def _apply_rollup_jobs(session, payloads: List[list]) -> None:
+    deltas = [_payload_delta(payload) for deltas in payloads for payload in deltas]
+    for statement, params in rollup_statements(session.bind.dialect.name, deltas):
+        session.execute(statement, params)
+
+
+register(ROLLUP_JOB, _apply_rollup_jobs, durable=True, after=invalidate_analytics)
+
+
+def rebuild(connection) -> None:
+    """Recompute both rollup tables from Orders/Payments in a single pass each, then add the
+    same aggregates from every archived month. Queued rollup jobs are dropped: the orders
+    they carry are already in the base tables."""
+    paid = Payments.status == PaymentStatus.PASS
+    day = type_coerce(func.date(Orders.created_at), Date)
+    daily = (
+        select(
+            day,
+            Orders.restaurant_id,
+            Orders.item_name,
+            func.count(Orders.order_id),
+            func.coalesce(func.sum(case((paid, 1), else_=0)), 0),
+            func.coalesce(func.sum(case((paid, cast(func.round(Payments.amount * 100), Integer)), else_=0)), 0),
+        )
+        .select_from(Orders)
+        .outerjoin(Payments, Payments.transaction_id == Orders.transaction_id)
+        .group_by(day, Orders.restaurant_id, Orders.item_name)
+    )
+    per_customer = select(Orders.customer_id, func.count(Orders.order_id)).group_by(Orders.customer_id)
+
+    daily_table = OrderDailyRollup.__table__
+    customer_table = CustomerOrderRollup.__table__
+    daily_upsert, customer_upsert = _additive_upserts(connection.dialect.name)
+    # Read the archived months first: their connections attach the live database, which a
+    # rollback-journal writer with uncommitted deletes would keep them from reading.
+    archived = [
+        (statement, columns, archive_rows(file_name, source))
+        for file_name in archived_file_names(connection)
+        for statement, columns, source in (
+            (daily_upsert, DAILY_COLUMNS, daily),
+            (customer_upsert, CUSTOMER_COLUMNS, per_customer),
+        )
+    ]
+    connection.execute(delete(daily_table))
+    connection.execute(delete(customer_table))
+    connection.execute(delete(Outbox.__table__).where(Outbox.__table__.c.kind == ROLLUP_JOB))
+    connection.execute(insert(daily_table).from_select(list(DAILY_COLUMNS), daily))
+    connection.execute(insert(customer_table).from_select(list(CUSTOMER_COLUMNS), per_customer))
+    for statement, columns, rows in archived:
+        if rows:
+            connection.execute(statement, [dict(zip(columns, row)) for row in rows])
+
+
+# --- Live-join reference queries, used to verify the rollups ---
+
+def last_month_window(now: datetime.datetime) -> Tuple[datetime.datetime, datetime.datetime]:
+    """[first day of last month, first day of this month)."""
+    first_of_this_month = datetime.datetime(now.year, now.month, 1)
+    last_month_end = first_of_this_month - datetime.timedelta(days=1)
+    return datetime.datetime(last_month_end.year, last_month_end.month, 1), first_of_this_month
+
+
+def _live_paid_orders():
+    return (
+        select(func.coalesce(func.sum(Payments.amount), 0.0))
+        .select_from(Orders)
+        .join(Payments, Payments.transaction_id == Orders.transaction_id)
+        .join(Restaurants, Restaurants.restaurant_id == Orders.restaurant_id)
+        .where(Payments.status == PaymentStatus.PASS)
+    )
+
+
+def _combined(parts: List[list]) -> Dict[tuple, float]:
+    """Add up the last column of rows from several partitions, keyed by the other columns."""
+    totals: Dict[tuple, float] = defaultdict(int)
+    for part in parts:
+        for *key, value in part:
+            totals[tuple(key)] += value or 0
+    return totals
+
+
+async def live_reports(session, now: datetime.datetime) -> dict:
+    """The analytics reports straight from the base tables (live and archived months)."""
+    async def rows(statement, start=None, end=None) -> List[list]:
+        return await partitioned_rows(session, statement, await archived_files(session, start, end))
+
+    start, end = last_month_window(now)
+    mumbai = _combined(await rows(
+        _live_paid_orders()
+        .where(Restaurants.area == RestaurantAreaName.MUMBAI)
+        .where(Orders.created_at >= start)
+        .where(Orders.created_at < end),
+        start, end,
+    ))
+    veg = _combined(await rows(
+        _live_paid_orders()
+        .where(Restaurants.area == RestaurantAreaName.BANGALORE)
+        .where(Orders.item_name.in_([OrderFoodItem.VEG_MANCHURIAN, OrderFoodItem.VEG_FRIED_RICE]))
+    ))
+    per_customer = _combined(await rows(
+        select(Customers.id, Customers.name, func.count(Orders.order_id))
+        .join(Orders, Orders.customer_id == Customers.id)
+        .group_by(Customers.id)
+    ))
+    top = sorted(per_customer.items(), key=lambda item: (-item[1], item[0][0]))[:3]
+    # Filter on the raw column (sargable, uses ix_orders_created_at); bucket only in SELECT.
+    start = datetime.datetime.combine(now.date() - datetime.timedelta(days=6), datetime.time())
+    day = func.date(Orders.created_at)
+    daily = _combined(await rows(
+        select(day, Restaurants.area, func.coalesce(func.sum(Payments.amount), 0.0))
+        .select_from(Orders)
+        .join(Payments, Payments.transaction_id == Orders.transaction_id)
+        .join(Restaurants, Restaurants.restaurant_id == Orders.restaurant_id)
+        .where(Payments.status == PaymentStatus.PASS)
+        .where(Orders.created_at >= start)
+        .group_by(day, Restaurants.area),
+        start,
+    ))
+    items = _combined(await rows(
+        select(Orders.restaurant_id, Orders.item_name, func.count(Orders.order_id))
+        .group_by(Orders.restaurant_id, Orders.item_name)
+    ))
+    return {
+        "earnings_mumbai_last_month": round(float(mumbai[()]), 2),
+        "earnings_veg_bangalore": round(float(veg[()]), 2),
+        "top_customers": [(name, count) for (_, name), count in top],
+        "daily_revenue": [(str(d), area, round(float(total), 2)) for (d, area), total in daily.items()],
+        "items_summary": [(rid, item, count) for (rid, item), count in items.items()],
+    }
+
+
+async def rollup_reports(session) -> dict:
+    """The same reports as ``live_reports``, produced by the analytics endpoints themselves."""
+    from App.routers import analytics
+
+    # Bypass the response cache: compare what the rollups hold right now.
+    mumbai = await inspect.unwrap(analytics.earnings_mumbai_last_month)(session=session)
+    veg = await inspect.unwrap(analytics.earnings_veg_bangalore)(session=session)
+    top = await inspect.unwrap(analytics.top_customers)(limit=3, window="all", session=session)
+    daily = await inspect.unwrap(analytics.daily_revenue)(session=session)
+    restaurant_ids = (await session.execute(
+        select(OrderDailyRollup.restaurant_id).distinct().order_by(OrderDailyRollup.restaurant_id)
+    )).scalars().all()
+    items = []
+    for restaurant_id in restaurant_ids:
+        summary = await inspect.unwrap(analytics.orders_summary_by_restaurant)(restaurant_id, session=session)
+        items.extend((restaurant_id, row.item_name, row.count) for row in sorted(summary, key=lambda r: r.item_name.name))
+    return {
+        "earnings_mumbai_last_month": mumbai.total_amount,
+        "earnings_veg_bangalore": veg.total_amount,
+        "top_customers": [(row.name, row.orders_count) for row in top],
+        "daily_revenue": sorted((row.date, row.area, row.total_amount) for row in daily),
+        "items_summary": items,
+    }
+
+
+def aggregate_questions(now: datetime.datetime) -> list:
+    """``/analytics/aggregate`` questions the rollups can answer, one per dimension/metric."""
+    from App.aggregate import AggregateQuery
+
+    today = datetime.datetime.combine(now.date(), datetime.time())
+    start, end = last_month_window(now)
+    return [
+        AggregateQuery(metric="sum", group_by=("day", "area"), start=today - datetime.timedelta(days=6)),
+        AggregateQuery(metric="sum", group_by=("month",)),
+        AggregateQuery(metric="sum", group_by=("restaurant",), start=start, end=end),
+        AggregateQuery(metric="sum", areas=(RestaurantAreaName.BANGALORE,),
+                       items=(OrderFoodItem.VEG_MANCHURIAN, OrderFoodItem.VEG_FRIED_RICE)),
+        AggregateQuery(metric="count", group_by=("item", "restaurant")),
+        AggregateQuery(metric="count", group_by=("week", "area"), statuses=tuple(PaymentStatus)),
+        AggregateQuery(metric="avg", group_by=("area",)),
+    ]
+
+
+async def aggregate_paths(session, now: datetime.datetime) -> List[str]:
+    """Questions where the rollup path and the base-table path of the aggregate engine differ."""
+    from App.aggregate import run_aggregate
+
+    problems = []
+    for query in aggregate_questions(now):
+        rolled = await run_aggregate(session, query)
+        base = await run_aggregate(session, query, rollups=False)
+        if rolled != base:
+            wrong = [(r, b) for r, b in zip(rolled, base) if r != b][:3]
+            problems.append(f"aggregate {query}: rollups={len(rolled)} rows, base tables={len(base)} rows, e.g. {wrong}")
+    return problems
+
+
+async def verify(session, now: Optional[datetime.datetime] = None) -> List[str]:
+    """Return a description of every report where rollups and live joins disagree."""
+    now = now or datetime.datetime.utcnow()
+    live = await live_reports(session, now)
+    rolled = await rollup_reports(session)
+    live["daily_revenue"] = sorted(live["daily_revenue"])
+    live["items_summary"] = sorted(live["items_summary"], key=lambda r: (r[0], r[1].name))
+    return [
+        f"{name}: live={live[name]!r} rollup={rolled[name]!r}"
+        for name in live
+        if live[name] != rolled[name]
+    ] + await aggregate_paths(session, now)
+
+
+def main(argv=None) -> int:
+    from App.database import engine, init_db, make_async_session, dispose_engines
+
+    parser = argparse.ArgumentParser(description="Maintain the analytics rollup tables.")
+    parser.add_argument("command", choices=["rebuild", "verify"])
+    args = parser.parse_args(argv)
+
+    init_db()
+    if args.command == "rebuild":
+        with engine.begin() as connection:
+            rebuild(connection)
+        print("rollups rebuilt")
+        return 0
+
+    async def run_verify() -> List[str]:
+        try:
+            async with make_async_session() as session:
+                return await verify(session)
+        finally:
+            await dispose_engines()
+
+    problems = asyncio.run(run_verify())
+    for problem in problems:
+        print(f"mismatch {problem}")
+    if not problems:
+        print("rollups match live queries")
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
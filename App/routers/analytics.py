@@ -1,20 +1,30 @@
-from datetime import datetime, timedelta
-from typing import List
+from datetime import datetime, time, timedelta
+from typing import List, Literal, Optional
 
-from fastapi import APIRouter, Depends, HTTPException
-from sqlmodel import Session, select, func
+from fastapi import APIRouter, Depends, HTTPException, Query
+from starlette.responses import StreamingResponse
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
 
-from App.database import get_session
+from App.database import uses_replica
 from App.models import (
-    Orders,
-    Payments,
-    Restaurants,
-    PaymentStatus,
+    Customers,
     OrderFoodItem,
+    PaymentStatus,
+    PaymentType,
     RestaurantAreaName,
 )
-from App.schemas import EarningsResult, TopCustomer, DailyRevenue, ItemCount
-from App.utils import get_current_user
+from App.aggregate import AggregateQuery, run_aggregate
+from App.cache import ANALYTICS_NAMESPACE, response_cache
+from App.export import (
+    MEDIA_TYPES, WATERMARK_HEADER,
+    check_format, current_watermark, decode_watermark, encode_watermark, export_bytes, next_watermark,
+)
+from App.leaderboard import leaderboard
+from App.rollups import last_month_window
+from App.settings import settings
+from App.schemas import EarningsResult, TopCustomer, DailyRevenue, ItemCount, AggregateRow
+from App.utils import get_current_user, get_read_session
 
 
 router = APIRouter(prefix="/analytics", tags=["Analytics"], dependencies=[Depends(get_current_user)])
@@ -23,94 +33,137 @@ router = APIRouter(prefix="/analytics", tags=["Analytics"], dependencies=[Depend
 """Assumption: One payment per order. If a payment maps to multiple orders, sums may double count."""
 
 
+# The fixed dashboard questions are presets of the aggregate engine (App.aggregate); with the
+# default paid-only filter and whole-day ranges they read the pre-aggregated rollups.
+
 # 1. Total earnings of restaurants in Mumbai last month
 @router.get("/earnings/mumbai-last-month", response_model=EarningsResult)
-def earnings_mumbai_last_month(session: Session = Depends(get_session)):
-    now = datetime.utcnow()
-    first_of_this_month = datetime(now.year, now.month, 1)
-    last_month_end = first_of_this_month - timedelta(seconds=1)
-    first_of_last_month = datetime(last_month_end.year, last_month_end.month, 1)
-
-    stmt = (
-        select(func.coalesce(func.sum(Payments.amount), 0.0))
-        .select_from(Orders)
-        .join(Payments, Payments.transaction_id == Orders.transaction_id)
-        .join(Restaurants, Restaurants.restaurant_id == Orders.restaurant_id)
-        .where(Payments.status == PaymentStatus.PASS)
-        .where(Restaurants.area == RestaurantAreaName.MUMBAI)
-        .where(Orders.created_at >= first_of_last_month)
-        .where(Orders.created_at <= last_month_end)
+@response_cache.cached(ANALYTICS_NAMESPACE)
+async def earnings_mumbai_last_month(session: AsyncSession = Depends(get_read_session)):
+    first_of_last_month, first_of_this_month = last_month_window(datetime.utcnow())
+    query = AggregateQuery(
+        metric="sum", start=first_of_last_month, end=first_of_this_month, areas=(RestaurantAreaName.MUMBAI,)
     )
-    total = session.exec(stmt).one() or 0.0
-    return EarningsResult(total_amount=float(total), currency="INR")
+    [row] = await run_aggregate(session, query)
+    return EarningsResult(total_amount=row["value"], currency="INR")
 
 
 # 2. Total earnings from veg items in Bangalore
 @router.get("/earnings/veg-bangalore", response_model=EarningsResult)
-def earnings_veg_bangalore(session: Session = Depends(get_session)):
-    veg_items = [OrderFoodItem.VEG_MANCHURIAN, OrderFoodItem.VEG_FRIED_RICE]
-    stmt = (
-        select(func.coalesce(func.sum(Payments.amount), 0.0))
-        .select_from(Orders)
-        .join(Payments, Payments.transaction_id == Orders.transaction_id)
-        .join(Restaurants, Restaurants.restaurant_id == Orders.restaurant_id)
-        .where(Payments.status == PaymentStatus.PASS)
-        .where(Restaurants.area == RestaurantAreaName.BANGALORE)
-        .where(Orders.item_name.in_(veg_items))
-    )
-    total = session.exec(stmt).one() or 0.0
-    return EarningsResult(total_amount=float(total), currency="INR")
+@response_cache.cached(ANALYTICS_NAMESPACE)
+async def earnings_veg_bangalore(session: AsyncSession = Depends(get_read_session)):
+    veg_items = (OrderFoodItem.VEG_MANCHURIAN, OrderFoodItem.VEG_FRIED_RICE)
+    query = AggregateQuery(metric="sum", areas=(RestaurantAreaName.BANGALORE,), items=veg_items)
+    [row] = await run_aggregate(session, query)
+    return EarningsResult(total_amount=row["value"], currency="INR")
 
 
-# 3. Top 3 customers with most orders placed
+# 3. Top customers with most orders placed (all time, or over the last 7/30 days)
 @router.get("/top-customers", response_model=List[TopCustomer])
-def top_customers(session: Session = Depends(get_session)):
-    from App.models import Customers  # local import to avoid cycles
-
-    stmt = (
-        select(Customers.name, func.count(Orders.order_id).label("orders_count"))
-        .join(Orders, Orders.customer_id == Customers.id)
-        .group_by(Customers.id)
-        .order_by(func.count(Orders.order_id).desc())
-        .limit(3)
-    )
-    rows = session.exec(stmt).all()
-    return [TopCustomer(name=name, orders_count=cnt) for name, cnt in rows]
+@response_cache.cached(ANALYTICS_NAMESPACE)
+async def top_customers(
+    limit: int = Query(3, ge=1, le=settings.PAGE_MAX_LIMIT),
+    window: Literal["all", "7d", "30d"] = Query("all"),
+    session: AsyncSession = Depends(get_read_session),
+):
+    # Ranked in memory by App.leaderboard; only the names are read here, by primary key.
+    top = await leaderboard.top(session, limit, window)
+    names = dict((await session.exec(
+        select(Customers.id, Customers.name).where(Customers.id.in_([customer_id for customer_id, _ in top]))
+    )).all())
+    return [
+        TopCustomer(name=names[customer_id], orders_count=count)
+        for customer_id, count in top
+        if customer_id in names
+    ]
 
 
 # 4. Daily revenue for past 7 days per city
 @router.get("/daily-revenue", response_model=List[DailyRevenue])
-def daily_revenue(session: Session = Depends(get_session)):
-    start_date = datetime.utcnow().date() - timedelta(days=6)
-    stmt = (
-        select(
-            func.date(Orders.created_at).label("date"),
-            Restaurants.area,
-            func.coalesce(func.sum(Payments.amount), 0.0).label("total_amount"),
-        )
-        .select_from(Orders)
-        .join(Payments, Payments.transaction_id == Orders.transaction_id)
-        .join(Restaurants, Restaurants.restaurant_id == Orders.restaurant_id)
-        .where(Payments.status == PaymentStatus.PASS)
-        .where(func.date(Orders.created_at) >= start_date)
-        .group_by(func.date(Orders.created_at), Restaurants.area)
-        .order_by(func.date(Orders.created_at))
-    )
-    rows = session.exec(stmt).all()
+@response_cache.cached(ANALYTICS_NAMESPACE)
+async def daily_revenue(session: AsyncSession = Depends(get_read_session)):
+    start = datetime.combine(datetime.utcnow().date() - timedelta(days=6), time())
+    rows = await run_aggregate(session, AggregateQuery(metric="sum", group_by=("day", "area"), start=start))
     return [
-        DailyRevenue(date=str(date), area=area, total_amount=float(total), currency="INR")
-        for date, area, total in rows
+        DailyRevenue(date=row["day"], area=row["area"], total_amount=row["value"], currency="INR")
+        for row in rows
     ]
 
 
 # 5. Orders summary for a specific restaurant (Total orders by item name and count)
 @router.get("/restaurant/{restaurant_id}/items-summary", response_model=List[ItemCount])
-def orders_summary_by_restaurant(restaurant_id: int, session: Session = Depends(get_session)):
-    stmt = (
-        select(Orders.item_name, func.count(Orders.order_id).label("count"))
-        .where(Orders.restaurant_id == restaurant_id)
-        .group_by(Orders.item_name)
+@response_cache.cached(ANALYTICS_NAMESPACE)
+async def orders_summary_by_restaurant(restaurant_id: int, session: AsyncSession = Depends(get_read_session)):
+    query = AggregateQuery(
+        metric="count", group_by=("item",), restaurant_ids=(restaurant_id,), statuses=tuple(PaymentStatus)
     )
-    rows = session.exec(stmt).all()
-    return [ItemCount(item_name=item, count=cnt) for item, cnt in rows]
+    rows = await run_aggregate(session, query)
+    return [ItemCount(item_name=row["item"], count=row["value"]) for row in rows]
+
+
+# 6. Any other question: filters, group-by dimensions and a metric, compiled to one statement
+@router.get("/aggregate", response_model=List[AggregateRow], response_model_exclude_none=True)
+@response_cache.cached(ANALYTICS_NAMESPACE)
+async def aggregate(
+    metric: Literal["count", "sum", "avg"] = "sum",
+    group_by: List[Literal["day", "week", "month", "area", "item", "restaurant", "payment_type"]] = Query([]),
+    start: Optional[datetime] = Query(None, description="inclusive, UTC"),
+    end: Optional[datetime] = Query(None, description="exclusive, UTC"),
+    area: List[RestaurantAreaName] = Query([]),
+    item: List[OrderFoodItem] = Query([]),
+    restaurant_id: List[int] = Query([]),
+    payment_type: List[PaymentType] = Query([]),
+    status: List[PaymentStatus] = Query([PaymentStatus.PASS]),
+    session: AsyncSession = Depends(get_read_session),
+):
+    """``count`` counts orders; ``sum``/``avg`` are over payment amounts. Only PASS payments
+    are included unless ``status`` says otherwise."""
+    query = AggregateQuery(
+        metric=metric,
+        group_by=tuple(group_by),
+        start=start,
+        end=end,
+        areas=tuple(area),
+        items=tuple(item),
+        restaurant_ids=tuple(restaurant_id),
+        payment_types=tuple(payment_type),
+        statuses=tuple(status),
+    )
+    try:
+        return await run_aggregate(session, query)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+
+
+# 7. Bulk export for offline analysis: joined order rows streamed in columnar batches
+@router.get("/export", response_class=StreamingResponse)
+async def export_orders(
+    output: Literal["csv", "arrow", "parquet"] = Query("csv", alias="format"),
+    since: Optional[str] = Query(None, description="X-Export-Watermark of a previous export"),
+    session: AsyncSession = Depends(get_read_session),
+):
+    """Orders with their payment and restaurant, oldest first, from a server-side cursor.
+
+    ``X-Export-Watermark`` marks the newest order included (orders from the last
+    EXPORT_SETTLE_SECONDS wait for the next export); pass it as ``since`` next time to fetch
+    only what was added after it.
+    """
+    try:
+        check_format(output)
+    except RuntimeError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    after = decode_watermark(since)
+    upto = await current_watermark(session)
+    return StreamingResponse(
+        export_bytes(output, after, upto, replica=uses_replica(session)),
+        media_type=MEDIA_TYPES[output],
+        headers={
+            WATERMARK_HEADER: encode_watermark(next_watermark(after, upto)),
+            "Content-Disposition": f'attachment; filename="orders.{output}"',
+        },
+    )
+
 
+@router.get("/cache-stats")
+async def cache_stats():
+    return response_cache.stats()
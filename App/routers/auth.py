@@ -1,14 +1,20 @@
 from fastapi import APIRouter, Depends, HTTPException, Request
 from starlette.responses import RedirectResponse
 from urllib.parse import urlencode
-from sqlmodel import Session, select
-import httpx, os 
-from jose import JWTError, jwt
-from datetime import datetime, timedelta
+from typing import Optional
+from sqlalchemy import func
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+import os 
 
 from App.database import get_session
 from App.models import Customers
 from App.settings import settings
+from App.auth_utils import invalidate_user, mint_access_token
+from App.bulk import upsert_insert
+
+# httpx and jose/cryptography (App.oauth) are imported inside the handlers so they load on
+# the first login, not at startup.
 
 # --- Router Setup ---
 router = APIRouter(prefix="/auth", tags=["Authentication"])
@@ -18,14 +24,44 @@ GOOGLE_CLIENT_ID = settings.GOOGLE_CLIENT_ID
 GOOGLE_CLIENT_SECRET = settings.GOOGLE_CLIENT_SECRET
 GOOGLE_REDIRECT_URI = settings.GOOGLE_REDIRECT_URI
 
-GOOGLE_AUTH_ENDPOINT = "https://accounts.google.com/o/oauth2/auth"
-GOOGLE_TOKEN_ENDPOINT = "https://oauth2.googleapis.com/token"
-GOOGLE_USERINFO_ENDPOINT = "https://www.googleapis.com/oauth2/v2/userinfo"
+GOOGLE_AUTH_ENDPOINT = settings.GOOGLE_AUTH_ENDPOINT
+GOOGLE_TOKEN_ENDPOINT = settings.GOOGLE_TOKEN_ENDPOINT
+GOOGLE_USERINFO_ENDPOINT = settings.GOOGLE_USERINFO_ENDPOINT
 
 # --- JWT Secret (store securely in .env ideally) ---
 JWT_SECRET = settings.JWT_SECRET_KEY
 JWT_ALGORITHM = settings.ALGORITHM
-JWT_EXPIRY_MINUTES = settings.ACCESS_TOKEN_EXPIRE_MINUTES
+
+
+def login_upsert(dialect_name: str, google_id: str, name: Optional[str]):
+    """Resolve a Google account to its Customers row in one statement.
+
+    ``INSERT ... ON CONFLICT (google_id) DO UPDATE ... RETURNING``: a first login creates the
+    row, later ones refresh the name, and concurrent first logins for the same account both
+    get the single row instead of one of them hitting the unique constraint.
+    """
+    table = Customers.__table__
+    stmt = upsert_insert(dialect_name)(table).values(google_id=google_id, name=name)
+    return stmt.on_conflict_do_update(
+        index_elements=[table.c.google_id],
+        set_={"name": func.coalesce(stmt.excluded.name, table.c.name)},
+    ).returning(*table.c)
+
+
+def _resolve_customer(session, google_id: str, name: Optional[str]) -> tuple:
+    """(Customers row, whether it was written) for a login, in one session hop.
+
+    Returning users (most of a login spike) only read: SQLite takes its write lock for any
+    INSERT, even one that ends in a no-op conflict. Ending the transaction inside the hop means
+    no connection is held between hops, so logins can't starve each other of pool slots.
+    """
+    user = session.exec(select(Customers).where(Customers.google_id == google_id)).first()
+    written = user is None or (name is not None and user.name != name)
+    if written:
+        row = session.execute(login_upsert(session.bind.dialect.name, google_id, name)).one()
+        user = Customers(**row._mapping)
+    session.commit()
+    return user, written
 
 
 # --- 1️⃣ Google Login Route ---
@@ -45,7 +81,9 @@ async def login():
 
 # --- 2️⃣ Google Callback Route ---
 @router.get("/callback")
-async def callback(request: Request, session: Session = Depends(get_session)):
+async def callback(request: Request, session: AsyncSession = Depends(get_session)):
+    from App.oauth import get_http_client, verify_id_token
+
     code = request.query_params.get("code")
     if not code:
         raise HTTPException(status_code=400, detail="Authorization code not found")
@@ -59,16 +97,20 @@ async def callback(request: Request, session: Session = Depends(get_session)):
         "grant_type": "authorization_code"
     }
 
-    async with httpx.AsyncClient() as client:
-        token_response = await client.post(GOOGLE_TOKEN_ENDPOINT, data=data)
-        token_response.raise_for_status()
-        tokens = token_response.json()
+    # Shared, pooled client: connections to Google stay warm across logins.
+    client = get_http_client()
+    token_response = await client.post(GOOGLE_TOKEN_ENDPOINT, data=data)
+    token_response.raise_for_status()
+    tokens = token_response.json()
 
-        access_token = tokens.get("access_token")
-        if not access_token:
-            raise HTTPException(status_code=400, detail="Access token not found")
+    access_token = tokens.get("access_token")
+    if not access_token:
+        raise HTTPException(status_code=400, detail="Access token not found")
 
-        # --- Get user info ---
+    # --- Get user info ---
+    if settings.GOOGLE_VERIFY_ID_TOKEN and tokens.get("id_token"):
+        user_info = await verify_id_token(client, tokens["id_token"], access_token)
+    else:
         userinfo_response = await client.get(
             GOOGLE_USERINFO_ENDPOINT,
             headers={"Authorization": f"Bearer {access_token}"}
@@ -82,28 +124,13 @@ async def callback(request: Request, session: Session = Depends(get_session)):
     if not google_id:
         raise HTTPException(status_code=400, detail="Invalid user info from Google")
 
-    # --- Check if user exists ---
-    existing_user = session.exec(select(Customers).where(Customers.google_id == google_id)).first()
-
-    if not existing_user:
-        # Create new user
-        new_user = Customers(google_id=google_id, name=name)
-        session.add(new_user)
-        session.commit()
-        session.refresh(new_user)
-        user = new_user
-    else:
-        user = existing_user
+    # --- Resolve the user ---
+    user, written = await session.run_sync(_resolve_customer, google_id, name)
+    if written:
+        invalidate_user(user.id)
 
     # --- Generate JWT token ---
-    payload = {
-        "sub": str(user.id),
-        "google_id": user.google_id,
-        "name": user.name,
-        "exp": datetime.utcnow() + timedelta(minutes=JWT_EXPIRY_MINUTES)
-    }
-
-    token = jwt.encode(payload, JWT_SECRET, algorithm=JWT_ALGORITHM)
+    token = await mint_access_token(user)
 
     return {"access_token": token, "token_type": "bearer", "user": user_info}
 
@@ -111,6 +138,8 @@ async def callback(request: Request, session: Session = Depends(get_session)):
 # --- 3️⃣ Optional route for testing protected endpoints ---
 @router.get("/me")
 def get_user_info(token: str):
+    from jose import jwt
+
     try:
         decoded = jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALGORITHM])
         return {"decoded_user": decoded}
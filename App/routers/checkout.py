@@ -0,0 +1,101 @@
+import datetime
+import hashlib
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Header, HTTPException
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from App.catalog import restaurant_catalog
+from App.database import get_session
+from App.jobs import ANALYTICS_CACHE, job_queue
+from App.models import IdempotencyKeys, Orders, Payments, PaymentStatus
+from App.partitions import find_archived
+from App.rollups import order_delta, record_order_deltas
+from App.schemas import CheckoutCreate, CheckoutRead
+from App.utils import get_current_user
+
+
+router = APIRouter(prefix="/checkout", tags=["Checkout"], dependencies=[Depends(get_current_user)])
+
+
+async def _replay(session: AsyncSession, record: IdempotencyKeys, request_hash: str) -> CheckoutRead:
+    if record.request_hash != request_hash:
+        raise HTTPException(status_code=422, detail="Idempotency-Key was already used with a different request")
+    payment = await session.get(Payments, record.transaction_id)
+    by_payment = select(Orders).where(Orders.transaction_id == record.transaction_id)
+    if payment is None:
+        # Archived months keep a payment and its order in the same file.
+        payment = await find_archived(session, Payments, record.transaction_id)
+        order = await find_archived(session, Payments, record.transaction_id, by_payment)
+    else:
+        order = (await session.exec(by_payment)).first()
+    return CheckoutRead(payment=payment, order=order)
+
+
+@router.post("/", response_model=CheckoutRead)
+async def checkout(
+    payload: CheckoutCreate,
+    idempotency_key: Optional[str] = Header(None, max_length=255),
+    session: AsyncSession = Depends(get_session),
+    user=Depends(get_current_user),
+):
+    """Create the payment and, if it passed, its order atomically in one transaction.
+
+    Retries carrying the same ``Idempotency-Key`` return the original result instead of
+    charging again.
+    """
+    request_hash = hashlib.sha256(payload.model_dump_json().encode()).hexdigest()
+    if idempotency_key:
+        record = await session.get(IdempotencyKeys, (user.id, idempotency_key))
+        if record is not None:
+            return await _replay(session, record, request_hash)
+    if await restaurant_catalog.get(session, payload.restaurant_id) is None:
+        raise HTTPException(status_code=400, detail="Restaurant not found")
+
+    # Naive UTC, as the column round-trips it, so first responses and replays are identical.
+    now = datetime.datetime.now(datetime.UTC).replace(tzinfo=None)
+    payment = Payments(
+        status=payload.status,
+        payment_type=payload.payment_type,
+        amount=payload.amount,
+        currency=payload.currency,
+        created_at=now,
+        customer_id=user.id,
+    )
+    session.add(payment)
+    await session.flush()
+
+    order = outbox = None
+    if payment.status == PaymentStatus.PASS:
+        order = Orders(
+            item_name=payload.item_name,
+            transaction_id=payment.transaction_id,
+            restaurant_id=payload.restaurant_id,
+            customer_id=user.id,
+            created_at=now,
+        )
+        session.add(order)
+        outbox = await record_order_deltas(session, [order_delta(order, payment)])
+    if idempotency_key:
+        session.add(IdempotencyKeys(
+            customer_id=user.id,
+            key=idempotency_key,
+            request_hash=request_hash,
+            transaction_id=payment.transaction_id,
+        ))
+
+    try:
+        await session.commit()
+    except IntegrityError:
+        # A concurrent retry with the same key won the race; hand back its result.
+        await session.rollback()
+        record = await session.get(IdempotencyKeys, (user.id, idempotency_key)) if idempotency_key else None
+        if record is None:
+            raise
+        return await _replay(session, record, request_hash)
+
+    await job_queue.submit(outbox)
+    await job_queue.enqueue(ANALYTICS_CACHE)
+    return CheckoutRead(payment=payment, order=order)
@@ -1,26 +1,38 @@
-from fastapi import APIRouter, Depends, HTTPException
-from typing import List
-from sqlmodel import Session, select
+import datetime
+from fastapi import APIRouter, Body, Depends, HTTPException, Query, Response
+from typing import Any, List, Literal, Optional
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
 
-from App.database import get_session
+from App.bulk import insert_returning, validate_items
+from App.catalog import restaurant_catalog
+from App.database import get_session, uses_replica
+from App.jobs import ANALYTICS_CACHE, job_queue
 from App.models import Orders, Payments, PaymentStatus
-from App.schemas import OrderCreate, OrderRead
-from App.utils import get_current_user
+from App.rollups import order_delta, record_order_deltas
+from App.partitions import find_archived
+from App.pagination import finish_page, keyset, ndjson_response, ndjson_rows_response, page_limit
+from App.schemas import BulkItemError, OrderCreate, OrderRead, OrderBulkResult
+from App.serialization import ORDER_ROWS, json_bytes_response
+from App.settings import settings
+from App.utils import get_current_user, get_read_session
 
 
 router = APIRouter(prefix="/orders", tags=["Orders"], dependencies=[Depends(get_current_user)])
 
 
 @router.post("/", response_model=OrderRead)
-def create_order(payload: OrderCreate, session: Session = Depends(get_session), user=Depends(get_current_user)):
+async def create_order(payload: OrderCreate, session: AsyncSession = Depends(get_session), user=Depends(get_current_user)):
     # Verify payment exists, belongs to user, and is successful
-    payment = session.get(Payments, payload.transaction_id)
-    if session.exec(select(Orders).where(Orders.transaction_id == payload.transaction_id)).first():
-        raise HTTPException(status_code=400, detail="Order with this transaction ID already exists")
+    payment = await session.get(Payments, payload.transaction_id)
     if not payment or payment.customer_id != user.id:
         raise HTTPException(status_code=400, detail="Invalid or unauthorized payment")
     if payment.status != PaymentStatus.PASS:
         raise HTTPException(status_code=400, detail="Payment not successful")
+    # SQLite doesn't enforce the foreign key; the in-memory catalog checks it without a query.
+    if await restaurant_catalog.get(session, payload.restaurant_id) is None:
+        raise HTTPException(status_code=400, detail="Restaurant not found")
 
     order = Orders(
         item_name=payload.item_name,
@@ -29,20 +41,119 @@ def create_order(payload: OrderCreate, session: Session = Depends(get_session),
         customer_id=user.id,
     )
     session.add(order)
-    session.commit()
-    session.refresh(order)
+    try:
+        # ux_orders_transaction_id enforces one order per payment; no pre-insert lookup.
+        outbox = await record_order_deltas(session, [order_delta(order, payment)])
+        await session.commit()
+    except IntegrityError as exc:
+        await session.rollback()
+        if "transaction_id" not in str(exc.orig):
+            raise
+        raise HTTPException(status_code=400, detail="Order with this transaction ID already exists")
+    await job_queue.submit(outbox)
+    await job_queue.enqueue(ANALYTICS_CACHE)
+    await session.refresh(order)
     return order
 
 
+@router.post("/bulk", response_model=OrderBulkResult)
+async def create_orders_bulk(
+    items: List[Any] = Body(...),
+    session: AsyncSession = Depends(get_session),
+    user=Depends(get_current_user),
+):
+    """Insert many orders in one transaction, running create_order's checks as set-based queries."""
+    valid, errors = validate_items(OrderCreate, items)
+    transaction_ids = {payload.transaction_id for _, payload in valid}
+    payments = {}
+    taken = set()
+    if transaction_ids:
+        payments = {
+            row.transaction_id: row
+            for row in (await session.execute(
+                select(Payments.transaction_id, Payments.customer_id, Payments.status, Payments.amount)
+                .where(Payments.transaction_id.in_(transaction_ids))
+            )).all()
+        }
+        taken = set((await session.exec(
+            select(Orders.transaction_id).where(Orders.transaction_id.in_(transaction_ids))
+        )).all())
+
+    unknown_restaurants = await restaurant_catalog.missing(session, {payload.restaurant_id for _, payload in valid})
+
+    now = datetime.datetime.now(datetime.UTC)
+    accepted = []
+    for index, payload in valid:
+        payment = payments.get(payload.transaction_id)
+        if payload.transaction_id in taken:
+            errors.append(BulkItemError(index=index, detail="Order with this transaction ID already exists"))
+        elif not payment or payment.customer_id != user.id:
+            errors.append(BulkItemError(index=index, detail="Invalid or unauthorized payment"))
+        elif payment.status != PaymentStatus.PASS:
+            errors.append(BulkItemError(index=index, detail="Payment not successful"))
+        elif payload.restaurant_id in unknown_restaurants:
+            errors.append(BulkItemError(index=index, detail="Restaurant not found"))
+        else:
+            taken.add(payload.transaction_id)
+            accepted.append({
+                "item_name": payload.item_name,
+                "transaction_id": payload.transaction_id,
+                "restaurant_id": payload.restaurant_id,
+                "created_at": now,
+                "customer_id": user.id,
+            })
+
+    try:
+        rows = await insert_returning(session, Orders, accepted)
+        outbox = await record_order_deltas(session, [order_delta(row, payments[row.transaction_id]) for row in rows])
+        await session.commit()
+    except IntegrityError as exc:
+        await session.rollback()
+        if "transaction_id" not in str(exc.orig):
+            raise
+        raise HTTPException(status_code=409, detail="A transaction ID was ordered concurrently; retry the batch")
+    if rows:
+        await job_queue.submit(outbox)
+        await job_queue.enqueue(ANALYTICS_CACHE)
+    errors.sort(key=lambda error: error.index)
+    return OrderBulkResult(created=[OrderRead.model_validate(row) for row in rows], errors=errors)
+
+
 @router.get("/", response_model=List[OrderRead])
-def list_orders(session: Session = Depends(get_session), user=Depends(get_current_user)):
-    orders = session.exec(select(Orders).where(Orders.customer_id == user.id)).all()
-    return orders
+async def list_orders(
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=settings.PAGE_MAX_LIMIT),
+    cursor: Optional[str] = None,
+    order_by: Literal["order_id", "created_at"] = "order_id",
+    output: Literal["json", "ndjson"] = Query("json", alias="format"),
+    session: AsyncSession = Depends(get_read_session),
+    user=Depends(get_current_user),
+):
+    """Keyset-paginated orders; follow ``X-Next-Cursor``. ``format=ndjson`` streams every row."""
+    sort_column = Orders.created_at if order_by == "created_at" else Orders.order_id
+    fast = settings.FAST_JSON
+    base = ORDER_ROWS.select() if fast else select(Orders)
+    stmt = keyset(base.where(Orders.customer_id == user.id), order_by, sort_column, Orders.order_id, cursor)
+    if output == "ndjson":
+        if limit:
+            stmt = stmt.limit(limit)
+        if fast:
+            return ndjson_rows_response(stmt, ORDER_ROWS.dump_lines, replica=uses_replica(session))
+        return ndjson_response(
+            stmt, lambda order: OrderRead.model_validate(order).model_dump_json(), replica=uses_replica(session)
+        )
+    limit = page_limit(limit)
+    if fast:
+        rows = (await session.execute(stmt.limit(limit + 1))).all()
+        rows = finish_page(rows, limit, order_by, "order_id", response)
+        return json_bytes_response(ORDER_ROWS.dump(rows), response)
+    orders = (await session.exec(stmt.limit(limit + 1))).all()
+    return finish_page(orders, limit, order_by, "order_id", response)
 
 
 @router.get("/{order_id}", response_model=OrderRead)
-def get_order(order_id: int, session: Session = Depends(get_session), user=Depends(get_current_user)):
-    order = session.get(Orders, order_id)
+async def get_order(order_id: int, session: AsyncSession = Depends(get_read_session), user=Depends(get_current_user)):
+    order = await session.get(Orders, order_id) or await find_archived(session, Orders, order_id)
     if not order or order.customer_id != user.id:
         raise HTTPException(status_code=404, detail="Order not found")
     return order
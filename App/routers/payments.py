@@ -1,18 +1,26 @@
-from fastapi import APIRouter, Depends, HTTPException
-from typing import List
-from sqlmodel import Session, select
+import datetime
+from fastapi import APIRouter, Body, Depends, HTTPException, Query, Response
+from typing import Any, List, Literal, Optional
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
 
-from App.database import get_session
+from App.bulk import insert_returning, validate_items
+from App.database import get_session, uses_replica
+from App.jobs import ANALYTICS_CACHE, job_queue
 from App.models import Payments
-from App.schemas import PaymentCreate, PaymentRead
-from App.utils import get_current_user
+from App.partitions import find_archived
+from App.pagination import finish_page, keyset, ndjson_response, ndjson_rows_response, page_limit
+from App.schemas import PaymentCreate, PaymentRead, PaymentBulkResult
+from App.serialization import PAYMENT_ROWS, json_bytes_response
+from App.settings import settings
+from App.utils import get_current_user, get_read_session
 
 
 router = APIRouter(prefix="/payments", tags=["Payments"], dependencies=[Depends(get_current_user)])
 
 
 @router.post("/", response_model=PaymentRead)
-def create_payment(payload: PaymentCreate, session: Session = Depends(get_session), user=Depends(get_current_user)):
+async def create_payment(payload: PaymentCreate, session: AsyncSession = Depends(get_session), user=Depends(get_current_user)):
     payment = Payments(
         status=payload.status,
         payment_type=payload.payment_type,
@@ -21,20 +29,75 @@ def create_payment(payload: PaymentCreate, session: Session = Depends(get_sessio
         customer_id=user.id,
     )
     session.add(payment)
-    session.commit()
-    session.refresh(payment)
+    await session.commit()
+    await job_queue.enqueue(ANALYTICS_CACHE)
+    await session.refresh(payment)
     return payment
 
 
+@router.post("/bulk", response_model=PaymentBulkResult)
+async def create_payments_bulk(
+    items: List[Any] = Body(...),
+    session: AsyncSession = Depends(get_session),
+    user=Depends(get_current_user),
+):
+    """Insert many payments in one transaction; invalid items are reported by index."""
+    valid, errors = validate_items(PaymentCreate, items)
+    now = datetime.datetime.now(datetime.UTC)
+    rows = await insert_returning(session, Payments, [
+        {
+            "status": payload.status,
+            "payment_type": payload.payment_type,
+            "amount": payload.amount,
+            "currency": payload.currency,
+            "created_at": now,
+            "customer_id": user.id,
+        }
+        for _, payload in valid
+    ])
+    await session.commit()
+    if rows:
+        await job_queue.enqueue(ANALYTICS_CACHE)
+    return PaymentBulkResult(created=[PaymentRead.model_validate(row) for row in rows], errors=errors)
+
+
 @router.get("/", response_model=List[PaymentRead])
-def list_payments(session: Session = Depends(get_session), user=Depends(get_current_user)):
-    payments = session.exec(select(Payments).where(Payments.customer_id == user.id)).all()
-    return payments
+async def list_payments(
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=settings.PAGE_MAX_LIMIT),
+    cursor: Optional[str] = None,
+    order_by: Literal["transaction_id", "created_at"] = "transaction_id",
+    output: Literal["json", "ndjson"] = Query("json", alias="format"),
+    session: AsyncSession = Depends(get_read_session),
+    user=Depends(get_current_user),
+):
+    """Keyset-paginated payments; follow ``X-Next-Cursor``. ``format=ndjson`` streams every row."""
+    sort_column = Payments.created_at if order_by == "created_at" else Payments.transaction_id
+    fast = settings.FAST_JSON
+    base = PAYMENT_ROWS.select() if fast else select(Payments)
+    stmt = keyset(
+        base.where(Payments.customer_id == user.id), order_by, sort_column, Payments.transaction_id, cursor
+    )
+    if output == "ndjson":
+        if limit:
+            stmt = stmt.limit(limit)
+        if fast:
+            return ndjson_rows_response(stmt, PAYMENT_ROWS.dump_lines, replica=uses_replica(session))
+        return ndjson_response(
+            stmt, lambda payment: PaymentRead.model_validate(payment).model_dump_json(), replica=uses_replica(session)
+        )
+    limit = page_limit(limit)
+    if fast:
+        rows = (await session.execute(stmt.limit(limit + 1))).all()
+        rows = finish_page(rows, limit, order_by, "transaction_id", response)
+        return json_bytes_response(PAYMENT_ROWS.dump(rows), response)
+    payments = (await session.exec(stmt.limit(limit + 1))).all()
+    return finish_page(payments, limit, order_by, "transaction_id", response)
 
 
 @router.get("/{transaction_id}", response_model=PaymentRead)
-def get_payment(transaction_id: int, session: Session = Depends(get_session), user=Depends(get_current_user)):
-    payment = session.get(Payments, transaction_id)
+async def get_payment(transaction_id: int, session: AsyncSession = Depends(get_read_session), user=Depends(get_current_user)):
+    payment = await session.get(Payments, transaction_id) or await find_archived(session, Payments, transaction_id)
     if not payment or payment.customer_id != user.id:
         raise HTTPException(status_code=404, detail="Payment not found")
     return payment
@@ -1,42 +1,93 @@
-from fastapi import APIRouter, Depends, HTTPException
-from typing import List
-from sqlmodel import Session, select
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response
+from typing import List, Literal, Optional
+from sqlmodel.ext.asyncio.session import AsyncSession
+from starlette.responses import StreamingResponse
 
+from App.catalog import etag_matches, restaurant_catalog, version_bump
 from App.database import get_session
+from App.jobs import ANALYTICS_CACHE, job_queue
 from App.models import Restaurants
+from App.pagination import NDJSON_MEDIA_TYPE, decode_cursor, finish_page, page_limit
 from App.schemas import RestaurantCreate, RestaurantRead, RestaurantUpdate
-from App.utils import get_current_user
+from App.serialization import RESTAURANT_LIST, json_bytes_response
+from App.settings import settings
+from App.utils import get_current_user, get_read_session
 
 
 router = APIRouter(prefix="/restaurants", tags=["Restaurants"], dependencies=[Depends(get_current_user)])
 
 
+# Reads are served from the in-memory catalog (App.catalog); writes bump its version in the
+# same transaction and fold the change in after commit.
+
+def _not_modified(if_none_match: Optional[str], response: Response) -> Optional[Response]:
+    etag = restaurant_catalog.etag
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = "no-cache"
+    return None
+
+
 @router.post("/", response_model=RestaurantRead)
-def create_restaurant(payload: RestaurantCreate, session: Session = Depends(get_session)):
+async def create_restaurant(payload: RestaurantCreate, session: AsyncSession = Depends(get_session)):
     restaurant = Restaurants(name=payload.name, area=payload.area)
     session.add(restaurant)
-    session.commit()
-    session.refresh(restaurant)
+    version = await session.scalar(version_bump())
+    await session.commit()
+    await session.refresh(restaurant)
+    await restaurant_catalog.record_change(session, version, restaurant=restaurant)
     return restaurant
 
 
 @router.get("/", response_model=List[RestaurantRead])
-def list_restaurants(session: Session = Depends(get_session)):
-    restaurants = session.exec(select(Restaurants)).all()
+async def list_restaurants(
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=settings.PAGE_MAX_LIMIT),
+    cursor: Optional[str] = None,
+    output: Literal["json", "ndjson"] = Query("json", alias="format"),
+    if_none_match: Optional[str] = Header(None),
+    session: AsyncSession = Depends(get_read_session),
+):
+    """Keyset-paginated restaurants; follow ``X-Next-Cursor``. ``format=ndjson`` streams every row.
+
+    Carries the catalog ``ETag``; ``If-None-Match`` with it returns 304.
+    """
+    after = decode_cursor(cursor, "restaurant_id")[1] if cursor else None
+    if output == "ndjson":
+        restaurants = await restaurant_catalog.page(session, after, limit)
+        headers = {"ETag": restaurant_catalog.etag}
+        if etag_matches(if_none_match, headers["ETag"]):
+            return Response(status_code=304, headers=headers)
+        lines = (restaurant.model_dump_json() + "\n" for restaurant in restaurants)
+        return StreamingResponse(lines, media_type=NDJSON_MEDIA_TYPE, headers=headers)
+    limit = page_limit(limit)
+    restaurants = await restaurant_catalog.page(session, after, limit + 1)
+    not_modified = _not_modified(if_none_match, response)
+    if not_modified is not None:
+        return not_modified
+    restaurants = finish_page(restaurants, limit, "restaurant_id", "restaurant_id", response)
+    if settings.FAST_JSON:
+        return json_bytes_response(RESTAURANT_LIST.dump_json(restaurants), response)
     return restaurants
 
 
 @router.get("/{restaurant_id}", response_model=RestaurantRead)
-def get_restaurant(restaurant_id: int, session: Session = Depends(get_session)):
-    restaurant = session.get(Restaurants, restaurant_id)
+async def get_restaurant(
+    restaurant_id: int,
+    response: Response,
+    if_none_match: Optional[str] = Header(None),
+    session: AsyncSession = Depends(get_read_session),
+):
+    restaurant = await restaurant_catalog.get(session, restaurant_id)
     if not restaurant:
         raise HTTPException(status_code=404, detail="Restaurant not found")
-    return restaurant
+    return _not_modified(if_none_match, response) or restaurant
 
 
 @router.patch("/{restaurant_id}", response_model=RestaurantRead)
-def update_restaurant(restaurant_id: int, payload: RestaurantUpdate, session: Session = Depends(get_session)):
-    restaurant = session.get(Restaurants, restaurant_id)
+async def update_restaurant(restaurant_id: int, payload: RestaurantUpdate, session: AsyncSession = Depends(get_session)):
+    restaurant = await session.get(Restaurants, restaurant_id)
     if not restaurant:
         raise HTTPException(status_code=404, detail="Restaurant not found")
     if payload.name is not None:
@@ -44,17 +95,23 @@ def update_restaurant(restaurant_id: int, payload: RestaurantUpdate, session: Se
     if payload.area is not None:
         restaurant.area = payload.area
     session.add(restaurant)
-    session.commit()
-    session.refresh(restaurant)
+    version = await session.scalar(version_bump())
+    await session.commit()
+    # Analytics group by area, so a moved restaurant changes their results.
+    await job_queue.enqueue(ANALYTICS_CACHE)
+    await session.refresh(restaurant)
+    await restaurant_catalog.record_change(session, version, restaurant=restaurant)
     return restaurant
 
 
 @router.delete("/{restaurant_id}")
-def delete_restaurant(restaurant_id: int, session: Session = Depends(get_session)):
-    restaurant = session.get(Restaurants, restaurant_id)
+async def delete_restaurant(restaurant_id: int, session: AsyncSession = Depends(get_session)):
+    restaurant = await session.get(Restaurants, restaurant_id)
     if not restaurant:
         raise HTTPException(status_code=404, detail="Restaurant not found")
-    session.delete(restaurant)
-    session.commit()
+    await session.delete(restaurant)
+    version = await session.scalar(version_bump())
+    await session.commit()
+    await job_queue.enqueue(ANALYTICS_CACHE)
+    await restaurant_catalog.record_change(session, version, deleted_id=restaurant_id)
     return {"message": "Deleted"}
-
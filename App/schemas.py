@@ -1,5 +1,6 @@
-from typing import Optional
+from typing import Annotated, Any, List, Optional, Union
 from datetime import datetime
+from pydantic import AfterValidator
 from sqlmodel import SQLModel
 
 from App.models import (
@@ -9,6 +10,16 @@ from App.models import (
     RestaurantAreaName,
 )
 
+def _whole_cents(amount: float) -> float:
+    # Rollups keep revenue in integer cents; a sub-cent amount would make them disagree with
+    # the live sums over the stored floats.
+    if round(amount, 2) != amount:
+        raise ValueError("amount must have at most 2 decimal places")
+    return amount
+
+
+Amount = Annotated[float, AfterValidator(_whole_cents)]
+
 # Common read models
 class CustomerRead(SQLModel):
     id: int
@@ -34,7 +45,7 @@ class RestaurantRead(SQLModel):
 class PaymentCreate(SQLModel):
     status: PaymentStatus
     payment_type: PaymentType
-    amount: float
+    amount: Amount
     currency: str = "INR"
 
 class PaymentRead(SQLModel):
@@ -60,6 +71,32 @@ class OrderRead(SQLModel):
     created_at: datetime
     customer_id: int
 
+# Checkout (payment + order in one request)
+class CheckoutCreate(SQLModel):
+    status: PaymentStatus
+    payment_type: PaymentType
+    amount: Amount
+    currency: str = "INR"
+    item_name: OrderFoodItem
+    restaurant_id: int
+
+class CheckoutRead(SQLModel):
+    payment: PaymentRead
+    order: Optional[OrderRead] = None
+
+# Bulk ingestion
+class BulkItemError(SQLModel):
+    index: int
+    detail: Any
+
+class PaymentBulkResult(SQLModel):
+    created: List[PaymentRead]
+    errors: List[BulkItemError]
+
+class OrderBulkResult(SQLModel):
+    created: List[OrderRead]
+    errors: List[BulkItemError]
+
 # Analytics schemas
 class TopCustomer(SQLModel):
     name: str
@@ -83,3 +120,14 @@ class DailyRevenue(SQLModel):
     area: RestaurantAreaName
     total_amount: float
     currency: str
+
+class AggregateRow(SQLModel):
+    """One group of an /analytics/aggregate result; only the requested dimensions are set."""
+    day: Optional[str] = None
+    week: Optional[str] = None
+    month: Optional[str] = None
+    area: Optional[RestaurantAreaName] = None
+    item: Optional[OrderFoodItem] = None
+    restaurant: Optional[int] = None
+    payment_type: Optional[PaymentType] = None
+    value: Optional[Union[int, float]] = None
@@ -0,0 +1,80 @@
+"""Fast JSON rendering for the hot list endpoints (opt-in with ``FAST_JSON``).
+
+By default FastAPI validates what a list handler returns against its ``response_model`` and
+renders the result with the stdlib ``json``. With ``FAST_JSON`` the handlers instead select only
+the read model's columns as row tuples and turn them straight into bytes: with orjson when it
+is installed, otherwise with a prebuilt pydantic ``TypeAdapter`` (pydantic-core's serializer).
+Rows come from our own tables, so skipping re-validation loses nothing; the ``response_model``
+stays on each route for the OpenAPI schema and the JSON is the same as the default path's.
+"""
+from typing import List, Sequence, Type
+
+from pydantic import TypeAdapter
+from sqlmodel import SQLModel, select
+from starlette.responses import Response
+from typing_extensions import TypedDict
+
+from App.models import Orders, Payments
+from App.schemas import OrderRead, PaymentRead, RestaurantRead
+
+
+JSON_MEDIA_TYPE = "application/json"
+
+_orjson = None
+
+
+def orjson_module():
+    """orjson if installed, else ``None`` (looked up once)."""
+    global _orjson
+    if _orjson is None:
+        try:
+            import orjson
+        except ImportError:
+            orjson = False
+        _orjson = orjson
+    return _orjson or None
+
+
+class RowSerializer:
+    """Select the columns of ``read_model`` from ``table`` and render the rows as its JSON."""
+
+    def __init__(self, read_model: Type[SQLModel], table: Type[SQLModel]) -> None:
+        self.fields = tuple(read_model.model_fields)
+        self.columns = tuple(getattr(table, name) for name in self.fields)
+        row_type = TypedDict(
+            f"{read_model.__name__}Row", {name: field.annotation for name, field in read_model.model_fields.items()}
+        )
+        self._rows = TypeAdapter(List[row_type])
+        self._row = TypeAdapter(row_type)
+
+    def select(self):
+        return select(*self.columns)
+
+    def _dicts(self, rows: Sequence) -> list:
+        fields = self.fields
+        return [dict(zip(fields, row)) for row in rows]
+
+    def dump(self, rows: Sequence) -> bytes:
+        """A JSON array of ``rows``."""
+        orjson = orjson_module()
+        if orjson is not None:
+            return orjson.dumps(self._dicts(rows))
+        return self._rows.dump_json(self._dicts(rows))
+
+    def dump_lines(self, rows: Sequence) -> bytes:
+        """``rows`` as NDJSON, one object per line."""
+        orjson = orjson_module()
+        dump = orjson.dumps if orjson is not None else self._row.dump_json
+        return b"".join(dump(row) + b"\n" for row in self._dicts(rows))
+
+
+ORDER_ROWS = RowSerializer(OrderRead, Orders)
+PAYMENT_ROWS = RowSerializer(PaymentRead, Payments)
+# Catalog entries are already RestaurantRead models; pydantic-core serializes them directly.
+RESTAURANT_LIST = TypeAdapter(List[RestaurantRead])
+
+
+def json_bytes_response(body: bytes, response: Response) -> Response:
+    """Send pre-rendered JSON, keeping the headers a handler set on its injected ``response``
+    (returning a ``Response`` directly would drop them)."""
+    return Response(content=body, media_type=JSON_MEDIA_TYPE, headers=dict(response.headers))
@@ -0,0 +1,128 @@
+"""Multi-process server: one master, ``WEB_WORKERS`` uvicorn workers on one listening socket.
+
+The master creates/migrates the schema once, closes its connections, and only then starts
+the workers, which run with ``DB_INIT_ON_STARTUP`` off. Two process models:
+
+* ``gunicorn`` (optional, Linux/macOS; ``pip install gunicorn``): prefork. ``App.main`` is
+  imported once in the master and forked, so workers start fast and share its pages; each
+  child drops the inherited engine pools post-fork so no SQLite file handle or pooled
+  connection is ever used by two processes.
+* ``uvicorn``: uvicorn's own supervisor, which spawns fresh interpreters (works everywhere).
+
+``auto`` picks gunicorn when it is installed. Workers share nothing in memory: the restaurant
+catalog, auth/response caches and ``/metrics`` are per process (set ``CACHE_BACKEND=redis`` for
+a shared response cache).
+
+    python -m App.server --workers 4 --port 8000
+"""
+import argparse
+import os
+import sys
+
+from App.settings import settings
+
+
+SERVERS = ("auto", "gunicorn", "uvicorn")
+APP = "App.main:app"
+
+
+def _gunicorn_available() -> bool:
+    try:
+        import gunicorn  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def _configure(**values) -> None:
+    """Apply overrides to this process's settings and to the environment workers inherit."""
+    for name, value in values.items():
+        setattr(settings, name, value)
+        os.environ[name] = str(value).lower() if isinstance(value, bool) else str(value)
+
+
+def prepare_database() -> None:
+    """Create and migrate the schema in the master, then close every connection it opened."""
+    from App.database import init_db, engine, read_engine
+
+    init_db()
+    engine.dispose()
+    read_engine.dispose()
+
+
+def _post_fork(server, worker) -> None:
+    from App.database import dispose_after_fork
+
+    dispose_after_fork()
+
+
+def serve_gunicorn(host: str, port: int, workers: int) -> None:
+    try:
+        from gunicorn.app.base import BaseApplication
+    except ImportError:
+        raise RuntimeError("--server gunicorn requires the gunicorn package (pip install gunicorn)")
+
+    options = {
+        "bind": f"{host}:{port}",
+        "workers": workers,
+        "worker_class": "uvicorn.workers.UvicornWorker",
+        "preload_app": True,
+        "post_fork": _post_fork,
+        "keepalive": settings.WEB_KEEPALIVE,
+        "graceful_timeout": settings.WEB_GRACEFUL_TIMEOUT,
+    }
+
+    class _Server(BaseApplication):
+        def load_config(self):
+            for name, value in options.items():
+                self.cfg.set(name, value)
+
+        def load(self):
+            from App.main import app
+
+            return app
+
+    _Server().run()
+
+
+def serve_uvicorn(host: str, port: int, workers: int) -> None:
+    import uvicorn
+
+    uvicorn.run(
+        APP,
+        host=host,
+        port=port,
+        workers=workers,
+        timeout_keep_alive=settings.WEB_KEEPALIVE,
+        timeout_graceful_shutdown=settings.WEB_GRACEFUL_TIMEOUT,
+    )
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Serve the API from several worker processes.")
+    parser.add_argument("--host", default=settings.WEB_HOST)
+    parser.add_argument("--port", type=int, default=settings.WEB_PORT)
+    parser.add_argument("--workers", type=int, default=settings.WEB_WORKERS)
+    parser.add_argument("--threads", type=int, default=settings.THREADPOOL_SIZE, help="threadpool size per worker")
+    parser.add_argument("--server", choices=SERVERS, default="auto")
+    parser.add_argument("--no-init-db", action="store_true", help="skip create_all + migrations (schema managed elsewhere)")
+    args = parser.parse_args(argv)
+    if args.workers < 1 or args.threads < 1:
+        parser.error("--workers and --threads must be at least 1")
+
+    if not args.no_init_db:
+        prepare_database()
+    _configure(DB_INIT_ON_STARTUP=False, THREADPOOL_SIZE=args.threads)
+
+    server = args.server
+    if server == "auto":
+        server = "gunicorn" if _gunicorn_available() else "uvicorn"
+    if server == "gunicorn":
+        serve_gunicorn(args.host, args.port, args.workers)
+    else:
+        serve_uvicorn(args.host, args.port, args.workers)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,11 +1,35 @@
-from dotenv import load_dotenv, find_dotenv
+import logging
 import os
-_env_set = load_dotenv(find_dotenv(".env"))
-if not _env_set:
-    print("No settings file found trying to load example env file")
-    load_dotenv(find_dotenv(".env.example"))
 
-    
+
+def _load_env_file() -> None:
+    """ENV_FILE names the dotenv file to load, or "none" to use the process environment only
+    (production); unset, ``.env`` and then ``.env.example`` are searched for upwards."""
+    env_file = os.getenv("ENV_FILE")
+    if env_file is not None and env_file.strip().lower() in ("", "none"):
+        return
+    from dotenv import load_dotenv, find_dotenv
+
+    if env_file is not None:
+        load_dotenv(env_file)
+        return
+    _env_set = load_dotenv(find_dotenv(".env"))
+    if not _env_set:
+        # Logged, not printed: every server worker imports this module.
+        logging.getLogger(__name__).info("No settings file found trying to load example env file")
+        load_dotenv(find_dotenv(".env.example"))
+
+
+_load_env_file()
+
+
+def _env_bool(name: str, default: bool = False) -> bool:
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
 class Config:
     def __init__(self) -> None:
         self.GOOGLE_CLIENT_ID = os.getenv("GOOGLE_CLIENT_ID", "")
@@ -14,4 +38,153 @@ class Config:
         self.JWT_SECRET_KEY = os.getenv("JWT_SECRET_KEY", "supersecretjwt")
         self.ALGORITHM = os.getenv("ALGORITHM", "HS256")
         self.ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", 60))
-settings = Config()
\ No newline at end of file
+
+        # --- Google OAuth endpoints (overridable to point at a mock server) ---
+        self.GOOGLE_AUTH_ENDPOINT = os.getenv("GOOGLE_AUTH_ENDPOINT", "https://accounts.google.com/o/oauth2/auth")
+        self.GOOGLE_TOKEN_ENDPOINT = os.getenv("GOOGLE_TOKEN_ENDPOINT", "https://oauth2.googleapis.com/token")
+        self.GOOGLE_USERINFO_ENDPOINT = os.getenv("GOOGLE_USERINFO_ENDPOINT", "https://www.googleapis.com/oauth2/v2/userinfo")
+        self.GOOGLE_JWKS_URI = os.getenv("GOOGLE_JWKS_URI", "https://www.googleapis.com/oauth2/v3/certs")
+        self.GOOGLE_ISSUERS = [i.strip() for i in os.getenv("GOOGLE_ISSUERS", "https://accounts.google.com,accounts.google.com").split(",") if i.strip()]
+        # Verify the id_token against Google's cached JWKS instead of calling userinfo.
+        self.GOOGLE_VERIFY_ID_TOKEN = _env_bool("GOOGLE_VERIFY_ID_TOKEN", False)
+        # Never refetch the JWKS more often than this on unknown-kid misses.
+        self.GOOGLE_JWKS_MIN_REFRESH = float(os.getenv("GOOGLE_JWKS_MIN_REFRESH", 5))
+
+        # --- Outbound HTTP (one client for the app's lifetime) ---
+        self.HTTP2_ENABLED = _env_bool("HTTP2_ENABLED", True)
+        self.HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", 100))
+        self.HTTP_MAX_KEEPALIVE = int(os.getenv("HTTP_MAX_KEEPALIVE", 20))
+        self.HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", 30))
+        self.HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", 5))
+        self.HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", 10))
+
+        # --- Auth fast path ---
+        # AUTH_STATELESS trusts the sub/google_id/name claims and skips the Customers lookup.
+        self.AUTH_STATELESS = _env_bool("AUTH_STATELESS", False)
+        self.AUTH_TOKEN_CACHE_SIZE = int(os.getenv("AUTH_TOKEN_CACHE_SIZE", 10000))
+        self.AUTH_USER_CACHE_SIZE = int(os.getenv("AUTH_USER_CACHE_SIZE", 10000))
+        self.AUTH_USER_CACHE_TTL = float(os.getenv("AUTH_USER_CACHE_TTL", 60))
+
+        # --- Rate limiting (App.ratelimit) ---
+        # Comma-separated "[METHOD ]path-glob=N/s|m|h[:burst]" rules, first match wins; "off"
+        # exempts a path. Buckets are per caller (JWT sub; client IP under /auth/) and rule.
+        self.RATE_LIMIT_ENABLED = _env_bool("RATE_LIMIT_ENABLED", False)
+        self.RATE_LIMITS = os.getenv(
+            "RATE_LIMITS",
+            "/health=off, /metrics=off, /auth/*=20/m:10, POST /payments/*=10/s:20, POST /orders/*=10/s:20, "
+            "POST /checkout/*=10/s:20, /analytics/*=5/s:20, *=50/s:100",
+        )
+        # "memory" (per worker) or "redis" (one budget across workers, on REDIS_URL).
+        self.RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "memory").strip().lower()
+        self.RATE_LIMIT_MAX_KEYS = int(os.getenv("RATE_LIMIT_MAX_KEYS", 100000))
+
+        # --- Response cache (analytics) ---
+        # CACHE_BACKEND: "memory" (per process), "redis" (shared, needs REDIS_URL) or "none".
+        self.CACHE_BACKEND = os.getenv("CACHE_BACKEND", "memory").strip().lower()
+        self.CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", 1024))
+        self.REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+        self.ANALYTICS_CACHE_TTL = float(os.getenv("ANALYTICS_CACHE_TTL", 30))
+
+        # --- Restaurant catalog (in-memory, App.catalog) ---
+        # How often each worker polls catalog_versions for changes made by other workers.
+        self.CATALOG_REFRESH_SECONDS = float(os.getenv("CATALOG_REFRESH_SECONDS", 1))
+
+        # --- Customer leaderboard (in-memory, App.leaderboard) ---
+        # Max seconds between catch-ups on newly placed orders; 0 catches up on every read.
+        self.LEADERBOARD_REFRESH_SECONDS = float(os.getenv("LEADERBOARD_REFRESH_SECONDS", 0))
+        # How long an order id skipped below the newest one is re-read, waiting for a slower
+        # transaction to commit it (Postgres hands out ids before commit).
+        self.LEADERBOARD_GAP_SECONDS = float(os.getenv("LEADERBOARD_GAP_SECONDS", 300))
+
+        # --- List endpoints ---
+        self.PAGE_DEFAULT_LIMIT = int(os.getenv("PAGE_DEFAULT_LIMIT", 100))
+        self.PAGE_MAX_LIMIT = int(os.getenv("PAGE_MAX_LIMIT", 1000))
+        self.STREAM_CHUNK_SIZE = int(os.getenv("STREAM_CHUNK_SIZE", 500))
+        self.BULK_MAX_ITEMS = int(os.getenv("BULK_MAX_ITEMS", 5000))
+        # List endpoints select only their read model's columns and render JSON bytes directly
+        # (orjson when installed) instead of response_model validation + stdlib json.
+        self.FAST_JSON = _env_bool("FAST_JSON", False)
+        # Rows per CSV block / Arrow record batch / Parquet row group in /analytics/export.
+        self.EXPORT_CHUNK_SIZE = int(os.getenv("EXPORT_CHUNK_SIZE", 10000))
+        # Orders younger than this are left out of an export's watermark: created_at is set
+        # before commit, so a slower transaction can still add rows just below it.
+        self.EXPORT_SETTLE_SECONDS = float(os.getenv("EXPORT_SETTLE_SECONDS", 60))
+
+        # --- Month partitions (App.partitions, SQLite only) ---
+        # Calendar months, the current one included, that stay in the live orders/payments
+        # tables; older months are moved to one read-only file per month under ARCHIVE_DIR
+        # (default: an "archive" directory next to the database file).
+        self.ARCHIVE_HOT_MONTHS = max(2, int(os.getenv("ARCHIVE_HOT_MONTHS", 3)))
+        self.ARCHIVE_DIR = os.getenv("ARCHIVE_DIR", "")
+        # Run the archiver in-process this often; 0 leaves it to `python -m App.partitions`.
+        self.ARCHIVE_INTERVAL_SECONDS = float(os.getenv("ARCHIVE_INTERVAL_SECONDS", 0))
+
+        # --- Background jobs (App.jobs) ---
+        # Post-commit work (rollup upserts, analytics cache invalidation) runs on an in-process
+        # queue started by the app lifespan. Rollup jobs are written to the outbox table in the
+        # order's transaction, so a restart picks them up again. Off = all of it runs inline.
+        self.JOB_QUEUE_ENABLED = _env_bool("JOB_QUEUE_ENABLED", True)
+        self.JOB_QUEUE_SIZE = int(os.getenv("JOB_QUEUE_SIZE", 10000))
+        self.JOB_WORKERS = max(1, int(os.getenv("JOB_WORKERS", 1)))
+        # Jobs of one kind handled together, after waiting JOB_BATCH_LINGER_MS for more to arrive.
+        self.JOB_BATCH_SIZE = int(os.getenv("JOB_BATCH_SIZE", 500))
+        self.JOB_BATCH_LINGER_MS = float(os.getenv("JOB_BATCH_LINGER_MS", 2))
+        # A full queue makes producers wait this long; then durable jobs are left to the outbox
+        # sweeper and the rest run inline in the request.
+        self.JOB_ENQUEUE_TIMEOUT = float(os.getenv("JOB_ENQUEUE_TIMEOUT", 0.1))
+        # Failed jobs are retried with exponential backoff (JOB_RETRY_BACKOFF, doubled per try);
+        # durable jobs that use up JOB_MAX_ATTEMPTS stay in the outbox with their last error.
+        self.JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", 5))
+        self.JOB_RETRY_BACKOFF = float(os.getenv("JOB_RETRY_BACKOFF", 0.5))
+        # Outbox rows older than this that no queue holds are re-enqueued (checked as often).
+        self.JOB_SWEEP_SECONDS = float(os.getenv("JOB_SWEEP_SECONDS", 30))
+        # How long shutdown waits for the queue to drain.
+        self.JOB_DRAIN_TIMEOUT = float(os.getenv("JOB_DRAIN_TIMEOUT", 10))
+
+        # --- Instrumentation ---
+        # Latency histograms and SQL/JWT/HTTP timings on /metrics and in Server-Timing headers.
+        self.METRICS_ENABLED = _env_bool("METRICS_ENABLED", True)
+        self.SERVER_TIMING_ENABLED = _env_bool("SERVER_TIMING_ENABLED", True)
+        # Statements at or above this many milliseconds are logged to App.slow_query.
+        self.SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", 200))
+
+        # --- Database ---
+        # DB_MODE selects the session flavour handed to the routers: "async" uses an
+        # AsyncSession on ASYNC_DATABASE_URL, "sync" runs a regular Session in the threadpool.
+        self.DB_MODE = os.getenv("DB_MODE", "async").strip().lower()
+        self.DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///database.db")
+        self.ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL", "")
+        self.DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 5))
+        self.DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", 10))
+        self.DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", 1800))
+        self.DB_POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", 30))
+        self.DB_ECHO = _env_bool("DB_ECHO", False)
+        # Optional read replica: GET handlers read from it unless the caller wrote within
+        # READ_YOUR_WRITES_SECONDS (tracked per process and in a signed ``wrote_at`` cookie, so
+        # it holds across workers). ASYNC_REPLICA_DATABASE_URL defaults to the async driver.
+        self.REPLICA_DATABASE_URL = os.getenv("REPLICA_DATABASE_URL", "")
+        self.ASYNC_REPLICA_DATABASE_URL = os.getenv("ASYNC_REPLICA_DATABASE_URL", "")
+        self.READ_YOUR_WRITES_SECONDS = float(os.getenv("READ_YOUR_WRITES_SECONDS", 5))
+
+        # --- SQLite performance profile ---
+        # WAL + tuned pragmas on every connection, one pooled writer connection that all
+        # flushes queue on, and a separate pool of query_only connections for reads.
+        self.SQLITE_PERFORMANCE_PROFILE = _env_bool("SQLITE_PERFORMANCE_PROFILE", False)
+        self.SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", 5000))
+        self.SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", 256 * 1024 * 1024))
+        self.SQLITE_CACHE_SIZE_KB = int(os.getenv("SQLITE_CACHE_SIZE_KB", 64 * 1024))
+        self.SQLITE_READ_POOL_SIZE = int(os.getenv("SQLITE_READ_POOL_SIZE", 8))
+        # create_all + migrations in the app lifespan. ``python -m App.server`` runs them once
+        # in the master and turns this off for its workers.
+        self.DB_INIT_ON_STARTUP = _env_bool("DB_INIT_ON_STARTUP", True)
+
+        # --- Server (python -m App.server) ---
+        self.WEB_HOST = os.getenv("WEB_HOST", "127.0.0.1")
+        self.WEB_PORT = int(os.getenv("WEB_PORT", 8000))
+        # Worker processes; each has its own event loop, engines, caches and catalog.
+        self.WEB_WORKERS = int(os.getenv("WEB_WORKERS", 1))
+        # Threads per worker for sync work (DB_MODE=sync sessions, run_in_threadpool).
+        self.THREADPOOL_SIZE = int(os.getenv("THREADPOOL_SIZE", 40))
+        self.WEB_KEEPALIVE = int(os.getenv("WEB_KEEPALIVE", 5))
+        self.WEB_GRACEFUL_TIMEOUT = int(os.getenv("WEB_GRACEFUL_TIMEOUT", 30))
+settings = Config()
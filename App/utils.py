@@ -1 +1 @@
-from App.auth_utils import get_current_user, decode_token, security
+from App.auth_utils import get_current_user, get_current_customer, get_read_session, decode_token, invalidate_user, security, Principal
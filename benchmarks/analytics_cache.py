@@ -0,0 +1,74 @@
+"""Thundering-herd benchmark for the analytics response cache.
+
+Fires a burst of concurrent dashboard requests at a cold key, then a steady polling load,
+for each backend (``memory`` and ``redis`` against the LocalRedis stand-in), and prints the
+cache counters next to the latencies.
+
+    python -m benchmarks.analytics_cache --burst 200 --requests 2000
+"""
+import argparse
+import asyncio
+
+from benchmarks.common import use_temp_database, mint_token, drive, summarize, print_table
+from benchmarks.rollup_consistency import generate
+
+
+async def run(args) -> None:
+    import httpx
+    from App.main import app
+    from App.cache import ANALYTICS_NAMESPACE, MemoryBackend, RedisBackend, response_cache
+    from App.database import engine, init_db, dispose_engines
+    from App.models import Customers
+    from App.settings import settings
+    from benchmarks.standins import LocalRedis
+    from sqlmodel import Session
+
+    init_db()
+    with engine.begin() as connection:
+        generate(connection, argparse.Namespace(orders=args.orders, customers=500, restaurants=30, days=60, seed=3))
+    with Session(engine) as session:
+        user = session.get(Customers, 1)
+    headers = {"Authorization": f"Bearer {mint_token(user)}"}
+
+    backends = {
+        "ttl~0": None,
+        "memory": MemoryBackend(maxsize=settings.CACHE_MAX_ENTRIES),
+        "redis(local)": RedisBackend(LocalRedis()),
+    }
+    rows = []
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for name, backend in backends.items():
+            response_cache.backend = backend or MemoryBackend(maxsize=1)
+            response_cache.ttl = 0.000001 if backend is None else settings.ANALYTICS_CACHE_TTL
+            response_cache.hits = response_cache.misses = response_cache.coalesced = 0
+            await response_cache.invalidate(ANALYTICS_NAMESPACE)
+            for url in ("/analytics/top-customers", "/analytics/daily-revenue"):
+                burst, burst_elapsed = await drive(client, "GET", url, total=args.burst, concurrency=args.burst, headers=headers)
+                steady, steady_elapsed = await drive(client, "GET", url, total=args.requests, concurrency=args.concurrency, headers=headers)
+                stats = response_cache.stats()
+                rows.append({
+                    "backend": name,
+                    "burst_p99_ms": summarize(url, burst, burst_elapsed)["p99_ms"],
+                    **summarize(url, steady, steady_elapsed),
+                    "misses": stats["misses"],
+                    "coalesced": stats["coalesced"],
+                    "hits": stats["hits"],
+                })
+    await dispose_engines()
+    print_table(rows)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--orders", type=int, default=50000)
+    parser.add_argument("--burst", type=int, default=200)
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    args = parser.parse_args()
+    use_temp_database("analytics-cache")
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
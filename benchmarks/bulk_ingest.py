@@ -0,0 +1,91 @@
+"""Rows/sec for replaying offline POS transactions: single-record endpoints vs the bulk ones.
+
+Each record is one payment plus its order. The single-record path posts them one by one with
+``--concurrency`` in flight; the bulk path posts ``--batch`` records per request.
+
+    python -m benchmarks.bulk_ingest --records 5000 --batch 1000
+"""
+import argparse
+import asyncio
+import time
+
+from benchmarks.common import use_temp_database, mint_token, print_table
+
+
+PAYMENT = {"status": "pass", "payment_type": "UPI", "amount": 240.0}
+
+
+async def single(client, headers, restaurant_id, records, concurrency):
+    remaining = iter(range(records))
+
+    async def worker():
+        for _ in remaining:
+            payment = (await client.post("/payments/", json=PAYMENT, headers=headers)).json()
+            order = {"item_name": "Veg Fried Rice", "transaction_id": payment["transaction_id"], "restaurant_id": restaurant_id}
+            response = await client.post("/orders/", json=order, headers=headers)
+            response.raise_for_status()
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+
+
+async def bulk(client, headers, restaurant_id, records, batch):
+    for start in range(0, records, batch):
+        size = min(batch, records - start)
+        payments = await client.post("/payments/bulk", json=[PAYMENT] * size, headers=headers)
+        created = payments.json()["created"]
+        orders = [
+            {"item_name": "Veg Fried Rice", "transaction_id": p["transaction_id"], "restaurant_id": restaurant_id}
+            for p in created
+        ]
+        result = (await client.post("/orders/bulk", json=orders, headers=headers)).json()
+        if result["errors"]:
+            raise RuntimeError(result["errors"][:3])
+
+
+async def run(args) -> None:
+    import httpx
+    from sqlmodel import Session
+    from App.main import app
+    from App.database import engine, init_db, dispose_engines
+    from App.models import Customers, Restaurants, RestaurantAreaName
+
+    init_db()
+    with Session(engine) as session:
+        user = Customers(google_id="pos-replay", name="POS Replay")
+        restaurant = Restaurants(name="Replay Rasoi", area=RestaurantAreaName.MUMBAI)
+        session.add_all([user, restaurant])
+        session.commit()
+        session.refresh(user)
+        restaurant_id = restaurant.restaurant_id
+    headers = {"Authorization": f"Bearer {mint_token(user)}"}
+
+    rows = []
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        started = time.perf_counter()
+        await single(client, headers, restaurant_id, args.records, args.concurrency)
+        elapsed = time.perf_counter() - started
+        rows.append({"path": f"single (x{args.concurrency} concurrent)", "records": args.records,
+                     "seconds": round(elapsed, 2), "records_per_sec": round(args.records / elapsed, 1)})
+
+        started = time.perf_counter()
+        await bulk(client, headers, restaurant_id, args.records, args.batch)
+        elapsed = time.perf_counter() - started
+        rows.append({"path": f"bulk (batch {args.batch})", "records": args.records,
+                     "seconds": round(elapsed, 2), "records_per_sec": round(args.records / elapsed, 1)})
+    await dispose_engines()
+    print_table(rows)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--records", type=int, default=2000)
+    parser.add_argument("--batch", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=16)
+    args = parser.parse_args()
+    use_temp_database("bulk-ingest")
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
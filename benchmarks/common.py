@@ -0,0 +1,88 @@
+"""Shared helpers for the in-process benchmarks.
+
+Benchmarks point the app at a throwaway database by exporting ``DATABASE_URL`` *before*
+anything under ``App`` is imported, then drive the ASGI app through ``httpx.ASGITransport``.
+"""
+import os
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+
+def use_temp_database(prefix: str = "bench") -> str:
+    """Point the app at a fresh SQLite file and return its path. Call before importing App."""
+    path = os.path.join(tempfile.mkdtemp(prefix=f"{prefix}-"), "database.db")
+    os.environ["DATABASE_URL"] = f"sqlite:///{path}"
+    os.environ.pop("ASYNC_DATABASE_URL", None)
+    return path
+
+
+def mint_token(user) -> str:
+    """Mint the same JWT ``routers/auth.callback`` issues, without talking to Google."""
+    from jose import jwt
+    from App.settings import settings
+
+    payload = {
+        "sub": str(user.id),
+        "google_id": user.google_id,
+        "name": user.name,
+        "exp": datetime.utcnow() + timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES),
+    }
+    return jwt.encode(payload, settings.JWT_SECRET_KEY, algorithm=settings.ALGORITHM)
+
+
+def percentile(samples, pct: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def summarize(name: str, latencies, elapsed: float) -> dict:
+    return {
+        "name": name,
+        "requests": len(latencies),
+        "rps": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        "mean_ms": round(statistics.fmean(latencies) * 1000, 2) if latencies else 0.0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+    }
+
+
+async def drive(client, method: str, url: str, *, total: int, concurrency: int, **kwargs):
+    """Fire ``total`` requests with at most ``concurrency`` in flight; return (latencies, elapsed)."""
+    return await drive_requests(client, lambda i: (method, url, kwargs), total=total, concurrency=concurrency)
+
+
+async def drive_requests(client, make_request, *, total: int, concurrency: int):
+    """Like ``drive``, but ``make_request(i)`` builds ``(method, url, kwargs)`` for request ``i``."""
+    import asyncio
+
+    latencies = []
+    remaining = iter(range(total))
+
+    async def worker():
+        for i in remaining:
+            method, url, kwargs = make_request(i)
+            started = time.perf_counter()
+            response = await client.request(method, url, **kwargs)
+            latencies.append(time.perf_counter() - started)
+            if response.status_code >= 400:
+                raise RuntimeError(f"{method} {url} -> {response.status_code}: {response.text}")
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies, time.perf_counter() - started
+
+
+def print_table(rows) -> None:
+    if not rows:
+        return
+    columns = list(rows[0].keys())
+    widths = {c: max(len(c), *(len(str(r[c])) for r in rows)) for c in columns}
+    print("  ".join(c.ljust(widths[c]) for c in columns))
+    for row in rows:
+        print("  ".join(str(row[c]).ljust(widths[c]) for c in columns))
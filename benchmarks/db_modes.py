@@ -0,0 +1,76 @@
+"""A/B benchmark of the sync (threadpool) and async (AsyncSession) DB modes.
+
+    python -m benchmarks.db_modes --requests 2000 --concurrency 64
+"""
+import argparse
+import asyncio
+
+from benchmarks.common import use_temp_database, mint_token, drive, summarize, print_table
+
+
+def seed(orders_per_customer: int):
+    from sqlmodel import Session
+    from App.database import engine, init_db
+    from App.models import (
+        Customers, Payments, Orders, Restaurants,
+        PaymentStatus, PaymentType, OrderFoodItem, RestaurantAreaName,
+    )
+
+    init_db()
+    with Session(engine) as session:
+        user = Customers(google_id="bench-user", name="Bench User")
+        restaurant = Restaurants(name="Bench Bites", area=RestaurantAreaName.MUMBAI)
+        session.add_all([user, restaurant])
+        session.commit()
+        for _ in range(orders_per_customer):
+            payment = Payments(status=PaymentStatus.PASS, payment_type=PaymentType.UPI, amount=250.0, customer_id=user.id)
+            session.add(payment)
+            session.flush()
+            session.add(Orders(
+                item_name=OrderFoodItem.VEG_FRIED_RICE,
+                transaction_id=payment.transaction_id,
+                restaurant_id=restaurant.restaurant_id,
+                customer_id=user.id,
+            ))
+        session.commit()
+        session.refresh(user)
+        return user
+
+
+async def run(args) -> None:
+    import httpx
+    from App.main import app
+    from App.settings import settings
+    from App.database import dispose_engines
+
+    user = seed(args.orders)
+    headers = {"Authorization": f"Bearer {mint_token(user)}"}
+    routes = [("GET", "/orders/"), ("GET", "/payments/"), ("GET", "/analytics/top-customers")]
+
+    rows = []
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for mode in ("sync", "async"):
+            settings.DB_MODE = mode
+            await drive(client, "GET", "/orders/", total=20, concurrency=4, headers=headers)  # warm up
+            for method, url in routes:
+                latencies, elapsed = await drive(
+                    client, method, url, total=args.requests, concurrency=args.concurrency, headers=headers
+                )
+                rows.append({"mode": mode, **summarize(f"{method} {url}", latencies, elapsed)})
+    await dispose_engines()
+    print_table(rows)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--orders", type=int, default=50, help="orders seeded for the benchmark user")
+    args = parser.parse_args()
+    use_temp_database("db-modes")
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
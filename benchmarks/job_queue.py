@@ -0,0 +1,196 @@
+"""Post-commit jobs: checkout latency with rollup upserts inline vs on the job queue.
+
+Each configuration runs in its own interpreter (settings are read at import) with the app
+lifespan running, so the queue is started and drained as in production, and with
+SQLITE_PERFORMANCE_PROFILE unless the environment sets it:
+
+* ``inline``   JOB_QUEUE_ENABLED=false: rollups upserted in the checkout transaction.
+* ``queued``   the checkout writes an outbox row; the queue applies batches after the commit.
+* ``tiny``     a queue of 4 with a 1 ms enqueue timeout, so producers hit backpressure and
+               most jobs are deferred to the outbox sweeper (JOB_SWEEP_SECONDS=1).
+
+Before the lifespan starts, ``--recover`` orders are committed together with outbox rows that
+are never submitted (a process that died right after its commit); startup recovery must apply
+them. ``--fail-first`` makes the first rollup batches raise so the retry path runs. After the
+load every configuration waits for the outbox to empty, then requires ``rollups.verify`` to
+pass and no dead outbox rows; otherwise it exits 1.
+
+    python -m benchmarks.job_queue --checkouts 2000 --concurrency 32
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+
+from benchmarks.common import use_temp_database, mint_token, percentile, print_table
+
+
+CONFIGS = {
+    "inline": {"JOB_QUEUE_ENABLED": "false"},
+    "queued": {"JOB_QUEUE_ENABLED": "true"},
+    "tiny": {"JOB_QUEUE_ENABLED": "true", "JOB_QUEUE_SIZE": "4", "JOB_ENQUEUE_TIMEOUT": "0.001", "JOB_SWEEP_SECONDS": "1"},
+}
+
+
+def seed(recover: int):
+    """A customer, a restaurant, and ``recover`` committed orders whose rollup jobs were never queued."""
+    from sqlmodel import Session
+    from App.database import engine, init_db
+    from App.models import Customers, Orders, Payments, PaymentStatus, PaymentType, Restaurants, RestaurantAreaName
+    from App.jobs import stage
+    from App.rollups import ROLLUP_JOB, _delta_payload, order_delta, rollup_statements
+    from App.settings import settings
+
+    init_db()
+    with Session(engine, expire_on_commit=False) as session:
+        user = Customers(google_id="bench-jobs", name="Bench Jobs")
+        restaurant = Restaurants(name="Bench Bites", area=RestaurantAreaName.BANGALORE)
+        session.add_all([user, restaurant])
+        session.commit()
+        for i in range(recover):
+            payment = Payments(status=PaymentStatus.PASS, payment_type=PaymentType.CARD, amount=50 + i, customer_id=user.id)
+            session.add(payment)
+            session.flush()
+            order = Orders(item_name="Veg Fried Rice", transaction_id=payment.transaction_id,
+                           restaurant_id=restaurant.restaurant_id, customer_id=user.id)
+            session.add(order)
+            delta = order_delta(order, payment)
+            if settings.JOB_QUEUE_ENABLED:
+                stage(session, ROLLUP_JOB, [_delta_payload(delta)])
+            else:
+                for statement, params in rollup_statements(engine.dialect.name, [delta]):
+                    session.execute(statement, params)
+        session.commit()
+    return user, restaurant.restaurant_id
+
+
+def mean(histogram, kind: str) -> float:
+    series = histogram._series.get((kind,))
+    return series[1] / series[2] if series and series[2] else 0.0
+
+
+async def run_child(args) -> dict:
+    import httpx
+    from sqlalchemy import func, select
+    from App.database import make_async_session
+    from App.jobs import KINDS, job_queue
+    from App.main import app
+    from App.metrics import JOB_BATCH_SIZE, JOB_SECONDS, JOBS_TOTAL
+    from App.models import Outbox
+    from App.rollups import ROLLUP_JOB, verify
+    from App.settings import settings
+
+    user, restaurant_id = seed(args.recover)
+    headers = {"Authorization": f"Bearer {mint_token(user)}"}
+    kind = KINDS[ROLLUP_JOB]
+    handle, failures_left = kind.handle, args.fail_first
+
+    def flaky(session, payloads):
+        nonlocal failures_left
+        if failures_left > 0:
+            failures_left -= 1
+            raise RuntimeError("injected failure")
+        return handle(session, payloads)
+
+    KINDS[ROLLUP_JOB] = kind.__class__(kind.name, flaky, kind.durable, kind.after)
+
+    latencies, problems = [], []
+    remaining = iter(range(args.checkouts))
+
+    async def worker(client):
+        for i in remaining:
+            started = time.perf_counter()
+            response = await client.post("/checkout/", headers=headers, json={
+                "status": "pass" if i % 5 else "fail",
+                "payment_type": "card" if i % 2 else "UPI",
+                "amount": 100 + i % 37,
+                "item_name": "Veg Manchurian" if i % 3 else "Chicken Fried Rice",
+                "restaurant_id": restaurant_id,
+            })
+            latencies.append(time.perf_counter() - started)
+            if response.status_code != 200:
+                problems.append(f"checkout {i} -> {response.status_code}")
+
+    async def outbox_rows(dead: bool = False) -> int:
+        stmt = select(func.count()).select_from(Outbox)
+        if dead:
+            stmt = stmt.where(Outbox.attempts >= settings.JOB_MAX_ATTEMPTS)
+        async with make_async_session() as session:
+            return await session.scalar(stmt)
+
+    transport = httpx.ASGITransport(app=app)
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            started = time.perf_counter()
+            await asyncio.gather(*(worker(client) for _ in range(args.concurrency)))
+            elapsed = time.perf_counter() - started
+        drain_started = time.perf_counter()
+        deadline = drain_started + args.drain_timeout
+        while time.perf_counter() < deadline:
+            await job_queue.join()
+            if not await outbox_rows():
+                break
+            await asyncio.sleep(0.05)
+        drain = time.perf_counter() - drain_started
+        left, dead = await outbox_rows(), await outbox_rows(dead=True)
+        async with make_async_session() as session:
+            problems.extend(await verify(session))
+    if left:
+        problems.append(f"{left} outbox row(s) left after {args.drain_timeout}s ({dead} dead)")
+
+    outcomes = {outcome: int(value) for (name, outcome), value in JOBS_TOTAL._values.items() if name == ROLLUP_JOB}
+    return {
+        "rps": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+        "drain_ms": round(drain * 1000, 1),
+        "jobs_done": outcomes.get("done", 0),
+        "retried": outcomes.get("retried", 0),
+        "deferred": outcomes.get("deferred", 0),
+        "mean_batch": round(mean(JOB_BATCH_SIZE, ROLLUP_JOB), 1),
+        "job_mean_ms": round(mean(JOB_SECONDS, ROLLUP_JOB) * 1000, 1),
+        "problems": problems,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--checkouts", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--recover", type=int, default=200, help="orders whose outbox rows wait for startup recovery")
+    parser.add_argument("--fail-first", type=int, default=12, help="rollup handler calls that raise before succeeding")
+    parser.add_argument("--drain-timeout", type=float, default=30.0)
+    parser.add_argument("--configs", default=",".join(CONFIGS))
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        use_temp_database("job-queue")
+        os.environ["CACHE_BACKEND"] = "none"
+        print(json.dumps(asyncio.run(run_child(args))))
+        return
+
+    rows, problems = [], []
+    for name in args.configs.split(","):
+        # Without the profile, concurrent checkouts fail with "database is locked" either way.
+        env = dict({"SQLITE_PERFORMANCE_PROFILE": "true"}, **os.environ, JOB_RETRY_BACKOFF="0.05", **CONFIGS[name])
+        result = subprocess.run(
+            [sys.executable, "-m", "benchmarks.job_queue", "--child", "--checkouts", str(args.checkouts),
+             "--concurrency", str(args.concurrency), "--recover", str(args.recover),
+             "--fail-first", str(args.fail_first), "--drain-timeout", str(args.drain_timeout)],
+            env=env, capture_output=True, text=True, check=True,
+        )
+        stats = json.loads(result.stdout.strip().splitlines()[-1])
+        problems.extend(f"{name}: {problem}" for problem in stats.pop("problems"))
+        rows.append({"config": name, **stats})
+    print_table(rows)
+    for problem in problems:
+        print(problem, file=sys.stderr)
+    sys.exit(1 if problems else 0)
+
+
+if __name__ == "__main__":
+    main()
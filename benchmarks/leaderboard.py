@@ -0,0 +1,257 @@
+"""Customer leaderboard: top-N latency from memory vs SQL, and exactness under concurrent orders.
+
+1. Latency: on a generated dataset (``--orders`` orders over 60 days, Zipf-skewed customers),
+   the top N for N in ``--limits`` and every window, served by ``App.leaderboard`` (including
+   its catch-up query) vs the full ``GROUP BY customer_id ... ORDER BY count DESC LIMIT N``
+   and, for all time, the ``customer_order_rollup`` query the endpoint used before.
+2. Exactness: ``--checkouts`` checkouts from ``--concurrency`` clients interleaved with
+   ``GET /analytics/top-customers`` for every window, then ``leaderboard.check`` (the board
+   the app served from vs the full GROUP BY and customer_order_rollup) and ``rollups.verify``;
+   then the same check with the clock moved 8 and 31 days ahead (windows rolled over).
+3. Out-of-order ids: orders are committed with explicit ids, a higher one before a lower one
+   (what a Postgres sequence allows: ids are handed out at insert, not at commit), around the
+   app board's catch-ups and a fresh board's load; ``check`` must stay clean.
+
+Exits 1 if any check fails.
+
+    python -m benchmarks.leaderboard --orders 200000 --limits 3,100
+"""
+import argparse
+import asyncio
+import datetime
+import os
+import sys
+import time
+from types import SimpleNamespace
+
+from benchmarks.common import use_temp_database, mint_token, percentile, print_table
+
+
+def seed(args):
+    from sqlmodel import Session
+    from App.database import engine, init_db
+    from App.models import Customers
+    from benchmarks.datagen import generate
+
+    init_db()
+    with engine.begin() as connection:
+        generate(connection, customers=args.customers, orders=args.orders, days=60, restaurants_per_area=5)
+    with Session(engine, expire_on_commit=False) as session:
+        return session.get(Customers, 1)
+
+
+def timed(samples: list, started: float) -> None:
+    samples.append(time.perf_counter() - started)
+
+
+async def latency(args, failures: list) -> list:
+    from sqlalchemy import func, select
+    from App.database import make_async_session
+    from App.leaderboard import WINDOWS, Leaderboard, window_start, today
+    from App.models import CustomerOrderRollup, Orders
+
+    def group_by(n: int, days):
+        stmt = select(Orders.customer_id, func.count(Orders.order_id).label("orders")).group_by(Orders.customer_id)
+        if days:
+            stmt = stmt.where(Orders.created_at >= datetime.datetime.combine(window_start(days, today()), datetime.time()))
+        return stmt.order_by(func.count(Orders.order_id).desc(), Orders.customer_id).limit(n)
+
+    def rollup(n: int):
+        return (
+            select(CustomerOrderRollup.customer_id, CustomerOrderRollup.orders_count)
+            .where(CustomerOrderRollup.orders_count > 0)
+            .order_by(CustomerOrderRollup.orders_count.desc(), CustomerOrderRollup.customer_id)
+            .limit(n)
+        )
+
+    board = Leaderboard(0)
+    rows = []
+    async with make_async_session() as session:
+        started = time.perf_counter()
+        await board.refresh(session)
+        rows.append({"query": "leaderboard load", "window": "-", "n": "-", "p50_ms": round((time.perf_counter() - started) * 1000, 1), "p95_ms": "-"})
+        for n in args.limits:
+            for window, days in WINDOWS.items():
+                runs = {"leaderboard": [], "GROUP BY": []}
+                if days is None:
+                    runs["rollup table"] = []
+                for _ in range(args.repeat):
+                    started = time.perf_counter()
+                    top = await board.top(session, n, window)
+                    timed(runs["leaderboard"], started)
+                    started = time.perf_counter()
+                    expected = [tuple(row) for row in (await session.execute(group_by(n, days))).all()]
+                    timed(runs["GROUP BY"], started)
+                    if days is None:
+                        started = time.perf_counter()
+                        await session.execute(rollup(n))
+                        timed(runs["rollup table"], started)
+                    if top != expected:
+                        failures.append(f"top {n} ({window}) differs from the GROUP BY")
+                for name, samples in runs.items():
+                    rows.append({"query": name, "window": window, "n": n,
+                                 "p50_ms": round(percentile(samples, 50) * 1000, 3),
+                                 "p95_ms": round(percentile(samples, 95) * 1000, 3)})
+    return rows
+
+
+async def exactness(args, user, failures: list) -> list:
+    import httpx
+    import App.leaderboard as module
+    from App.database import dispose_engines, make_async_session
+    from App.leaderboard import WINDOWS, Leaderboard, check, leaderboard
+    from App.main import app
+    from App.rollups import verify
+
+    headers = {"Authorization": f"Bearer {mint_token(user)}"}
+    # Orders come from 50 customers, among them the generated top ones, so the ranking moves.
+    buyers = [
+        {"Authorization": f"Bearer {mint_token(SimpleNamespace(id=i, google_id=f'synthetic-1-{i}', name=None))}"}
+        for i in range(1, 51)
+    ]
+    remaining = iter(range(args.checkouts))
+    reads, statuses = [], set()
+
+    async def buyer(client):
+        for i in remaining:
+            response = await client.post("/checkout/", headers=buyers[i * 7 % len(buyers)], json={
+                "status": "pass" if i % 5 else "fail",
+                "payment_type": "card" if i % 2 else "UPI",
+                "amount": 100 + i % 37,
+                "item_name": "Veg Manchurian" if i % 3 else "Chicken Fried Rice",
+                "restaurant_id": 1 + i % 5,
+            })
+            statuses.add(response.status_code)
+
+    async def reader(client):
+        for i in range(args.checkouts // args.concurrency):
+            window = list(WINDOWS)[i % len(WINDOWS)]
+            started = time.perf_counter()
+            response = await client.get("/analytics/top-customers", params={"limit": 10, "window": window}, headers=headers)
+            timed(reads, started)
+            statuses.add(response.status_code)
+
+    transport = httpx.ASGITransport(app=app)
+    rows = []
+    try:
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            started = time.perf_counter()
+            await asyncio.gather(*(buyer(client) for _ in range(args.concurrency)), reader(client), reader(client))
+            elapsed = time.perf_counter() - started
+        rows.append({"check": "checkouts + reads", "result": f"{args.checkouts} + {len(reads)} in {elapsed:.1f}s, statuses {sorted(statuses)}"})
+        rows.append({"check": "GET /analytics/top-customers p50 / p95 ms",
+                     "result": f"{percentile(reads, 50) * 1000:.2f} / {percentile(reads, 95) * 1000:.2f}"})
+        if statuses != {200}:
+            failures.append(f"statuses {sorted(statuses)}")
+        async with make_async_session() as session:
+            problems = await check(session)
+            rows.append({"check": "leaderboard.check after the load", "result": problems or "ok"})
+            failures.extend(problems)
+            problems = await verify(session)
+            rows.append({"check": "rollups.verify", "result": problems or "ok"})
+            failures.extend(problems)
+            # Clock travel on a board of its own: the app's must not see time run backwards.
+            traveller = Leaderboard(0)
+            await traveller.refresh(session)
+            real_today = module.today
+            for ahead in (8, 31):
+                module.today = lambda: real_today() + datetime.timedelta(days=ahead)
+                try:
+                    problems = await check(session, traveller)
+                finally:
+                    module.today = real_today
+                sizes = {window: len(traveller._boards[window]) for window in WINDOWS}
+                rows.append({"check": f"check with the clock {ahead} days ahead", "result": f"{problems or 'ok'}, customers ranked {sizes}"})
+                failures.extend(problems)
+            rows.append({"check": "board loads in the app", "result": leaderboard.loads})
+            if leaderboard.loads != 1:
+                failures.append(f"the board was loaded {leaderboard.loads} times")
+    finally:
+        await dispose_engines()
+    return rows
+
+
+def place(order_id: int, customer_id: int) -> None:
+    """Commit a paid order with an explicit ``order_id`` (and its rollup deltas)."""
+    from sqlmodel import Session
+    from App.database import engine
+    from App.models import Orders, OrderFoodItem, Payments, PaymentStatus, PaymentType
+    from App.rollups import order_delta, rollup_statements
+
+    with Session(engine) as session:
+        payment = Payments(status=PaymentStatus.PASS, payment_type=PaymentType.CARD, amount=99.0, customer_id=customer_id)
+        session.add(payment)
+        session.flush()
+        order = Orders(order_id=order_id, item_name=OrderFoodItem.VEG_FRIED_RICE, transaction_id=payment.transaction_id,
+                       restaurant_id=1, customer_id=customer_id)
+        session.add(order)
+        for statement, params in rollup_statements(engine.dialect.name, [order_delta(order, payment)]):
+            session.execute(statement, params)
+        session.commit()
+
+
+async def out_of_order(failures: list) -> list:
+    from sqlalchemy import func, select
+    from App.database import dispose_engines, make_async_session
+    from App.leaderboard import Leaderboard, check, leaderboard
+    from App.models import Orders
+
+    rows = []
+    try:
+        async with make_async_session() as session:
+            newest = await session.scalar(select(func.max(Orders.order_id)))
+            await leaderboard.refresh(session, force=True)
+            # The app board: id +2 commits and is caught up on before id +1 commits.
+            place(newest + 2, customer_id=7)
+            await leaderboard.refresh(session, force=True)
+            gaps = sorted(leaderboard._gaps)
+            place(newest + 1, customer_id=8)
+            problems = await check(session)
+            rows.append({"check": "app board, id +2 committed before id +1", "result": f"gaps seen {gaps}, {problems or 'ok'}"})
+            failures.extend(problems)
+            if gaps != [newest + 1]:
+                failures.append(f"expected a gap at {newest + 1}, saw {gaps}")
+            # A fresh board loads while id +4 is committed and id +3 not yet.
+            place(newest + 4, customer_id=9)
+            fresh = Leaderboard(0)
+            await fresh.refresh(session)
+            place(newest + 3, customer_id=10)
+            problems = await check(session, fresh)
+            rows.append({"check": "fresh board loaded between id +4 and id +3", "result": problems or "ok"})
+            failures.extend(problems)
+    finally:
+        await dispose_engines()
+    return rows
+
+
+async def run(args) -> int:
+    failures = []
+    user = seed(args)
+    print_table(await latency(args, failures))
+    print()
+    print_table(await exactness(args, user, failures) + await out_of_order(failures))
+    for failure in failures:
+        print(failure, file=sys.stderr)
+    return 1 if failures else 0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--orders", type=int, default=200000)
+    parser.add_argument("--customers", type=int, default=20000)
+    parser.add_argument("--limits", type=lambda text: [int(n) for n in text.split(",")], default=[3, 100])
+    parser.add_argument("--repeat", type=int, default=20, help="runs per query")
+    parser.add_argument("--checkouts", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=16)
+    args = parser.parse_args()
+
+    use_temp_database("leaderboard")
+    os.environ["CACHE_BACKEND"] = "none"
+    os.environ["JOB_QUEUE_ENABLED"] = "false"  # rollups inline, so customer_order_rollup is current for the check
+    # Without the profile, concurrent checkouts fail with "database is locked".
+    os.environ.setdefault("SQLITE_PERFORMANCE_PROFILE", "true")
+    sys.exit(asyncio.run(run(args)))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
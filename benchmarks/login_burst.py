@@ -0,0 +1,122 @@
+"""Login spike: hundreds of simultaneous ``/auth/callback`` requests against mock Google.
+
+Every request is launched at once (no client-side concurrency limit). Each of ``--accounts``
+new Google accounts logs in ``--repeat`` times within the burst, so concurrent *first* logins
+for the same account race each other; a second burst then logs the same accounts in again.
+Checks that every callback returned 200, that each account ended up with exactly one
+Customers row, and that all tokens minted for an account carry the same ``sub``. An event-loop
+probe reports the worst scheduling delay seen during the burst (JWT signing with an RSA
+``--algorithm`` runs in the threadpool and shouldn't show up there).
+
+    python -m benchmarks.login_burst --accounts 100 --repeat 3
+    SQLITE_PERFORMANCE_PROFILE=true python -m benchmarks.login_burst --algorithm RS256
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+from collections import defaultdict
+
+from benchmarks.common import use_temp_database, percentile, print_table
+from benchmarks.mock_google import MockGoogle, _rsa_pem
+
+
+async def _loop_lag(done: asyncio.Event, samples: list, interval: float = 0.001) -> None:
+    while not done.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(interval)
+        samples.append(time.perf_counter() - started - interval)
+
+
+async def burst(client, codes) -> tuple:
+    latencies, statuses, subs = [], defaultdict(int), defaultdict(set)
+    from jose import jwt
+
+    async def login(code: str) -> None:
+        started = time.perf_counter()
+        response = await client.get("/auth/callback", params={"code": code})
+        latencies.append(time.perf_counter() - started)
+        statuses[response.status_code] += 1
+        if response.status_code == 200:
+            subs[code].add(jwt.get_unverified_claims(response.json()["access_token"])["sub"])
+
+    lag, done = [], asyncio.Event()
+    probe = asyncio.create_task(_loop_lag(done, lag))
+    started = time.perf_counter()
+    await asyncio.gather(*(login(code) for code in codes))
+    elapsed = time.perf_counter() - started
+    done.set()
+    await probe
+    return latencies, elapsed, statuses, subs, lag
+
+
+async def run(args, google: MockGoogle) -> int:
+    import httpx
+    from sqlalchemy import func, select
+    from App.main import app
+    from App.database import init_db, dispose_engines, make_async_session
+    from App.models import Customers
+
+    init_db()
+    accounts = [f"burst{i}" for i in range(args.accounts)]
+    codes = [code for code in accounts for _ in range(args.repeat)]
+    rows, failures = [], []
+    transport = httpx.ASGITransport(app=app)
+    try:
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+            for name in ("first logins", "returning logins"):
+                latencies, elapsed, statuses, subs, lag = await burst(client, codes)
+                rows.append({
+                    "burst": name,
+                    "requests": len(latencies),
+                    "ok": statuses[200],
+                    "errors": len(latencies) - statuses[200],
+                    "rps": round(len(latencies) / elapsed, 1),
+                    "p50_ms": round(percentile(latencies, 50) * 1000, 1),
+                    "p95_ms": round(percentile(latencies, 95) * 1000, 1),
+                    "max_loop_lag_ms": round(max(lag, default=0.0) * 1000, 1),
+                })
+                if len(latencies) != statuses[200]:
+                    failures.append(f"{name}: status counts {dict(statuses)}")
+                split = [code for code, ids in subs.items() if len(ids) != 1]
+                if split:
+                    failures.append(f"{name}: {len(split)} account(s) got tokens for different users, e.g. {split[0]}")
+        async with make_async_session() as session:
+            google_ids = [google.user_for(code)["id"] for code in accounts]
+            stored = await session.scalar(select(func.count()).select_from(Customers).where(Customers.google_id.in_(google_ids)))
+        if stored != len(accounts):
+            failures.append(f"{stored} Customers rows for {len(accounts)} accounts")
+    finally:
+        from App.oauth import close_http_client
+
+        await close_http_client()
+        await dispose_engines()
+    print_table(rows)
+    for failure in failures:
+        print(failure, file=sys.stderr)
+    return 1 if failures else 0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--accounts", type=int, default=100, help="distinct new Google accounts")
+    parser.add_argument("--repeat", type=int, default=3, help="simultaneous callbacks per account per burst")
+    parser.add_argument("--latency-ms", type=float, default=20.0, help="added to every mock Google response")
+    parser.add_argument("--algorithm", default="HS256", help="JWT signing algorithm (RS256 signs with a throwaway key)")
+    parser.add_argument("--verify-id-token", action="store_true", help="verify the id_token instead of calling userinfo")
+    args = parser.parse_args()
+
+    use_temp_database("login-burst")
+    os.environ["ALGORITHM"] = args.algorithm
+    if not args.algorithm.upper().startswith("HS"):
+        os.environ["JWT_SECRET_KEY"] = _rsa_pem().decode()
+    os.environ["GOOGLE_VERIFY_ID_TOKEN"] = "true" if args.verify_id_token else "false"
+    google = MockGoogle(latency_ms=args.latency_ms, tls=False)
+    with google.serve():
+        os.environ.update(google.env())
+        sys.exit(asyncio.run(run(args, google)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,197 @@
+"""Local stand-in for Google's OAuth endpoints, served over real sockets (TLS by default).
+
+Implements just enough for ``routers/auth.callback``: the token exchange (returning an
+RS256-signed ``id_token``), v2 userinfo, and a JWKS document with ``Cache-Control: max-age``.
+Keys can be rotated at runtime to exercise the JWKS refresh path. ``latency_ms`` delays every
+response to approximate the round trip to Google.
+
+    with MockGoogle(latency_ms=20).serve() as google:
+        os.environ.update(google.env())   # before importing App
+"""
+import asyncio
+import base64
+import contextlib
+import datetime
+import hashlib
+import ipaddress
+import os
+import socket
+import tempfile
+import threading
+import time
+import uuid
+from urllib.parse import parse_qs
+
+from fastapi import FastAPI, Header, HTTPException, Request
+from fastapi.responses import JSONResponse
+from jose import jwk, jwt
+
+
+def _rsa_pem() -> bytes:
+    from cryptography.hazmat.primitives import serialization
+    from cryptography.hazmat.primitives.asymmetric import rsa
+
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    return key.private_bytes(
+        serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()
+    )
+
+
+def _self_signed_cert(directory: str) -> tuple:
+    """Write a throwaway cert/key pair for 127.0.0.1 and return (certfile, keyfile)."""
+    from cryptography import x509
+    from cryptography.hazmat.primitives import hashes, serialization
+    from cryptography.hazmat.primitives.asymmetric import rsa
+    from cryptography.x509.oid import NameOID
+
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, "127.0.0.1")])
+    now = datetime.datetime.now(datetime.timezone.utc)
+    cert = (
+        x509.CertificateBuilder()
+        .subject_name(name)
+        .issuer_name(name)
+        .public_key(key.public_key())
+        .serial_number(x509.random_serial_number())
+        .not_valid_before(now - datetime.timedelta(minutes=1))
+        .not_valid_after(now + datetime.timedelta(days=1))
+        .add_extension(x509.SubjectAlternativeName([x509.IPAddress(ipaddress.ip_address("127.0.0.1"))]), critical=False)
+        .add_extension(x509.BasicConstraints(ca=True, path_length=None), critical=True)
+        .sign(key, hashes.SHA256())
+    )
+    certfile, keyfile = os.path.join(directory, "cert.pem"), os.path.join(directory, "key.pem")
+    with open(certfile, "wb") as f:
+        f.write(cert.public_bytes(serialization.Encoding.PEM))
+    with open(keyfile, "wb") as f:
+        f.write(key.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()))
+    return certfile, keyfile
+
+
+def _at_hash(access_token: str) -> str:
+    digest = hashlib.sha256(access_token.encode()).digest()
+    return base64.urlsafe_b64encode(digest[: len(digest) // 2]).decode().rstrip("=")
+
+
+class MockGoogle:
+    ISSUER = "https://accounts.google.com"
+
+    def __init__(self, client_id: str = "bench-client", latency_ms: float = 0.0, jwks_max_age: int = 3600, tls: bool = True) -> None:
+        self.client_id = client_id
+        self.latency = latency_ms / 1000
+        self.jwks_max_age = jwks_max_age
+        self.tls = tls
+        self.base_url = ""
+        self.certfile = None
+        self.keys = []  # [(kid, jose signing key)], newest first; the first one signs
+        self.tokens = {}  # access_token -> user
+        self.counts = {"token": 0, "userinfo": 0, "certs": 0}
+        self.rotate()
+        self.app = self._build_app()
+
+    def rotate(self) -> str:
+        """Start signing with a new key; the previous one stays published for overlap."""
+        kid = uuid.uuid4().hex[:16]
+        self.keys = [(kid, jwk.construct(_rsa_pem(), "RS256"))] + self.keys[:1]
+        return kid
+
+    def user_for(self, code: str) -> dict:
+        return {
+            "id": f"mock-{code}",
+            "email": f"{code}@example.com",
+            "verified_email": True,
+            "name": f"Mock User {code}",
+        }
+
+    def _jwks(self) -> dict:
+        keys = []
+        for kid, key in self.keys:
+            public = key.public_key().to_dict()
+            keys.append({**public, "kid": kid, "use": "sig", "alg": "RS256"})
+        return {"keys": keys}
+
+    def _build_app(self) -> FastAPI:
+        app = FastAPI()
+
+        async def delay() -> None:
+            if self.latency:
+                await asyncio.sleep(self.latency)
+
+        @app.post("/token")
+        async def token(request: Request):
+            await delay()
+            form = {k: v[0] for k, v in parse_qs((await request.body()).decode()).items()}
+            code, client_id = form.get("code"), form.get("client_id", "")
+            if not code:
+                raise HTTPException(status_code=400, detail="invalid_grant")
+            self.counts["token"] += 1
+            user = self.user_for(code)
+            access_token = uuid.uuid4().hex
+            self.tokens[access_token] = user
+            now = int(time.time())
+            kid, key = self.keys[0]
+            claims = {
+                "iss": self.ISSUER,
+                "aud": client_id or self.client_id,
+                "sub": user["id"],
+                "email": user["email"],
+                "email_verified": user["verified_email"],
+                "name": user["name"],
+                "iat": now,
+                "exp": now + 3600,
+                "at_hash": _at_hash(access_token),
+            }
+            id_token = jwt.encode(claims, key, algorithm="RS256", headers={"kid": kid})
+            return {"access_token": access_token, "id_token": id_token, "token_type": "Bearer", "expires_in": 3599}
+
+        @app.get("/userinfo")
+        async def userinfo(authorization: str = Header("")):
+            await delay()
+            self.counts["userinfo"] += 1
+            user = self.tokens.get(authorization.removeprefix("Bearer "))
+            if user is None:
+                raise HTTPException(status_code=401, detail="invalid token")
+            return user
+
+        @app.get("/certs")
+        async def certs():
+            await delay()
+            self.counts["certs"] += 1
+            return JSONResponse(self._jwks(), headers={"Cache-Control": f"public, max-age={self.jwks_max_age}"})
+
+        return app
+
+    def env(self) -> dict:
+        """Settings that point the app at this server."""
+        return {
+            "GOOGLE_CLIENT_ID": self.client_id,
+            "GOOGLE_TOKEN_ENDPOINT": f"{self.base_url}/token",
+            "GOOGLE_USERINFO_ENDPOINT": f"{self.base_url}/userinfo",
+            "GOOGLE_JWKS_URI": f"{self.base_url}/certs",
+        }
+
+    @contextlib.contextmanager
+    def serve(self):
+        """Run the server on a free loopback port in a background thread."""
+        import uvicorn
+
+        sock = socket.socket()
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+        options = {}
+        if self.tls:
+            self.certfile, keyfile = _self_signed_cert(tempfile.mkdtemp(prefix="mock-google-"))
+            options = {"ssl_certfile": self.certfile, "ssl_keyfile": keyfile}
+        scheme = "https" if self.tls else "http"
+        self.base_url = f"{scheme}://127.0.0.1:{port}"
+
+        server = uvicorn.Server(uvicorn.Config(self.app, log_level="warning", lifespan="off", **options))
+        thread = threading.Thread(target=server.run, kwargs={"sockets": [sock]}, daemon=True)
+        thread.start()
+        while not server.started:
+            time.sleep(0.01)
+        try:
+            yield self
+        finally:
+            server.should_exit = True
+            thread.join()
+            sock.close()
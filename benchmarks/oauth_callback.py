@@ -0,0 +1,105 @@
+"""Login-callback latency against a local mock of Google's OAuth endpoints.
+
+Compares a fresh connection per login (the old per-request ``httpx.AsyncClient``), the shared
+pooled client calling userinfo, and the shared client verifying the ``id_token`` against the
+cached JWKS. The last run rotates the signing key halfway through to exercise the refresh.
+
+    python -m benchmarks.oauth_callback --logins 500 --concurrency 16 --latency-ms 20
+"""
+import argparse
+import asyncio
+import os
+import time
+
+from benchmarks.common import use_temp_database, summarize, print_table
+from benchmarks.mock_google import MockGoogle
+
+
+async def login_burst(client, google, *, total: int, concurrency: int, users: int, rotate_at: int = -1):
+    latencies = []
+    remaining = iter(range(total))
+
+    async def worker():
+        for i in remaining:
+            if i == rotate_at:
+                google.rotate()
+            started = time.perf_counter()
+            response = await client.get("/auth/callback", params={"code": f"user{i % users}"})
+            latencies.append(time.perf_counter() - started)
+            if response.status_code != 200:
+                raise RuntimeError(f"callback -> {response.status_code}: {response.text}")
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies, time.perf_counter() - started
+
+
+async def run(args, google: MockGoogle) -> None:
+    import httpx
+    from App.main import app
+    from App import oauth
+    from App.database import init_db, dispose_engines
+    from App.settings import settings
+
+    init_db()
+    shared_client = oauth.get_http_client
+
+    def per_login_client():
+        # What the callback used to do: a new client, so a new TCP+TLS handshake, per login.
+        return oauth.make_http_client(limits=httpx.Limits(max_keepalive_connections=0))
+
+    modes = [
+        ("per-login client + userinfo", per_login_client, False, -1),
+        ("shared client + userinfo", shared_client, False, -1),
+        ("shared client + id_token", shared_client, True, -1),
+        ("id_token, key rotated mid-run", shared_client, True, args.logins // 2),
+    ]
+    rows = []
+    transport = httpx.ASGITransport(app=app)
+    try:
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+            for name, factory, verify_locally, rotate_at in modes:
+                oauth.get_http_client = factory
+                settings.GOOGLE_VERIFY_ID_TOKEN = verify_locally
+                # Warm up once so every mode starts with the same DB state and JWKS cached.
+                await login_burst(client, google, total=args.users, concurrency=args.concurrency, users=args.users)
+                if rotate_at >= 0:
+                    # The rotated key must not land inside the unknown-kid refetch rate limit.
+                    await asyncio.sleep(oauth.jwks_cache.min_refresh)
+                before = dict(google.counts)
+                fetches = oauth.jwks_cache.fetches
+                latencies, elapsed = await login_burst(
+                    client, google, total=args.logins, concurrency=args.concurrency, users=args.users, rotate_at=rotate_at
+                )
+                rows.append({
+                    **summarize(name, latencies, elapsed),
+                    "userinfo_calls": google.counts["userinfo"] - before["userinfo"],
+                    "jwks_fetches": oauth.jwks_cache.fetches - fetches,
+                })
+    finally:
+        oauth.get_http_client = shared_client
+        await oauth.close_http_client()
+        await dispose_engines()
+    print_table(rows)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--logins", type=int, default=400)
+    parser.add_argument("--users", type=int, default=50, help="distinct Google accounts logging in")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--latency-ms", type=float, default=20.0, help="added to every mock Google response")
+    parser.add_argument("--no-tls", action="store_true")
+    args = parser.parse_args()
+
+    use_temp_database("oauth")
+    google = MockGoogle(latency_ms=args.latency_ms, tls=not args.no_tls)
+    with google.serve():
+        os.environ.update(google.env())
+        if google.certfile:
+            os.environ["SSL_CERT_FILE"] = google.certfile
+        asyncio.run(run(args, google))
+
+
+if __name__ == "__main__":
+    main()
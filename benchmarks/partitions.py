@@ -0,0 +1,206 @@
+"""Month partitions: archive cold history, then check the API answers exactly as before.
+
+Generates ``--orders`` over ``--days`` (about a year by default) and records, as their owners,
+``GET /orders/{id}`` and ``GET /payments/{id}`` for ids sampled from every month (payments
+without an order included), plus the analytics reports: rollup-backed presets, base-table
+aggregates over all history and over a recent window, and the CSV export. Then runs
+``archive_cold_months``, repeats every request and requires identical responses, and runs
+``rollups.verify`` before and after a ``rebuild`` (which must fold the archive files back in).
+
+Reports the live table sizes, the archive files, and p50 latency of a recent-window
+base-table aggregate and of by-id lookups before and after archiving. Exits 1 on any
+difference.
+
+    python -m benchmarks.partitions --orders 200000 --days 365
+"""
+import argparse
+import asyncio
+import datetime
+import os
+import random
+import stat
+import sys
+import time
+
+from benchmarks.common import use_temp_database, mint_token, percentile, print_table
+
+
+def seed(args) -> dict:
+    from sqlalchemy import select
+    from sqlmodel import Session
+    from App.database import engine, init_db
+    from App.models import Customers, Orders, Payments
+    from benchmarks.datagen import generate
+
+    init_db()
+    with engine.begin() as connection:
+        generate(connection, orders=args.orders, days=args.days, customers=args.customers, seed=args.seed)
+    rng = random.Random(args.seed)
+    with Session(engine) as session:
+        orders = session.execute(select(Orders.order_id, Orders.customer_id)).all()
+        orderless = session.execute(
+            select(Payments.transaction_id, Payments.customer_id)
+            .where(~select(Orders.order_id).where(Orders.transaction_id == Payments.transaction_id).exists())
+        ).all()
+        payments = session.execute(select(Payments.transaction_id, Payments.customer_id)).all()
+        sample = {
+            "orders": rng.sample(orders, min(args.sample, len(orders))),
+            "payments": rng.sample(payments, min(args.sample, len(payments)))
+            + rng.sample(orderless, min(args.sample // 4, len(orderless))),
+        }
+        owners = {customer_id for rows in sample.values() for _, customer_id in rows}
+        tokens = {user.id: mint_token(user) for user in session.scalars(select(Customers).where(Customers.id.in_(owners)))}
+        restaurant_ids = rng.sample(sorted({r for r, in session.execute(select(Orders.restaurant_id).distinct())}), 3)
+        analyst = mint_token(session.get(Customers, 1))
+    return {"sample": sample, "tokens": tokens, "analytics": analytics_urls(restaurant_ids), "analyst": analyst}
+
+
+def analytics_urls(restaurant_ids) -> list:
+    now = datetime.datetime.utcnow()
+    # A start that isn't midnight keeps the aggregate on the base tables instead of the rollups.
+    recent = (now - datetime.timedelta(days=7, hours=3)).replace(microsecond=0).isoformat()
+    return [
+        "/analytics/earnings/mumbai-last-month",
+        "/analytics/earnings/veg-bangalore",
+        "/analytics/top-customers",
+        "/analytics/daily-revenue",
+        *(f"/analytics/restaurant/{r}/items-summary" for r in restaurant_ids),
+        "/analytics/aggregate?metric=sum&group_by=month&group_by=payment_type",
+        "/analytics/aggregate?metric=avg&group_by=area&group_by=payment_type&status=pass&status=fail",
+        "/analytics/aggregate?metric=count&group_by=week&payment_type=card",
+        f"/analytics/aggregate?metric=sum&group_by=day&group_by=area&start={recent}",
+        "/analytics/export?format=csv",
+    ]
+
+
+async def snapshot(client, data) -> dict:
+    """Every checked response, keyed by request."""
+    responses = {}
+    for kind, rows in data["sample"].items():
+        for ident, owner in rows:
+            url = f"/{kind}/{ident}"
+            response = await client.get(url, headers={"Authorization": f"Bearer {data['tokens'][owner]}"})
+            responses[url] = (response.status_code, response.text)
+    headers = {"Authorization": f"Bearer {data['analyst']}"}
+    for url in data["analytics"]:
+        response = await client.get(url, headers=headers)
+        responses[url] = (response.status_code, response.text, response.headers.get("x-export-watermark"))
+    return responses
+
+
+async def latencies(client, data, repeat: int) -> dict:
+    headers = {"Authorization": f"Bearer {data['analyst']}"}
+    window = data["analytics"][-2]
+    timings = {"recent_window_aggregate": [], "order_by_id": []}
+    for _ in range(repeat):
+        started = time.perf_counter()
+        (await client.get(window, headers=headers)).raise_for_status()
+        timings["recent_window_aggregate"].append(time.perf_counter() - started)
+    for ident, owner in data["sample"]["orders"]:
+        started = time.perf_counter()
+        await client.get(f"/orders/{ident}", headers={"Authorization": f"Bearer {data['tokens'][owner]}"})
+        timings["order_by_id"].append(time.perf_counter() - started)
+    return {name: round(percentile(samples, 50) * 1000, 2) for name, samples in timings.items()}
+
+
+async def verify_rollups(label: str, failures: list) -> None:
+    from App.database import make_async_session
+    from App.rollups import verify
+
+    async with make_async_session() as session:
+        problems = await verify(session)
+    failures.extend(f"rollups {label}: {problem}" for problem in problems)
+
+
+def live_counts() -> dict:
+    from sqlalchemy import func, select
+    from App.database import engine
+    from App.models import Orders, Payments
+
+    with engine.connect() as connection:
+        return {
+            "live_orders": connection.scalar(select(func.count()).select_from(Orders)),
+            "live_payments": connection.scalar(select(func.count()).select_from(Payments)),
+        }
+
+
+async def run(args) -> int:
+    import httpx
+    from sqlmodel import Session, select
+    from App.main import app
+    from App.catalog import load_catalog
+    from App.database import dispose_engines, engine
+    from App.models import ArchivedMonths
+    from App.partitions import archive_cold_months, archive_dir
+    from App.rollups import rebuild
+
+    data = seed(args)
+    await load_catalog()
+    failures = []
+    transport = httpx.ASGITransport(app=app)
+    try:
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+            await verify_rollups("before archiving", failures)
+            before = await snapshot(client, data)
+            rows = [{"phase": "before", **live_counts(), **await latencies(client, data, args.repeat)}]
+
+            started = time.perf_counter()
+            archived = archive_cold_months(engine)
+            archive_seconds = time.perf_counter() - started
+
+            after = await snapshot(client, data)
+            rows.append({"phase": "after", **live_counts(), **await latencies(client, data, args.repeat)})
+            await verify_rollups("after archiving", failures)
+            with engine.begin() as connection:
+                rebuild(connection)
+            await verify_rollups("after rebuild", failures)
+            rebuilt = await snapshot(client, data)
+    finally:
+        await dispose_engines()
+
+    for url, response in before.items():
+        if after[url] != response:
+            failures.append(f"{url}: response changed after archiving ({response[0]} -> {after[url][0]})")
+        elif rebuilt[url] != response:
+            failures.append(f"{url}: response changed after rebuilding the rollups")
+    with Session(engine) as session:
+        months = session.exec(select(ArchivedMonths).order_by(ArchivedMonths.start)).all()
+    files = []
+    for month in months:
+        path = os.path.join(archive_dir(), month.file_name)
+        mode = os.stat(path).st_mode
+        if mode & (stat.S_IWUSR | stat.S_IWGRP | stat.S_IWOTH):
+            failures.append(f"{month.file_name} is writable")
+        files.append({
+            "month": month.month,
+            "orders": month.orders_count,
+            "payments": month.payments_count,
+            "kb": round(os.path.getsize(path) / 1024),
+        })
+    print(f"archived {len(archived)} month(s) in {archive_seconds:.2f}s; {len(before)} responses compared")
+    print_table(files)
+    print()
+    print_table(rows)
+    for failure in failures:
+        print(failure, file=sys.stderr)
+    return 1 if failures else 0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--orders", type=int, default=100000)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--customers", type=int, default=2000)
+    parser.add_argument("--sample", type=int, default=200, help="order and payment ids checked by id")
+    parser.add_argument("--repeat", type=int, default=50, help="timed recent-window requests per phase")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    use_temp_database("partitions")
+    # Compare what the handlers compute, not what the analytics cache remembers.
+    os.environ["CACHE_BACKEND"] = "none"
+    sys.exit(asyncio.run(run(args)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,191 @@
+"""Rate limiter: per-request overhead, GCRA accuracy, shared budgets, and rejection before the DB.
+
+1. Overhead: drives ``RateLimitMiddleware`` around a no-op ASGI app with ``--users`` distinct
+   bearer tokens (plus IP-keyed ``/auth/`` requests) under a budget nobody exceeds, and reports
+   microseconds added per request for the memory store and the redis store on the LocalRedis
+   stand-in; at 10k req/s a request has 100 us in total.
+2. Accuracy: one caller offers ``--offered`` req/s for ``--seconds`` against a 50/s:10 rule;
+   GCRA must allow 10 + 50 * seconds (within a couple of requests). Run on two "workers":
+   with separate memory stores each allows that much, sharing one LocalRedis they allow it once.
+3. App: with RATE_LIMIT_ENABLED, a burst of ``POST /payments/`` gets exactly its burst through
+   and then 429s with Retry-After without executing a single SQL statement, and ``/auth/*``
+   is limited per client IP whatever token is sent.
+
+Exits 1 if any check fails.
+
+    python -m benchmarks.rate_limit --users 10000 --requests 200000
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+from types import SimpleNamespace
+
+from benchmarks.common import use_temp_database, mint_token, print_table
+
+
+async def noop_app(scope, receive, send) -> None:
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b""})
+
+
+async def _send(message) -> None:
+    pass
+
+
+def scopes(tokens, count: int) -> list:
+    """``count`` request scopes cycling through the callers; every 10th one is an /auth/ call."""
+    result = []
+    for i in range(count):
+        if i % 10 == 9:
+            result.append({"type": "http", "method": "GET", "path": "/auth/login", "headers": [],
+                           "client": (f"10.0.{i % 250}.{i % 200}", 5000)})
+        else:
+            header = f"Bearer {tokens[i % len(tokens)]}".encode()
+            result.append({"type": "http", "method": "GET", "path": f"/orders/{i}",
+                           "headers": [(b"host", b"bench"), (b"authorization", header)], "client": ("10.1.0.1", 5000)})
+    return result
+
+
+async def overhead(args, failures: list) -> list:
+    from App.auth_utils import decode_token
+    from App.ratelimit import MemoryStore, RateLimitMiddleware, RateLimiter, RedisStore, parse_rules
+    from benchmarks.standins import LocalRedis
+
+    tokens = [mint_token(SimpleNamespace(id=i, google_id=f"g{i}", name=None)) for i in range(1, args.users + 1)]
+    for token in tokens:
+        decode_token(token)  # a client's token is verified once, then served from the cache
+    requests = scopes(tokens, args.requests)
+    rules = parse_rules("*=1000000/s")
+    memory = MemoryStore(args.users * 2)
+    apps = {
+        "no limiter": noop_app,
+        "memory": RateLimitMiddleware(noop_app, RateLimiter(rules, memory)),
+        "redis (LocalRedis)": RateLimitMiddleware(noop_app, RateLimiter(rules, RedisStore(LocalRedis()))),
+    }
+    timings = {}
+    for name, app in apps.items():
+        for scope in requests[:1000]:  # warm up
+            await app(scope, None, _send)
+        started = time.perf_counter()
+        for scope in requests:
+            await app(scope, None, _send)
+        timings[name] = (time.perf_counter() - started) / len(requests) * 1e6
+    rows = []
+    for name, micros in timings.items():
+        added = micros - timings["no limiter"]
+        rows.append({"store": name, "us_per_request": round(micros, 2), "added_us": round(added, 2),
+                     "share_of_100us": f"{added:.1f}%"})
+    # Buckets refill within a microsecond under this budget, so sweeping keeps only a handful.
+    print(f"memory store: {len(memory)} of {args.users} callers' buckets still held after the run")
+    if len(memory) > args.users // 10:
+        failures.append(f"memory store kept {len(memory)} full buckets")
+    if timings["memory"] - timings["no limiter"] > 10:
+        failures.append(f"memory limiter adds {timings['memory'] - timings['no limiter']:.1f} us per request")
+    return rows
+
+
+async def accuracy(args, failures: list) -> list:
+    from App.ratelimit import MemoryStore, RateLimiter, RedisStore, parse_rules
+    from benchmarks.standins import LocalRedis
+
+    rules = parse_rules("*=50/s:10")
+    expected = 10 + 50 * args.seconds
+    shared = LocalRedis()
+    setups = {
+        "memory, 2 workers": [RateLimiter(rules, MemoryStore(1000)) for _ in range(2)],
+        "redis (LocalRedis), 2 workers": [RateLimiter(rules, RedisStore(shared)) for _ in range(2)],
+    }
+    scope = {"type": "http", "method": "GET", "path": "/orders/", "headers": [], "client": ("10.2.0.1", 5000)}
+    rows = []
+    for name, limiters in setups.items():
+        allowed = rejected = 0
+        interval = 1 / args.offered
+        started = time.perf_counter()
+        i = 0
+        while time.perf_counter() - started < args.seconds:
+            _, retry_after = await limiters[i % len(limiters)].check(scope)
+            if retry_after:
+                rejected += 1
+            else:
+                allowed += 1
+            i += 1
+            await asyncio.sleep(max(0.0, started + i * interval - time.perf_counter()))
+        budget = expected * (1 if "redis" in name else len(limiters))
+        rows.append({"setup": name, "offered": allowed + rejected, "allowed": allowed, "expected": round(budget)})
+        if abs(allowed - budget) > 2 + 0.02 * budget:
+            failures.append(f"{name}: allowed {allowed}, expected about {budget:.0f}")
+    return rows
+
+
+async def through_app(failures: list) -> list:
+    import httpx
+    from sqlmodel import Session
+    from App.database import dispose_engines, engine, init_db
+    from App.main import app
+    from App.metrics import SQL_STATEMENTS
+    from App.models import Customers
+
+    init_db()
+    with Session(engine, expire_on_commit=False) as session:
+        user = Customers(google_id="bench-limited", name="Bench Limited")
+        session.add(user)
+        session.commit()
+    headers = {"Authorization": f"Bearer {mint_token(user)}"}
+    body = {"status": "pass", "payment_type": "card", "amount": 10.0}
+    rows = []
+    transport = httpx.ASGITransport(app=app, client=("10.3.0.1", 5000))
+    try:
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            statuses = [(await client.post("/payments/", json=body, headers=headers)).status_code for _ in range(8)]
+            statements = sum(SQL_STATEMENTS._values.values())
+            rejected = [await client.post("/payments/", json=body, headers=headers) for _ in range(100)]
+            executed = sum(SQL_STATEMENTS._values.values()) - statements
+            rows.append({"check": "POST /payments/ burst of 8 (5/m:5)", "result": statuses})
+            rows.append({"check": "SQL statements for 100 rejected requests", "result": executed})
+            if statuses != [200] * 5 + [429] * 3:
+                failures.append(f"payments burst statuses {statuses}")
+            if executed or {r.status_code for r in rejected} != {429} or not rejected[0].headers.get("retry-after"):
+                failures.append(f"rejected payments ran {executed} statement(s) / lacked 429 + Retry-After")
+
+            auth = [
+                (await client.get("/auth/me", headers={"Authorization": f"Bearer token-{i}"})).status_code
+                for i in range(5)
+            ]
+            rows.append({"check": "GET /auth/me x5, one IP, different tokens (3/m:3)", "result": auth})
+            if auth[3:] != [429, 429] or 429 in auth[:3]:
+                failures.append(f"/auth/ statuses {auth}")
+    finally:
+        await dispose_engines()
+    return rows
+
+
+async def run(args) -> int:
+    failures = []
+    print_table(await overhead(args, failures))
+    print()
+    print_table(await accuracy(args, failures))
+    print()
+    print_table(await through_app(failures))
+    for failure in failures:
+        print(failure, file=sys.stderr)
+    return 1 if failures else 0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=10000, help="distinct bearer tokens in the overhead run")
+    parser.add_argument("--requests", type=int, default=200000, help="requests per store in the overhead run")
+    parser.add_argument("--offered", type=float, default=250.0, help="req/s offered in the accuracy run")
+    parser.add_argument("--seconds", type=float, default=2.0)
+    args = parser.parse_args()
+
+    use_temp_database("rate-limit")
+    os.environ["RATE_LIMIT_ENABLED"] = "true"
+    os.environ["RATE_LIMITS"] = "POST /payments/*=5/m:5, /auth/*=3/m:3, *=1000/s"
+    sys.exit(asyncio.run(run(args)))
+
+
+if __name__ == "__main__":
+    main()
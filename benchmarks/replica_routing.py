@@ -0,0 +1,190 @@
+"""Replica routing benchmark: checkout write latency while heavy analytics run, with and without
+a read replica, plus a read-your-writes check.
+
+Each configuration runs in its own interpreter (engines are built from settings at import) on
+a generated dataset. Writers loop ``POST /payments/`` -> ``GET /payments/{id}`` ->
+``POST /orders/`` -> ``GET /orders/{id}``, each with its own client (and cookie jar); the GETs
+right after each write must see it.
+Analytics workers meanwhile hammer an uncached base-table aggregate. The replica is a second
+SQLite file kept in sync by ``standins.SQLiteReplicator``.
+
+Configurations:
+  primary      everything on the primary (the old behaviour)
+  replica      GET handlers on the replica, read-your-writes stickiness on
+  replica-rw0  READ_YOUR_WRITES_SECONDS=0: shows the stale reads stickiness prevents
+  replica-2w   as "replica", but every GET is served as if by a second worker that did not
+               see the write (its in-process memory of recent writers is cleared first), so
+               only the client's ``wrote_at`` cookie can keep the read on the primary
+
+Exits 1 if a sticky configuration served a stale read, or if writes under analytics load
+were slower with the replica than without it.
+
+    python -m benchmarks.replica_routing --orders 200000 --checkouts 200
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+
+from benchmarks.common import use_temp_database, mint_token, percentile, print_table
+
+
+CONFIGS = {
+    "primary": {},
+    "replica": {"REPLICA": "1", "READ_YOUR_WRITES_SECONDS": "5"},
+    "replica-rw0": {"REPLICA": "1", "READ_YOUR_WRITES_SECONDS": "0"},
+    "replica-2w": {"REPLICA": "1", "READ_YOUR_WRITES_SECONDS": "5", "OTHER_WORKER_READS": "1"},
+}
+ANALYTICS_URL = "/analytics/aggregate?metric=sum&group_by=week&group_by=payment_type"
+
+
+async def run_child(args) -> dict:
+    primary_path = use_temp_database("replica")
+    replicator = replica_path = None
+    if os.environ.get("REPLICA") == "1":
+        replica_path = os.path.join(os.path.dirname(primary_path), "replica.db")
+        os.environ["REPLICA_DATABASE_URL"] = f"sqlite:///{replica_path}"
+
+    import httpx
+    from sqlmodel import Session
+    from App.main import app
+    from App.cache import _NullBackend, response_cache
+    from App.database import _recent_writers, engine, init_db, dispose_engines
+    from App.models import Customers, Restaurants
+    from benchmarks.datagen import generate
+    from benchmarks.standins import SQLiteReplicator
+
+    init_db()
+    with engine.begin() as connection:
+        generate(connection, orders=args.orders, seed=args.seed)
+    with Session(engine) as session:
+        writers = [Customers(google_id=f"replica-writer-{i}", name=f"Writer {i}") for i in range(args.writers)]
+        session.add_all(writers)
+        session.commit()
+        tokens = [mint_token(user) for user in writers]
+        analyst = mint_token(session.get(Customers, 1))
+        restaurant_id = session.get(Restaurants, 1).restaurant_id
+    if replica_path:
+        replicator = SQLiteReplicator(primary_path, replica_path, interval=args.replication_interval).start()
+    # Every analytics request must reach the database.
+    response_cache.backend = _NullBackend()
+
+    other_worker = os.environ.get("OTHER_WORKER_READS") == "1"
+
+    async def read(client, url: str, headers: dict):
+        if other_worker:
+            _recent_writers.clear()
+        return await client.get(url, headers=headers)
+
+    async def writer(token: str, checkouts: int, latencies: list, stale: list) -> None:
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+            await writes(client, token, checkouts, latencies, stale)
+
+    async def writes(client, token: str, checkouts: int, latencies: list, stale: list) -> None:
+        headers = {"Authorization": f"Bearer {token}"}
+        for _ in range(checkouts):
+            started = time.perf_counter()
+            payment = await client.post("/payments/", json={"status": "pass", "payment_type": "UPI", "amount": 250.0}, headers=headers)
+            latencies.append(time.perf_counter() - started)
+            transaction_id = payment.json()["transaction_id"]
+            if (await read(client, f"/payments/{transaction_id}", headers)).status_code != 200:
+                stale.append(f"payment {transaction_id}")
+            started = time.perf_counter()
+            order = await client.post(
+                "/orders/",
+                json={"item_name": "Veg Fried Rice", "transaction_id": transaction_id, "restaurant_id": restaurant_id},
+                headers=headers,
+            )
+            latencies.append(time.perf_counter() - started)
+            if (await read(client, f"/orders/{order.json()['order_id']}", headers)).status_code != 200:
+                stale.append(f"order {order.json()['order_id']}")
+
+    async def analytics(client, done: asyncio.Event, timings: list) -> None:
+        headers = {"Authorization": f"Bearer {analyst}"}
+        while not done.is_set():
+            started = time.perf_counter()
+            response = await client.get(ANALYTICS_URL, headers=headers)
+            response.raise_for_status()
+            timings.append(time.perf_counter() - started)
+
+    async def phase(client, analytics_workers: int) -> dict:
+        latencies, stale, timings = [], [], []
+        done = asyncio.Event()
+        readers = [asyncio.create_task(analytics(client, done, timings)) for _ in range(analytics_workers)]
+        if readers:
+            await asyncio.sleep(0.5)  # let the analytics load build up first
+        started = time.perf_counter()
+        await asyncio.gather(*(writer(token, args.checkouts, latencies, stale) for token in tokens))
+        elapsed = time.perf_counter() - started
+        done.set()
+        await asyncio.gather(*readers)
+        return {
+            "write_p50_ms": round(percentile(latencies, 50) * 1000, 1),
+            "write_p95_ms": round(percentile(latencies, 95) * 1000, 1),
+            "writes_per_sec": round(len(latencies) / elapsed, 1),
+            "analytics_done": len(timings),
+            "analytics_p50_ms": round(percentile(timings, 50) * 1000, 1),
+            "stale_reads": len(stale),
+        }
+
+    transport = httpx.ASGITransport(app=app)
+    try:
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+            idle = await phase(client, 0)
+            loaded = await phase(client, args.analytics)
+    finally:
+        if replicator is not None:
+            replicator.stop()
+        await dispose_engines()
+    return {
+        "idle_write_p95_ms": idle["write_p95_ms"],
+        **{key: value for key, value in loaded.items() if key != "stale_reads"},
+        "stale_reads": idle["stale_reads"] + loaded["stale_reads"],
+        "replica_copies": replicator.copies if replicator else 0,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--orders", type=int, default=200000)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--writers", type=int, default=4)
+    parser.add_argument("--checkouts", type=int, default=50, help="checkouts per writer per phase")
+    parser.add_argument("--analytics", type=int, default=16, help="concurrent analytics workers")
+    parser.add_argument("--replication-interval", type=float, default=0.5)
+    parser.add_argument("--configs", default=",".join(CONFIGS))
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(asyncio.run(run_child(args))))
+        return
+
+    rows = []
+    for name in args.configs.split(","):
+        env = {key: value for key, value in os.environ.items() if key not in ("REPLICA", "REPLICA_DATABASE_URL", "OTHER_WORKER_READS")}
+        env.update(CONFIGS[name])
+        argv = [sys.executable, "-m", "benchmarks.replica_routing", "--child"]
+        for option in ("orders", "seed", "writers", "checkouts", "analytics", "replication_interval"):
+            argv += [f"--{option.replace('_', '-')}", str(getattr(args, option))]
+        result = subprocess.run(argv, env=env, capture_output=True, text=True)
+        if result.returncode != 0:
+            sys.stderr.write(result.stderr)
+            sys.exit(result.returncode)
+        rows.append({"config": name, **json.loads(result.stdout.strip().splitlines()[-1])})
+    print_table(rows)
+
+    results = {row["config"]: row for row in rows}
+    failures = [f"{name}: {row['stale_reads']} stale read(s)" for name, row in results.items() if name != "replica-rw0" and row["stale_reads"]]
+    if "primary" in results and "replica" in results and results["replica"]["write_p95_ms"] > results["primary"]["write_p95_ms"]:
+        failures.append("writes under analytics load were not faster with the replica")
+    for failure in failures:
+        print(failure, file=sys.stderr)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+"""Check that the analytics rollups match the live-join queries over a large generated dataset.
+
+Orders are folded in through the same incremental path ``create_order`` uses
+(``rollup_statements``), verified, then the tables are rebuilt from scratch and verified again.
+Between the two, the sub-cent case: ``to_cents`` must round like SQL ``round(x * 100)`` for
+every amount in a sweep of half-cent values, ``POST /checkout/`` must reject sub-cent amounts
+(0.125, 10.005) with 422, and accepted amounts whose float * 100 is not a whole number (1.15,
+0.29, ...) must leave rollups and live joins in agreement.
+
+    python -m benchmarks.rollup_consistency --orders 200000
+"""
+import argparse
+import asyncio
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+from benchmarks.common import use_temp_database
+
+
+def generate(connection, args):
+    from App.models import (
+        Customers, Payments, Orders, Restaurants,
+        PaymentStatus, PaymentType, OrderFoodItem, RestaurantAreaName,
+    )
+    from App.rollups import OrderDelta, rollup_statements, to_cents
+
+    rng = random.Random(args.seed)
+    connection.execute(Customers.__table__.insert(), [
+        {"google_id": f"gid_{i}", "name": f"Customer {i}"} for i in range(1, args.customers + 1)
+    ])
+    connection.execute(Restaurants.__table__.insert(), [
+        {"name": f"Restaurant {i}", "area": rng.choice(list(RestaurantAreaName))} for i in range(1, args.restaurants + 1)
+    ])
+    now = datetime.utcnow()
+    items = list(OrderFoodItem)
+    payments, orders, deltas = [], [], []
+    for transaction_id in range(1, args.orders + 1):
+        created_at = now - timedelta(seconds=rng.randint(0, args.days * 86400))
+        status = PaymentStatus.PASS if rng.random() < 0.9 else PaymentStatus.FAIL
+        amount = round(rng.uniform(50, 1500), 2)
+        customer_id = rng.randint(1, args.customers)
+        restaurant_id = rng.randint(1, args.restaurants)
+        item = rng.choice(items)
+        payments.append({
+            "transaction_id": transaction_id, "status": status, "payment_type": rng.choice(list(PaymentType)),
+            "amount": amount, "currency": "INR", "created_at": created_at, "customer_id": customer_id,
+        })
+        orders.append({
+            "item_name": item, "transaction_id": transaction_id, "restaurant_id": restaurant_id,
+            "created_at": created_at, "customer_id": customer_id,
+        })
+        paid = status == PaymentStatus.PASS
+        deltas.append(OrderDelta(created_at.date(), restaurant_id, item, customer_id, paid, to_cents(amount) if paid else 0))
+    connection.execute(Payments.__table__.insert(), payments)
+    connection.execute(Orders.__table__.insert(), orders)
+    for statement, params in rollup_statements(connection.dialect.name, deltas):
+        connection.execute(statement, params)
+
+
+async def check(label: str) -> bool:
+    from App.database import make_async_session
+    from App.rollups import verify
+
+    started = time.perf_counter()
+    async with make_async_session() as session:
+        problems = await verify(session)
+    print(f"{label}: {'ok' if not problems else 'MISMATCH'} ({time.perf_counter() - started:.2f}s)")
+    for problem in problems:
+        print(f"  {problem}")
+    return not problems
+
+
+def rounding_agrees(connection) -> bool:
+    from sqlalchemy import Float, Integer, bindparam, cast, func, select
+    from App.rollups import to_cents
+
+    # Every thousandth from -20.000 to 20.000: half of them sit on a half cent.
+    amounts = [k / 1000 for k in range(-20000, 20001)]
+    stmt = select(cast(func.round(bindparam("amount", type_=Float) * 100), Integer))
+    wrong = [a for a in amounts if connection.scalar(stmt, {"amount": a}) != to_cents(a)]
+    print(f"to_cents vs SQL round over {len(amounts)} amounts: {'ok' if not wrong else f'{len(wrong)} differ, e.g. {wrong[:5]}'}")
+    return not wrong
+
+
+async def sub_cent() -> bool:
+    import httpx
+    from sqlmodel import Session
+    from App.database import engine
+    from App.main import app
+    from App.models import Customers, Restaurants, RestaurantAreaName
+    from benchmarks.common import mint_token
+
+    with Session(engine, expire_on_commit=False) as session:
+        user = Customers(google_id="bench-cents", name="Bench Cents")
+        restaurant = Restaurants(name="Half Cent Kitchen", area=RestaurantAreaName.BANGALORE)
+        session.add_all([user, restaurant])
+        session.commit()
+    headers = {"Authorization": f"Bearer {mint_token(user)}"}
+    ok = True
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        async def checkout(amount: float) -> int:
+            response = await client.post("/checkout/", headers=headers, json={
+                "status": "pass", "payment_type": "card", "amount": amount,
+                "item_name": "Veg Fried Rice", "restaurant_id": restaurant.restaurant_id,
+            })
+            return response.status_code
+
+        rejected = [await checkout(amount) for amount in (0.125, 0.125, 0.125, 10.005)]
+        accepted = [await checkout(amount) for amount in (1.15, 0.29, 4.35, 8.7, 10.01, 0.57, 1005.99)]
+        print(f"sub-cent checkouts: {rejected}, whole-cent checkouts: {accepted}")
+        ok = set(rejected) == {422} and set(accepted) == {200}
+    return await check("sub-cent amounts") and ok
+
+
+async def run(args) -> bool:
+    from App.database import engine, init_db, dispose_engines
+    from App.rollups import rebuild
+
+    init_db()
+    started = time.perf_counter()
+    with engine.begin() as connection:
+        generate(connection, args)
+    print(f"generated {args.orders} orders in {time.perf_counter() - started:.2f}s")
+
+    ok = await check("incremental")
+    with engine.connect() as connection:
+        ok = rounding_agrees(connection) and ok
+    ok = await sub_cent() and ok
+    with engine.begin() as connection:
+        rebuild(connection)
+    ok = await check("rebuilt") and ok
+    await dispose_engines()
+    return ok
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--orders", type=int, default=100000)
+    parser.add_argument("--customers", type=int, default=2000)
+    parser.add_argument("--restaurants", type=int, default=40)
+    parser.add_argument("--days", type=int, default=120)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+    use_temp_database("rollups")
+    sys.exit(0 if asyncio.run(run(args)) else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,245 @@
+"""Route benchmark suite: every endpoint in ``App.main`` driven in-process over a generated dataset.
+
+Loads ``benchmarks.datagen`` data into a throwaway SQLite file, mints a JWT for the heaviest
+customer (so the per-customer lists are at their largest), then runs each route scenario in
+turn through ``httpx.ASGITransport`` and reports throughput and p50/p95/p99 latency.
+``/auth/callback`` needs Google and is covered by ``benchmarks.oauth_callback`` instead.
+
+Results can be saved as a baseline and later runs compared against it; the exit status is 1
+when any route regressed beyond ``--tolerance``. Baselines are machine specific: record one on
+the machine that runs the comparison.
+
+    python -m benchmarks.routes --orders 200000 --save-baseline
+    python -m benchmarks.routes --orders 200000 --compare
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import sys
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Callable, Optional
+
+from benchmarks.common import use_temp_database, mint_token, drive_requests, summarize, print_table
+
+
+BASELINE = os.path.join(os.path.dirname(__file__), "baselines", "routes.json")
+BULK_SIZE = 100
+
+
+@dataclass
+class Scenario:
+    name: str
+    make_request: Callable[[int], tuple]
+    requests: Optional[int] = None  # defaults to --requests
+
+
+def build_scenarios(ctx: dict, requests: int) -> list:
+    headers = ctx["headers"]
+    spare = iter(ctx["spare_transactions"])
+    scratch = list(ctx["scratch_restaurants"])
+    checkout = {"status": "pass", "payment_type": "UPI", "amount": 320.0, "item_name": "Veg Fried Rice", "restaurant_id": ctx["restaurant_id"]}
+    payment = {"status": "pass", "payment_type": "card", "amount": 199.0}
+    bulk_requests = max(1, requests // 10)
+    restaurant_id, transaction_id, order_id = (_cycle(ctx["restaurant_ids"]), _cycle(ctx["transaction_ids"]), _cycle(ctx["order_ids"]))
+
+    def get(url):
+        return lambda i: ("GET", url(i) if callable(url) else url, {"headers": headers})
+
+    def order(i):
+        return {"item_name": "Chicken Fried Rice", "transaction_id": next(spare), "restaurant_id": ctx["restaurant_id"]}
+
+    scenarios = [
+        Scenario("GET /", lambda i: ("GET", "/", {})),
+        Scenario("GET /health", lambda i: ("GET", "/health", {})),
+        Scenario("GET /auth/login", lambda i: ("GET", "/auth/login", {})),
+        Scenario("GET /auth/me", lambda i: ("GET", "/auth/me", {"params": {"token": ctx["token"]}})),
+        Scenario("GET /restaurants/", get("/restaurants/?limit=100")),
+        Scenario("GET /restaurants/{id}", get(lambda i: f"/restaurants/{restaurant_id(i)}")),
+        Scenario("GET /payments/", get("/payments/?limit=100")),
+        Scenario("GET /payments/{id}", get(lambda i: f"/payments/{transaction_id(i)}")),
+        Scenario("GET /orders/", get("/orders/?limit=100")),
+        Scenario("GET /orders/?order_by=created_at", get("/orders/?limit=100&order_by=created_at")),
+        Scenario("GET /orders/?format=ndjson", get("/orders/?format=ndjson"), bulk_requests),
+        Scenario("GET /orders/{id}", get(lambda i: f"/orders/{order_id(i)}")),
+        Scenario("GET /analytics/earnings/mumbai-last-month", get("/analytics/earnings/mumbai-last-month")),
+        Scenario("GET /analytics/earnings/veg-bangalore", get("/analytics/earnings/veg-bangalore")),
+        Scenario("GET /analytics/top-customers", get("/analytics/top-customers")),
+        Scenario("GET /analytics/daily-revenue", get("/analytics/daily-revenue")),
+        Scenario("GET /analytics/restaurant/{id}/items-summary", get(lambda i: f"/analytics/restaurant/{restaurant_id(i)}/items-summary")),
+        Scenario("GET /analytics/export?format=csv", get(f"/analytics/export?format=csv&since={ctx['export_since']}"), bulk_requests),
+        Scenario("GET /analytics/cache-stats", get("/analytics/cache-stats")),
+        Scenario("POST /restaurants/", lambda i: ("POST", "/restaurants/", {"headers": headers, "json": {"name": f"Bench {i}", "area": "Mumbai"}})),
+        Scenario("PATCH /restaurants/{id}", lambda i: ("PATCH", f"/restaurants/{scratch[i]}", {"headers": headers, "json": {"name": f"Renamed {i}"}})),
+        Scenario("POST /payments/", lambda i: ("POST", "/payments/", {"headers": headers, "json": payment})),
+        Scenario("POST /payments/bulk", lambda i: ("POST", "/payments/bulk", {"headers": headers, "json": [payment] * BULK_SIZE}), bulk_requests),
+        Scenario("POST /orders/", lambda i: ("POST", "/orders/", {"headers": headers, "json": order(i)})),
+        Scenario("POST /orders/bulk", lambda i: ("POST", "/orders/bulk", {"headers": headers, "json": [order(i) for _ in range(BULK_SIZE)]}), bulk_requests),
+        Scenario("POST /checkout/", lambda i: ("POST", "/checkout/", {"headers": {**headers, "Idempotency-Key": f"bench-{i}"}, "json": checkout})),
+        Scenario("DELETE /restaurants/{id}", lambda i: ("DELETE", f"/restaurants/{scratch[i]}", {"headers": headers})),
+    ]
+    return scenarios
+
+
+def _cycle(values):
+    return lambda i: values[i % len(values)]
+
+
+def prepare(args) -> dict:
+    from sqlalchemy import func, select
+    from sqlmodel import Session
+    from App.database import engine, init_db
+    from App.models import (
+        Customers, CustomerOrderRollup, Orders, Payments, Restaurants,
+        PaymentStatus, PaymentType, RestaurantAreaName,
+    )
+    from App.catalog import version_bump
+    from App.export import encode_watermark
+    from benchmarks.datagen import generate
+
+    init_db()
+    started = time.perf_counter()
+    with engine.begin() as connection:
+        counts = generate(connection, orders=args.orders, customers=args.customers, seed=args.seed)
+    print(f"generated {counts} in {time.perf_counter() - started:.1f}s", file=sys.stderr)
+
+    spare_needed = args.requests + max(1, args.requests // 10) * BULK_SIZE
+    with Session(engine) as session:
+        user_id = session.scalar(
+            select(CustomerOrderRollup.customer_id).order_by(CustomerOrderRollup.orders_count.desc()).limit(1)
+        )
+        token = mint_token(session.get(Customers, user_id))
+        restaurant_ids = list(session.scalars(select(Restaurants.restaurant_id)))
+        transaction_ids = list(session.scalars(select(Payments.transaction_id).where(Payments.customer_id == user_id).limit(1000)))
+        order_ids = list(session.scalars(select(Orders.order_id).where(Orders.customer_id == user_id).limit(1000)))
+        # Payments for POST /orders/ to attach to, and restaurants for PATCH/DELETE to consume.
+        first_spare = session.scalar(select(func.max(Payments.transaction_id))) + 1
+        session.execute(Payments.__table__.insert(), [
+            {"status": PaymentStatus.PASS, "payment_type": PaymentType.UPI, "amount": 150.0, "currency": "INR", "customer_id": user_id}
+            for _ in range(spare_needed)
+        ])
+        first_scratch = session.scalar(select(func.max(Restaurants.restaurant_id))) + 1
+        session.execute(Restaurants.__table__.insert(), [
+            {"name": f"Scratch {i}", "area": RestaurantAreaName.BANGALORE} for i in range(args.requests)
+        ])
+        session.execute(version_bump())
+        session.commit()
+    return {
+        "token": token,
+        "headers": {"Authorization": f"Bearer {token}"},
+        "restaurant_id": restaurant_ids[0],
+        "restaurant_ids": restaurant_ids,
+        "transaction_ids": transaction_ids,
+        "order_ids": order_ids,
+        "spare_transactions": range(first_spare, first_spare + spare_needed),
+        "scratch_restaurants": range(first_scratch, first_scratch + args.requests),
+        # Incremental export of the last day's orders.
+        "export_since": encode_watermark((datetime.utcnow() - timedelta(days=1), 0)),
+    }
+
+
+async def run(args) -> list:
+    import httpx
+    from App.main import app
+    from App.cache import _NullBackend, response_cache
+    from App.database import dispose_engines
+
+    ctx = prepare(args)
+    if args.no_cache:
+        response_cache.backend = _NullBackend()
+    rows = []
+    transport = httpx.ASGITransport(app=app)
+    try:
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+            for scenario in build_scenarios(ctx, args.requests):
+                if args.only and not any(part in scenario.name for part in args.only):
+                    continue
+                total = scenario.requests or args.requests
+                concurrency = min(args.concurrency, total)
+                latencies, elapsed = await drive_requests(client, scenario.make_request, total=total, concurrency=concurrency)
+                rows.append(summarize(scenario.name, latencies, elapsed))
+    finally:
+        await dispose_engines()
+    return rows
+
+
+# --- Baselines ---
+
+def _meta(args) -> dict:
+    return {
+        "orders": args.orders,
+        "customers": args.customers,
+        "requests": args.requests,
+        "concurrency": args.concurrency,
+        "no_cache": args.no_cache,
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+    }
+
+
+def save_baseline(path: str, args, rows: list) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        json.dump({"meta": _meta(args), "results": {row["name"]: row for row in rows}}, f, indent=2, sort_keys=True)
+        f.write("\n")
+    print(f"baseline written to {path}", file=sys.stderr)
+
+
+def compare(path: str, args, rows: list) -> list:
+    """Annotate ``rows`` with deltas against the baseline; return the names that regressed.
+
+    A route regresses when its p95 grows by more than ``tolerance`` and by at least
+    ``--noise-ms``, so jitter on trivial routes doesn't trip it. Throughput is reported but not
+    judged: with a few hundred requests per route it is too noisy to gate on.
+    """
+    with open(path) as f:
+        baseline = json.load(f)
+    mismatched = {k: (v, baseline["meta"].get(k)) for k, v in _meta(args).items() if baseline["meta"].get(k) != v}
+    if mismatched:
+        print(f"warning: baseline recorded with different settings: {mismatched}", file=sys.stderr)
+    regressed = []
+    for row in rows:
+        before = baseline["results"].get(row["name"])
+        if before is None:
+            row["vs_baseline"] = "new"
+            continue
+        p95_delta = row["p95_ms"] - before["p95_ms"]
+        row["vs_baseline"] = f"p95 {p95_delta:+.2f}ms, rps {row['rps'] - before['rps']:+.1f}"
+        if p95_delta > max(args.noise_ms, before["p95_ms"] * args.tolerance):
+            row["vs_baseline"] += " REGRESSED"
+            regressed.append(row["name"])
+    return regressed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--orders", type=int, default=100000)
+    parser.add_argument("--customers", type=int, default=10000)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--requests", type=int, default=200, help="requests per scenario (bulk/stream: a tenth)")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--no-cache", action="store_true", help="bypass the analytics response cache")
+    parser.add_argument("--only", nargs="*", help="run scenarios whose name contains any of these")
+    parser.add_argument("--baseline", default=BASELINE)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--compare", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed fractional p95 slowdown")
+    parser.add_argument("--noise-ms", type=float, default=1.0)
+    args = parser.parse_args()
+
+    use_temp_database("routes")
+    rows = asyncio.run(run(args))
+    regressed = compare(args.baseline, args, rows) if args.compare else []
+    print_table(rows)
+    if args.save_baseline:
+        save_baseline(args.baseline, args, rows)
+    if regressed:
+        print(f"{len(regressed)} route(s) regressed: {', '.join(regressed)}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
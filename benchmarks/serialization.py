@@ -0,0 +1,146 @@
+"""CPU per large list response: default response_model path vs ``FAST_JSON``.
+
+Seeds one customer with ``--rows`` payments and orders (plus extra restaurants), raises
+``PAGE_MAX_LIMIT`` so a single page holds every row, then requests each list endpoint
+``--requests`` times per mode in-process and reports process CPU time per response. The two
+modes must return the same JSON and the same ``X-Next-Cursor``, or the run exits 1.
+``--no-orjson`` measures the pydantic-core fallback used when orjson isn't installed.
+
+    python -m benchmarks.serialization --rows 10000 --requests 20
+"""
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import statistics
+import sys
+import time
+
+from benchmarks.common import use_temp_database, mint_token, print_table
+
+
+def seed(rows: int, restaurants: int):
+    from sqlalchemy import insert
+    from sqlmodel import Session
+    from App.catalog import version_bump
+    from App.database import engine, init_db
+    from App.models import Customers, Orders, Payments, Restaurants, OrderFoodItem, PaymentStatus, PaymentType, RestaurantAreaName
+
+    init_db()
+    with Session(engine) as session:
+        user = Customers(google_id="serialization-user", name="Serialization User")
+        session.add(user)
+        session.commit()
+        session.refresh(user)
+    areas, items = list(RestaurantAreaName), list(OrderFoodItem)
+    start = datetime.datetime(2024, 1, 1)
+    with engine.begin() as connection:
+        connection.execute(insert(Restaurants), [
+            {"name": f"Restaurant {i}", "area": areas[i % len(areas)]} for i in range(restaurants)
+        ])
+        connection.execute(version_bump())
+        connection.execute(insert(Payments), [
+            {
+                "transaction_id": i + 1,
+                "status": PaymentStatus.PASS,
+                "payment_type": PaymentType.UPI if i % 2 else PaymentType.CARD,
+                "amount": 100 + (i % 997) / 4,
+                "currency": "INR",
+                "created_at": start + datetime.timedelta(minutes=7 * i, microseconds=i % 1000),
+                "customer_id": user.id,
+            }
+            for i in range(rows)
+        ])
+        connection.execute(insert(Orders), [
+            {
+                "item_name": items[i % len(items)],
+                "transaction_id": i + 1,
+                "restaurant_id": 1 + i % restaurants,
+                "created_at": start + datetime.timedelta(minutes=7 * i, microseconds=i % 1000),
+                "customer_id": user.id,
+            }
+            for i in range(rows)
+        ])
+    return user
+
+
+async def run(args) -> int:
+    import httpx
+    from App.main import app
+    from App.catalog import load_catalog
+    from App.database import dispose_engines
+    from App.settings import settings
+    from App import serialization
+
+    user = seed(args.rows, args.restaurants)
+    if args.no_orjson:
+        serialization._orjson = False
+    await load_catalog()
+    headers = {"Authorization": f"Bearer {mint_token(user)}"}
+    routes = [
+        f"/orders/?limit={args.rows}",
+        f"/payments/?limit={args.rows}",
+        f"/orders/?limit={args.rows // 2}&order_by=created_at",
+        "/orders/?format=ndjson",
+        "/payments/?format=ndjson",
+        f"/restaurants/?limit={args.restaurants}",
+    ]
+    rows, failures = [], []
+    transport = httpx.ASGITransport(app=app)
+    try:
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+            for url in routes:
+                bodies = {}
+                for mode in ("default", "fast"):
+                    settings.FAST_JSON = mode == "fast"
+                    for _ in range(2):  # warm up
+                        response = await client.get(url, headers=headers)
+                        response.raise_for_status()
+                    cpu, wall = [], []
+                    for _ in range(args.requests):
+                        started_cpu, started = time.process_time(), time.perf_counter()
+                        response = await client.get(url, headers=headers)
+                        cpu.append(time.process_time() - started_cpu)
+                        wall.append(time.perf_counter() - started)
+                    if "ndjson" in url:
+                        parsed = [json.loads(line) for line in response.text.splitlines()]
+                    else:
+                        parsed = response.json()
+                    bodies[mode] = (parsed, response.headers.get("x-next-cursor"))
+                    rows.append({
+                        "route": url,
+                        "mode": mode,
+                        "items": len(parsed),
+                        "kb": round(len(response.content) / 1024),
+                        "cpu_ms": round(statistics.fmean(cpu) * 1000, 1),
+                        "wall_p50_ms": round(statistics.median(wall) * 1000, 1),
+                    })
+                if bodies["default"] != bodies["fast"]:
+                    failures.append(f"{url}: FAST_JSON response differs from the default path")
+                rows[-1]["speedup"] = round(rows[-2]["cpu_ms"] / rows[-1]["cpu_ms"], 2) if rows[-1]["cpu_ms"] else 0.0
+                rows[-2]["speedup"] = 1.0
+    finally:
+        await dispose_engines()
+    print(f"json backend for FAST_JSON: {'orjson' if serialization.orjson_module() else 'pydantic-core'}")
+    print_table(rows)
+    for failure in failures:
+        print(failure, file=sys.stderr)
+    return 1 if failures else 0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=10000, help="orders (and payments) for the benchmark customer")
+    parser.add_argument("--restaurants", type=int, default=1000)
+    parser.add_argument("--requests", type=int, default=20, help="measured requests per route and mode")
+    parser.add_argument("--no-orjson", action="store_true", help="use the pydantic-core fallback")
+    args = parser.parse_args()
+
+    use_temp_database("serialization")
+    os.environ["PAGE_MAX_LIMIT"] = str(max(args.rows, args.restaurants))
+    sys.exit(asyncio.run(run(args)))
+
+
+if __name__ == "__main__":
+    main()
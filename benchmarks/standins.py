@@ -0,0 +1,127 @@
+"""Local stand-ins for external services, so the shared/remote code paths can be exercised
+without running the real thing."""
+import math
+import sqlite3
+import threading
+import time
+from typing import Callable, Dict, Optional, Tuple
+
+
+class LocalRedis:
+    """Tiny in-process subset of the ``redis.asyncio`` client API (get/set(ex=)/incr/delete,
+    ``register_script`` for the scripts in ``_script_ports``).
+
+    One instance can back several app "workers" in one process to exercise shared state.
+    """
+
+    def __init__(self) -> None:
+        self._data: Dict[str, Tuple[bytes, Optional[float]]] = {}
+        self.calls = 0
+
+    def _live(self, key: str):
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at is not None and expires_at <= time.monotonic():
+            del self._data[key]
+            return None
+        return value
+
+    async def get(self, key: str):
+        self.calls += 1
+        return self._live(key)
+
+    async def set(self, key: str, value, ex: Optional[int] = None, **kwargs):
+        self.calls += 1
+        raw = value if isinstance(value, bytes) else str(value).encode()
+        self._data[key] = (raw, time.monotonic() + ex if ex else None)
+        return True
+
+    async def incr(self, key: str, amount: int = 1) -> int:
+        self.calls += 1
+        current = int(self._live(key) or 0) + amount
+        expires_at = self._data.get(key, (None, None))[1]
+        self._data[key] = (str(current).encode(), expires_at)
+        return current
+
+    async def delete(self, *keys: str) -> int:
+        self.calls += 1
+        return sum(self._data.pop(key, None) is not None for key in keys)
+
+    def register_script(self, source: str):
+        """Run a known Lua script as its Python port; atomic, as nothing else runs in between."""
+        port = _script_ports()[source]
+
+        async def script(keys=(), args=()):
+            self.calls += 1
+            return port(self, list(keys), list(args))
+        return script
+
+
+def _gcra_port(redis: LocalRedis, keys, args):
+    """App.ratelimit.GCRA_SCRIPT; the wall clock stands in for Redis ``TIME``."""
+    interval, burst = float(args[0]), int(args[1])
+    now = time.time() * 1000
+    raw = redis._live(keys[0])
+    tat = max(float(raw) if raw is not None else now, now)
+    new_tat = tat + interval
+    allow_at = new_tat - burst * interval
+    if allow_at > now:
+        return [0, math.ceil(allow_at - now)]
+    redis._data[keys[0]] = (repr(new_tat).encode(), time.monotonic() + (new_tat - now) / 1000)
+    return [1, 0]
+
+
+def _script_ports() -> Dict[str, Callable]:
+    from App.ratelimit import GCRA_SCRIPT
+
+    return {GCRA_SCRIPT: _gcra_port}
+
+
+class SQLiteReplicator:
+    """Keeps a replica SQLite file in sync with the primary by copying it every ``interval``.
+
+    Stands in for streaming replication: the replica lags the primary by up to ``interval``
+    plus the copy time, which is exactly what read-your-writes has to cope with. Each copy is
+    one ``sqlite3`` online backup; the primary is switched to WAL so the copy's read
+    transaction doesn't hold up its writers.
+    """
+
+    def __init__(self, primary_path: str, replica_path: str, interval: float = 0.5) -> None:
+        self.primary_path = primary_path
+        self.replica_path = replica_path
+        self.interval = interval
+        self.copies = 0
+        self.copy_seconds = 0.0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def copy(self) -> None:
+        started = time.perf_counter()
+        source = sqlite3.connect(self.primary_path)
+        target = sqlite3.connect(self.replica_path, timeout=30)
+        try:
+            source.backup(target)
+        finally:
+            target.close()
+            source.close()
+        self.copies += 1
+        self.copy_seconds += time.perf_counter() - started
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self.copy()
+
+    def start(self) -> "SQLiteReplicator":
+        with sqlite3.connect(self.primary_path) as connection:
+            connection.execute("PRAGMA journal_mode=WAL")
+        self.copy()
+        self._thread = threading.Thread(target=self._run, name="sqlite-replicator", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
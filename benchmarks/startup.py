@@ -0,0 +1,144 @@
+"""Cold-start profile: what ``import App.main`` loads, and time-to-first-request of a worker.
+
+1. Import profile: runs ``python -X importtime -c "import App.main"`` and reports the total
+   plus the heaviest top-level packages by self time. Modules in ``LAZY_MODULES`` (the OAuth
+   client stack, optional extras, the PostgreSQL dialect) must not be imported at startup.
+2. Time to first request: starts ``python -m App.server`` (one uvicorn worker, as a container
+   runs it) and measures from process spawn until ``GET /health`` answers, then the first
+   authenticated request, which pays for the lazily imported JWT stack. Two configurations:
+   ``dev`` (dotenv discovery + create_all/migrations in the lifespan) and ``prod``
+   (``ENV_FILE=none``, ``DB_INIT_ON_STARTUP=false``).
+
+Exits 1 if a lazy module is imported by ``App.main`` or the median prod time-to-first-request
+exceeds ``--budget-ms``, so CI can hold the line:
+
+    python -m benchmarks.startup --runs 5 --budget-ms 2500
+"""
+import argparse
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from collections import defaultdict
+
+from benchmarks.common import use_temp_database, mint_token, print_table
+
+
+LAZY_MODULES = ("httpx", "jose", "cryptography", "numpy", "pyarrow", "redis", "sqlalchemy.dialects.postgresql")
+CONFIGS = {
+    "dev": {"DB_INIT_ON_STARTUP": "true"},
+    "prod": {"ENV_FILE": "none", "DB_INIT_ON_STARTUP": "false"},
+}
+
+
+def import_profile(env: dict) -> tuple:
+    """(total ms, {top-level package: self ms}, set of imported module names)."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import App.main"],
+        env=env, capture_output=True, text=True, check=True,
+    )
+    packages, modules, total = defaultdict(float), set(), 0.0
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = (part.strip() for part in line[len("import time:"):].split("|"))
+        modules.add(name)
+        packages[name.split(".")[0]] += int(self_us) / 1000
+        if name == "App.main":
+            total = int(cumulative_us) / 1000
+    return total, dict(packages), modules
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def time_to_first_request(env: dict, token: str) -> tuple:
+    """(ms until /health answers, ms until the first authenticated request answers)."""
+    import httpx
+
+    port = _free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    argv = [sys.executable, "-m", "App.server", "--server", "uvicorn", "--workers", "1", "--port", str(port)]
+    if env.get("DB_INIT_ON_STARTUP") == "false":
+        argv.append("--no-init-db")
+    started = time.perf_counter()
+    process = subprocess.Popen(argv, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        with httpx.Client(base_url=base_url, timeout=1.0) as client:
+            while True:
+                if process.poll() is not None:
+                    raise RuntimeError(f"server exited with status {process.returncode}")
+                try:
+                    if client.get("/health").status_code == 200:
+                        break
+                except httpx.TransportError:
+                    time.sleep(0.005)
+            health_ms = (time.perf_counter() - started) * 1000
+            response = client.get("/restaurants/1", headers={"Authorization": f"Bearer {token}"})
+            response.raise_for_status()
+            first_auth_ms = (time.perf_counter() - started) * 1000
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+    return health_ms, first_auth_ms
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--orders", type=int, default=10000)
+    parser.add_argument("--top", type=int, default=10, help="packages to list in the import profile")
+    parser.add_argument("--budget-ms", type=float, default=2500.0, help="max median prod time to first request")
+    args = parser.parse_args()
+
+    use_temp_database("startup")
+    from sqlmodel import Session
+    from App.database import engine, init_db
+    from App.models import Customers
+    from benchmarks.datagen import generate
+
+    init_db()
+    with engine.begin() as connection:
+        generate(connection, orders=args.orders, customers=100)
+    with Session(engine) as session:
+        token = mint_token(session.get(Customers, 1))
+    engine.dispose()
+
+    failures = []
+    total, packages, modules = import_profile(dict(os.environ, **CONFIGS["prod"]))
+    print(f"import App.main: {total:.0f} ms")
+    heaviest = sorted(packages.items(), key=lambda item: item[1], reverse=True)[:args.top]
+    print_table([{"package": name, "self_ms": round(ms, 1)} for name, ms in heaviest])
+    eager = [name for name in LAZY_MODULES if name in modules]
+    if eager:
+        failures.append(f"imported at startup: {', '.join(eager)}")
+
+    rows = []
+    for name, overrides in CONFIGS.items():
+        env = dict(os.environ, **overrides)
+        samples = [time_to_first_request(env, token) for _ in range(args.runs)]
+        rows.append({
+            "config": name,
+            "runs": args.runs,
+            "health_ms": round(statistics.median(s[0] for s in samples)),
+            "health_max_ms": round(max(s[0] for s in samples)),
+            "first_auth_ms": round(statistics.median(s[1] for s in samples)),
+        })
+    print()
+    print_table(rows)
+
+    prod = next(row for row in rows if row["config"] == "prod")
+    if prod["health_ms"] > args.budget_ms:
+        failures.append(f"prod time to first request {prod['health_ms']} ms exceeds budget {args.budget_ms:.0f} ms")
+    for failure in failures:
+        print(failure, file=sys.stderr)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
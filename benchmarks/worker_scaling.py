@@ -0,0 +1,151 @@
+"""Throughput of ``python -m App.server`` as worker processes are added.
+
+Generates a dataset, then for each worker count starts the real server on a local port and
+drives it from several client processes (one asyncio httpx client each, so the load generator
+isn't capped by a single core) for a fixed duration. The request mix is
+``GET /restaurants/{id}`` (served from the in-memory catalog: pure Python/JSON work) and
+``GET /orders/{id}`` (auth + a primary-key read). Reports aggregate req/s and the speedup
+over the first worker count.
+
+Scaling is bounded by the cores shared between server workers and load generators; the table
+header prints ``os.cpu_count()`` so results can be read in that light.
+
+    python -m benchmarks.worker_scaling --workers 1,2,4 --duration 10
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import socket
+import subprocess
+import sys
+import time
+
+from benchmarks.common import use_temp_database, mint_token, percentile, print_table
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _wait_healthy(base_url: str, process: subprocess.Popen, timeout: float = 60.0) -> None:
+    import httpx
+
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"server exited with status {process.returncode}")
+        try:
+            if httpx.get(f"{base_url}/health", timeout=1.0).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError("server did not become healthy in time")
+
+
+def _client(base_url: str, token: str, restaurant_ids, order_ids, duration: float, concurrency: int):
+    """One load-generating process; returns its latencies and error count."""
+    import httpx
+
+    async def run():
+        latencies, errors = [], 0
+        headers = {"Authorization": f"Bearer {token}"}
+        deadline = time.perf_counter() + duration
+        limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+        async def worker(offset: int):
+            nonlocal errors
+            i = offset
+            while time.perf_counter() < deadline:
+                if i % 2:
+                    url = f"/restaurants/{restaurant_ids[i % len(restaurant_ids)]}"
+                else:
+                    url = f"/orders/{order_ids[i % len(order_ids)]}"
+                started = time.perf_counter()
+                response = await client.get(url, headers=headers)
+                latencies.append(time.perf_counter() - started)
+                if response.status_code != 200:
+                    errors += 1
+                i += concurrency
+
+        async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=30.0) as client:
+            await asyncio.gather(*(worker(i) for i in range(concurrency)))
+        return latencies, errors
+
+    return asyncio.run(run())
+
+
+def measure(args, workers: int, token: str, restaurant_ids, order_ids) -> dict:
+    port = _free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    argv = [
+        sys.executable, "-m", "App.server",
+        "--workers", str(workers), "--port", str(port), "--server", args.server, "--no-init-db",
+    ]
+    process = subprocess.Popen(argv, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        _wait_healthy(base_url, process)
+        job = (base_url, token, restaurant_ids, order_ids)
+        with multiprocessing.get_context("spawn").Pool(args.clients) as pool:
+            pool.starmap(_client, [job + (1.0, args.concurrency)] * args.clients)  # warm up every worker
+            started = time.perf_counter()
+            results = pool.starmap(_client, [job + (args.duration, args.concurrency)] * args.clients)
+            elapsed = time.perf_counter() - started
+    finally:
+        process.terminate()
+        process.wait(timeout=args.duration + 30)
+    latencies = [latency for part, _ in results for latency in part]
+    return {
+        "workers": workers,
+        "requests": len(latencies),
+        "errors": sum(errors for _, errors in results),
+        "rps": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", default="1,2,4", help="comma separated worker counts")
+    parser.add_argument("--orders", type=int, default=50000)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds of load per worker count")
+    parser.add_argument("--clients", type=int, default=max(2, (os.cpu_count() or 1) // 2), help="load generator processes")
+    parser.add_argument("--concurrency", type=int, default=16, help="in-flight requests per client process")
+    parser.add_argument("--server", choices=("auto", "gunicorn", "uvicorn"), default="auto")
+    args = parser.parse_args()
+
+    use_temp_database("workers")
+    from sqlalchemy import select
+    from sqlmodel import Session
+    from App.database import engine, init_db
+    from App.models import Customers, CustomerOrderRollup, Orders, Restaurants
+    from benchmarks.datagen import generate
+
+    init_db()
+    with engine.begin() as connection:
+        generate(connection, orders=args.orders, seed=args.seed)
+    with Session(engine) as session:
+        user_id = session.scalar(
+            select(CustomerOrderRollup.customer_id).order_by(CustomerOrderRollup.orders_count.desc()).limit(1)
+        )
+        token = mint_token(session.get(Customers, user_id))
+        order_ids = list(session.scalars(select(Orders.order_id).where(Orders.customer_id == user_id).limit(500)))
+        restaurant_ids = list(session.scalars(select(Restaurants.restaurant_id)))
+    engine.dispose()
+
+    rows = [measure(args, int(n), token, restaurant_ids, order_ids) for n in args.workers.split(",")]
+    for row in rows:
+        row["speedup"] = round(row["rps"] / rows[0]["rps"], 2) if rows[0]["rps"] else 0.0
+    print(f"cpu_count={os.cpu_count()} clients={args.clients}x{args.concurrency} server={args.server}")
+    print_table(rows)
+    if any(row["errors"] for row in rows):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
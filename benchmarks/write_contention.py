@@ -0,0 +1,126 @@
+"""Write-contention benchmark: commits/sec for concurrent checkouts with and without the
+SQLite performance profile.
+
+Each checkout is ``POST /payments/`` followed by ``POST /orders/`` (two commits). Then a
+burst of ``--burst`` simultaneous ``POST /checkout/`` (flush, then commit) is sent, more than
+the THREADPOOL_SIZE threads, which in sync mode must not leave requests starving for the
+single writer connection; every one of them has to succeed. Every configuration runs in its
+own interpreter because engines are built from settings at import.
+
+    python -m benchmarks.write_contention --checkouts 500 --concurrency 32 --burst 150
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+
+from benchmarks.common import use_temp_database, mint_token, print_table
+
+
+async def run_child(args) -> dict:
+    import anyio.to_thread
+    import httpx
+    from sqlmodel import Session
+    from App.main import app
+    from App.settings import settings
+    from App.database import engine, init_db, dispose_engines
+    from App.models import Customers, Restaurants, RestaurantAreaName
+
+    init_db()
+    with Session(engine) as session:
+        user = Customers(google_id="bench-writer", name="Bench Writer")
+        restaurant = Restaurants(name="Bench Bites", area=RestaurantAreaName.BANGALORE)
+        session.add_all([user, restaurant])
+        session.commit()
+        session.refresh(user)
+        restaurant_id = restaurant.restaurant_id
+    headers = {"Authorization": f"Bearer {mint_token(user)}"}
+
+    commits = failures = 0
+    remaining = iter(range(args.checkouts))
+
+    async def worker(client):
+        nonlocal commits, failures
+        for _ in remaining:
+            payment = await client.post(
+                "/payments/", json={"status": "pass", "payment_type": "card", "amount": 199.0}, headers=headers
+            )
+            if payment.status_code != 200:
+                failures += 1
+                continue
+            commits += 1
+            order = await client.post(
+                "/orders/",
+                json={
+                    "item_name": "Veg Manchurian",
+                    "transaction_id": payment.json()["transaction_id"],
+                    "restaurant_id": restaurant_id,
+                },
+                headers=headers,
+            )
+            if order.status_code == 200:
+                commits += 1
+            else:
+                failures += 1
+
+    async def checkout(client, i: int) -> int:
+        response = await client.post("/checkout/", headers=headers, json={
+            "status": "pass", "payment_type": "card", "amount": 120.0 + i,
+            "item_name": "Veg Fried Rice", "restaurant_id": restaurant_id,
+        })
+        return response.status_code
+
+    # As in the app's lifespan, which ASGITransport does not run.
+    anyio.to_thread.current_default_thread_limiter().total_tokens = settings.THREADPOOL_SIZE
+    transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(client) for _ in range(args.concurrency)))
+        elapsed = time.perf_counter() - started
+        burst_started = time.perf_counter()
+        statuses = await asyncio.gather(*(checkout(client, i) for i in range(args.burst)))
+        burst_elapsed = time.perf_counter() - burst_started
+    await dispose_engines()
+    return {
+        "commits": commits, "failures": failures, "seconds": round(elapsed, 2),
+        "commits_per_sec": round(commits / elapsed, 1),
+        "burst_ok": f"{statuses.count(200)}/{args.burst}", "burst_seconds": round(burst_elapsed, 2),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--checkouts", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--burst", type=int, default=150, help="simultaneous POST /checkout/ after the run")
+    parser.add_argument("--modes", default="sync,async")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        use_temp_database("write-contention")
+        print(json.dumps(asyncio.run(run_child(args))))
+        return
+
+    rows, failed = [], False
+    for mode in args.modes.split(","):
+        for profile in ("0", "1"):
+            env = dict(os.environ, DB_MODE=mode, SQLITE_PERFORMANCE_PROFILE=profile)
+            result = subprocess.run(
+                [sys.executable, "-m", "benchmarks.write_contention", "--child",
+                 "--checkouts", str(args.checkouts), "--concurrency", str(args.concurrency), "--burst", str(args.burst)],
+                env=env, capture_output=True, text=True, check=True,
+            )
+            stats = json.loads(result.stdout.strip().splitlines()[-1])
+            rows.append({"mode": mode, "sqlite_profile": profile == "1", **stats})
+            # Without the profile, SQLite's file lock makes some writes fail either way.
+            failed |= profile == "1" and (stats["failures"] or stats["burst_ok"] != f"{args.burst}/{args.burst}")
+    print_table(rows)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""Quick correctness checks against a throwaway SQLite database.
+
+Engines are built from settings when ``App`` is imported, so the environment is set here,
+before any test module imports it. Every test shares the one database: create your own
+customers/rows instead of assuming an empty table.
+
+    python -m pytest -q
+"""
+import os
+import tempfile
+
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='tests-'), 'database.db')}"
+os.environ.pop("ASYNC_DATABASE_URL", None)
+os.environ.pop("REPLICA_DATABASE_URL", None)
+os.environ["CACHE_BACKEND"] = "none"
+os.environ["JOB_QUEUE_ENABLED"] = "false"  # rollups inline, so they are current when a test reads them
+os.environ["RATE_LIMIT_ENABLED"] = "false"
+
+import pytest  # noqa: E402
+
+
+@pytest.fixture(scope="session", autouse=True)
+def database():
+    from App.database import engine, init_db
+
+    init_db()
+    yield engine
+
+
+@pytest.fixture
+def customer(database):
+    """A fresh customer and a bearer token for it."""
+    import uuid
+    from sqlmodel import Session
+    from App.models import Customers
+    from benchmarks.common import mint_token
+
+    with Session(database, expire_on_commit=False) as session:
+        user = Customers(google_id=f"test-{uuid.uuid4().hex}", name="Test Customer")
+        session.add(user)
+        session.commit()
+    return user, {"Authorization": f"Bearer {mint_token(user)}"}
+
+
+@pytest.fixture
+def restaurant(database):
+    from sqlmodel import Session
+    from App.models import RestaurantAreaName, Restaurants
+
+    with Session(database, expire_on_commit=False) as session:
+        row = Restaurants(name="Test Kitchen", area=RestaurantAreaName.BANGALORE)
+        session.add(row)
+        session.commit()
+    return row
+
+
+@pytest.fixture
+def run():
+    """``run(coroutine)`` on a fresh event loop; async engines are disposed afterwards, since
+    their pooled connections belong to the loop that opened them."""
+    import asyncio
+    from App.database import dispose_engines
+
+    def runner(coroutine):
+        async def main():
+            try:
+                return await coroutine
+            finally:
+                await dispose_engines()
+        return asyncio.run(main())
+    return runner
@@ -0,0 +1,35 @@
+import datetime
+
+from sqlmodel import Session
+
+from App.database import make_async_session
+from App.export import current_watermark, export_statement
+from App.settings import settings
+from tests.test_partitions import place
+
+
+async def exported(since, upto) -> set:
+    async with make_async_session() as session:
+        return {row.order_id for row in (await session.execute(export_statement(since, upto))).all()}
+
+
+async def watermark(now):
+    async with make_async_session() as session:
+        return await current_watermark(session, now)
+
+
+def test_late_commit_below_the_newest_row_is_not_skipped(database, customer, restaurant, run):
+    user, _ = customer
+    now = datetime.datetime.utcnow()
+    settle = datetime.timedelta(seconds=settings.EXPORT_SETTLE_SECONDS)
+    with Session(database, expire_on_commit=False) as session:
+        settled = place(session, user.id, restaurant.restaurant_id, now - 2 * settle)
+        newest = place(session, user.id, restaurant.restaurant_id, now)
+    first = run(watermark(now))
+    assert first == (settled.created_at, settled.order_id)
+    assert newest.order_id not in run(exported(None, first))
+    # A slower transaction commits an order stamped before ``newest``, after the first export.
+    with Session(database, expire_on_commit=False) as session:
+        late = place(session, user.id, restaurant.restaurant_id, now - settle / 2)
+    second = run(watermark(now + 2 * settle))
+    assert {newest.order_id, late.order_id} <= run(exported(first, second))
@@ -0,0 +1,39 @@
+import datetime
+
+from sqlalchemy import func, select
+from sqlmodel import Session
+
+from App.models import ArchivedMonths, OrderFoodItem, Orders, Payments, PaymentStatus, PaymentType
+from App.partitions import archive_cold_months, archive_cutoff
+
+
+def place(session, customer_id: int, restaurant_id: int, created_at: datetime.datetime) -> Orders:
+    payment = Payments(status=PaymentStatus.PASS, payment_type=PaymentType.UPI, amount=120.0,
+                       customer_id=customer_id, created_at=created_at)
+    session.add(payment)
+    session.flush()
+    order = Orders(item_name=OrderFoodItem.VEG_FRIED_RICE, transaction_id=payment.transaction_id,
+                   restaurant_id=restaurant_id, customer_id=customer_id, created_at=created_at)
+    session.add(order)
+    session.commit()
+    return order
+
+
+def test_archived_ids_are_never_handed_out_again(database, customer, restaurant):
+    # Only cold history is live, so archiving moves the highest ids out of the live tables.
+    user, _ = customer
+    now = datetime.datetime.utcnow()
+    cold = archive_cutoff(now) - datetime.timedelta(days=10)
+    with Session(database, expire_on_commit=False) as session:
+        for days in range(3):
+            place(session, user.id, restaurant.restaurant_id, cold - datetime.timedelta(days=40 * days))
+    archive_cold_months(database, now)
+
+    with Session(database, expire_on_commit=False) as session:
+        archived = session.execute(
+            select(func.max(ArchivedMonths.max_order_id), func.max(ArchivedMonths.max_transaction_id))
+        ).one()
+        assert session.scalar(select(func.count()).select_from(Orders).where(Orders.created_at < archive_cutoff(now))) == 0
+        order = place(session, user.id, restaurant.restaurant_id, now)
+        assert order.order_id > archived[0]
+        assert order.transaction_id > archived[1]